@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Eme0 记忆操作日志压测
+测量短期记忆追加写日志的吞吐（组提交 + fsync）、快照耗时，以及从快照+日志恢复的耗时，并校验恢复后的状态一致
+
+用法:
+    python bench_eme0_journal.py --events 200000 --users 5000 --snapshot-at 0.8
+"""
+
+import argparse
+import logging
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, 'src')
+
+from eme0.memory_journal import MemoryJournal
+from eme0.memory_manager import MemoryManager
+from eme0.schemas import EmotionResult
+
+
+EMOTIONS = ["happiness", "sadness", "anger", "fear", "surprise", "neutral"]
+KEYWORDS = ["工作", "面试", "宠物", "同事", "家人", "考试", "旅行", "加班"]
+
+
+def memory_state(manager: MemoryManager):
+    """短期记忆和长期记忆的可比较快照"""
+    stm = manager.stm
+    sessions = [
+        (key, session.last_active, [
+            (stm.emotions.lookup(record.emotion_code), record.intensity, record.timestamp,
+             list(record.keywords))
+            for record in session.records
+        ])
+        for key, session in stm.sessions.items()
+    ]
+    summaries = {user_id: [summary.model_dump() for summary in items] for user_id, items in manager.ltm.memories.items()}
+    return sessions, summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eme0 记忆操作日志压测")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--archive-rate", type=float, default=0.05, help="归档会话的操作比例")
+    parser.add_argument("--snapshot-at", type=float, default=0.8, help="在该进度写一次快照，<=0 表示不写")
+    parser.add_argument("--commit-ms", type=float, default=10.0)
+    parser.add_argument("--no-fsync", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    directory = tempfile.mkdtemp(prefix="eme0_journal_")
+    rng = random.Random(args.seed)
+    results = [
+        EmotionResult(primary_emotion=rng.choice(EMOTIONS), emotion_intensity=round(rng.random(), 2),
+                      emotion_keywords=rng.sample(KEYWORDS, 2))
+        for _ in range(256)
+    ]
+    
+    journal = MemoryJournal(directory, commit_interval_ms=args.commit_ms, fsync=not args.no_fsync)
+    manager = MemoryManager(max_stm_length=10, journal=journal)
+    manager.recover()
+    
+    snapshot_at = int(args.events * args.snapshot_at) if args.snapshot_at > 0 else -1
+    started = time.perf_counter()
+    for i in range(args.events):
+        user_id = f"user{rng.randrange(args.users)}"
+        if rng.random() < args.archive_rate:
+            manager.archive_session(user_id, "session")
+        else:
+            manager.analyze_and_store("", user_id, "session", results[i % len(results)])
+        if i == snapshot_at:
+            manager.snapshot()
+    append_seconds = time.perf_counter() - started
+    journal.flush()
+    durable_seconds = time.perf_counter() - started
+    stats = journal.stats()
+    expected = memory_state(manager)
+    manager.close()
+    
+    recovered = MemoryManager(max_stm_length=10, journal=MemoryJournal(directory))
+    started = time.perf_counter()
+    events = recovered.recover()
+    recovery_seconds = time.perf_counter() - started
+    consistent = memory_state(recovered) == expected
+    recovered.close()
+    shutil.rmtree(directory)
+    
+    print("\n" + "=" * 60)
+    print(f"✍️  写入 {args.events} 个操作: 调用方 {append_seconds:.2f}s ({args.events / append_seconds:.0f} ops/s), "
+          f"落盘 {durable_seconds:.2f}s ({stats['frames_written'] / durable_seconds:.0f} 帧/s)")
+    print(f"📦 日志 {stats['bytes_written'] / 1024 / 1024:.1f} MB, 平均 {stats['bytes_written'] / max(1, stats['frames_written']):.0f} 字节/帧, "
+          f"组提交 {stats['commits']} 次（平均 {stats['frames_written'] / max(1, stats['commits']):.0f} 帧/次）")
+    print(f"📸 快照 {stats['last_snapshot_bytes'] / 1024 / 1024:.1f} MB, 写入耗时 {stats['last_snapshot_ms']:.1f}ms")
+    print(f"♻️  恢复 {events} 个事件: {recovery_seconds * 1000:.1f}ms, 状态一致: {'✅' if consistent else '❌'}")
+    print("=" * 60)
+    sys.exit(0 if consistent else 1)
+
+
+if __name__ == "__main__":
+    main()
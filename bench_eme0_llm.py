@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Eme0 情绪引擎离线压测
+启动本地模拟千帆接口，通过 Eme0MCPServer 并发调用情绪分析，统计延迟分布和吞吐
+
+用法:
+    python bench_eme0_llm.py --requests 500 --concurrency 50 --latency-ms 300 --error-rate 0.05 --rate-limit-rate 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, 'src')
+
+from eme0.mcp_server import Eme0MCPServer
+from eme0.mock_qianfan import MockQianfanSettings, start_mock_server
+
+
+DIALOGUES = [
+    "今天工作压力好大啊，项目deadline快到了，我真的很焦虑",
+    "太棒了！我刚刚通过了一个重要的面试！",
+    "我的宠物猫今天走丢了，我很难过",
+    "气死我了！同事把我的功劳说成是他的",
+    "好的",
+    "谢谢",
+    "没想到居然会这样",
+    "明天又是新的一天"
+]
+
+
+def percentile(values, p):
+    """计算百分位数"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_benchmark(args):
+    port = args.port
+    os.environ["EME0_LLM_BACKEND"] = "mock"
+    os.environ["EME0_MOCK_ENDPOINT"] = f"http://127.0.0.1:{port}/v2/chat/completions"
+    if args.stream:
+        os.environ["QIANFAN_STREAM"] = "true"
+    if args.no_cache:
+        os.environ["EMOTION_CACHE_ENABLED"] = "false"
+    if args.cascade:
+        os.environ["EME0_CASCADE_ENABLED"] = "true"
+    
+    settings = MockQianfanSettings(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after
+    )
+    runner = await start_mock_server(settings, port=port, seed=42)
+    
+    server = Eme0MCPServer()
+    await server.initialize()
+    
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    
+    async def one_request(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            dialogue = DIALOGUES[i % len(DIALOGUES)] + ("" if args.repeat else f" #{i}")
+            await server.analyze_emotion(dialogue, f"bench_user{i % 100}", "bench_session")
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    
+    print("\n" + "=" * 60)
+    print(f"📊 请求数={args.requests}, 并发={args.concurrency}, 总耗时={elapsed:.2f}s, 吞吐={args.requests / elapsed:.1f} req/s")
+    print(f"⏱️  p50={percentile(latencies, 50) * 1000:.1f}ms, p95={percentile(latencies, 95) * 1000:.1f}ms, "
+          f"p99={percentile(latencies, 99) * 1000:.1f}ms, max={max(latencies) * 1000:.1f}ms")
+    stats = await server.get_engine_stats()
+    print(f"🔧 引擎状态: {stats.get('stats')}")
+    print("=" * 60)
+    
+    await server.shutdown()
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eme0 离线压测（本地模拟千帆接口）")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--stream", action="store_true", help="使用流式响应")
+    parser.add_argument("--repeat", action="store_true", help="重复发送相同文本（测试缓存和请求合并）")
+    parser.add_argument("--no-cache", action="store_true", help="关闭结果缓存")
+    parser.add_argument("--cascade", action="store_true", help="启用分层分析（本地分析层置信度不足时才调用LLM）")
+    args = parser.parse_args()
+    
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
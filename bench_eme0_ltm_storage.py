@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Eme0 长期记忆SQLite存储压测
+批量写入大量情绪总结和画像，重新打开数据库后测量单用户冷加载（总结+画像）的延迟
+
+用法:
+    python bench_eme0_ltm_storage.py --summaries 1000000 --users 20000 --loads 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, 'src')
+
+from eme0.ltm_storage import SQLiteStorage
+from eme0.memory_manager import LongTermMemory
+from eme0.schemas import DecayConfig, EmotionProfile, EmotionSummary
+
+
+EMOTIONS = ["happiness", "sadness", "anger", "fear", "surprise", "neutral"]
+TOPICS = ["工作", "面试", "宠物", "同事", "家人", "考试", "旅行", "加班"]
+
+
+def build_summary(rng: random.Random, user_id: str, created_at: float) -> EmotionSummary:
+    return EmotionSummary(
+        user_id=user_id,
+        session_id=f"s{rng.randint(0, 1 << 30)}",
+        dominant_emotion=rng.choice(EMOTIONS),
+        emotion_trend=rng.choice(["逐渐上升", "逐渐下降", "相对稳定"]),
+        sensitive_topics=rng.sample(TOPICS, 2),
+        created_at=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at)),
+        duration_minutes=5.0,
+        total_interactions=10,
+        average_intensity=rng.random()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eme0 长期记忆SQLite存储压测")
+    parser.add_argument("--summaries", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--loads", type=int, default=200, help="冷加载的用户数")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--path", default=None, help="数据库路径，默认使用临时目录")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    path = args.path or os.path.join(tempfile.mkdtemp(prefix="eme0_ltm_"), "ltm.db")
+    rng = random.Random(args.seed)
+    users = [f"user{i}" for i in range(args.users)]
+    now = time.time()
+    
+    # 写入：模板总结按用户复用，只计存储层入队和后台提交的耗时
+    templates = [build_summary(rng, "template", now) for _ in range(64)]
+    profile = EmotionProfile(user_id="template", dominant_emotions={"happiness": 1.0}, emotion_trends={},
+                             emotional_stability=0.5, sensitive_topics=TOPICS[:3], personality_traits={},
+                             last_updated=time.strftime("%Y-%m-%dT%H:%M:%S"), total_interactions=0)
+    storage = SQLiteStorage(path, batch_size=args.batch_size)
+    started = time.perf_counter()
+    for i in range(args.summaries):
+        user_id = users[i % args.users]
+        created_at = now - (args.summaries - i)  # 按时间顺序写入
+        storage.append_summary(user_id, templates[i % len(templates)], created_at)
+        if i % 10 == 0:
+            storage.save_profile(profile.model_copy(update={"user_id": user_id}))
+    enqueue_seconds = time.perf_counter() - started
+    storage.flush()
+    write_seconds = time.perf_counter() - started
+    write_stats = storage.stats()
+    storage.close()
+    
+    # 重新打开后冷加载单个用户
+    storage = SQLiteStorage(path, batch_size=args.batch_size)
+    ltm = LongTermMemory(decay_config=DecayConfig(retention_hours=24 * 365), storage=storage)
+    latencies = []
+    loaded = 0
+    for user_id in rng.sample(users, min(args.loads, len(users))):
+        started = time.perf_counter()
+        ltm.get_detailed_profile(user_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+        loaded += len(ltm.memories.get(user_id, ()))
+    storage.close()
+    
+    latencies.sort()
+    print("\n" + "=" * 60)
+    print(f"📦 数据库: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+    print(f"✍️  写入 {args.summaries} 条总结: 入队 {enqueue_seconds:.2f}s, 落盘 {write_seconds:.2f}s, "
+          f"{args.summaries / write_seconds:.0f} 条/s, 事务数 {write_stats['batches']}")
+    print(f"📖 冷加载 {len(latencies)} 个用户（平均 {loaded / max(1, len(latencies)):.0f} 条总结/用户）: "
+          f"p50={statistics.median(latencies):.2f}ms, p99={latencies[int(len(latencies) * 0.99) - 1]:.2f}ms")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
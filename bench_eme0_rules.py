@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Eme0 规则分析压测
+比较逐条规则分析和批量规则分析（拼接文本一次扫描、NumPy向量化打分）的吞吐，
+并校验两者的结果（情绪、强度、关键词、置信度）完全一致
+
+用法:
+    python bench_eme0_rules.py --texts 20000 --rounds 3
+"""
+
+import argparse
+import random
+import sys
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, 'src')
+
+from eme0.rule_engine import RuleEmotionEngine
+
+
+FRAGMENTS = [
+    "今天工作压力好大啊，项目deadline快到了，我真的很焦虑",
+    "太棒了！我刚刚通过了一个重要的面试！",
+    "我的宠物猫今天走丢了，我很难过",
+    "气死我了！同事把我的功劳说成是他的",
+    "一点也不开心",
+    "我不怕",
+    "没想到居然会这样",
+    "明天又是新的一天",
+    "好的",
+    "谢谢"
+]
+
+
+def build_texts(count: int, seed: int):
+    """随机拼接对话片段生成测试文本"""
+    rng = random.Random(seed)
+    return ["，".join(rng.sample(FRAGMENTS, rng.randint(1, 3))) for _ in range(count)]
+
+
+def result_key(result):
+    return result.primary_emotion, result.emotion_intensity, tuple(result.emotion_keywords), result.confidence
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eme0 规则分析压测")
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    engine = RuleEmotionEngine()
+    texts = build_texts(args.texts, args.seed)
+    
+    def timed(analyze):
+        best, results = float("inf"), None
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            results = analyze()
+            best = min(best, time.perf_counter() - started)
+        return best, results
+    
+    single_time, single = timed(lambda: [engine.analyze(text) for text in texts])
+    batch_time, batch = timed(lambda: engine.analyze_batch(texts))
+    
+    mismatches = sum(1 for a, b in zip(single, batch) if result_key(a) != result_key(b))
+    matched = sum(1 for result in single if result.primary_emotion != "neutral")
+    print("\n" + "=" * 60)
+    print(f"📊 文本数={args.texts}, 轮数={args.rounds}（取最快一轮）, 命中情绪词的文本={matched}")
+    print(f"🐢 逐条分析: {single_time:.3f}s, {args.texts / single_time:.0f} 条/s, 单条 {single_time / args.texts * 1e6:.1f}µs")
+    print(f"⚡ 批量分析: {batch_time:.3f}s, {args.texts / batch_time:.0f} 条/s, 加速 {single_time / batch_time:.2f}x")
+    print(f"{'✅' if mismatches == 0 else '❌'} 结果一致: {len(texts) - mismatches}/{len(texts)}")
+    print("=" * 60)
+    sys.exit(0 if mismatches == 0 and len(batch) == len(texts) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Eme0 会话向量索引压测
+写入大量会话总结，测量写入吞吐、重新打开索引的耗时，以及按用户检索和全量检索的top-k延迟
+
+用法:
+    python bench_eme0_vector_index.py --vectors 300000 --users 3000 --queries 200
+"""
+
+import argparse
+import logging
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, 'src')
+
+from eme0.schemas import EmotionSummary
+from eme0.session_index import SessionVectorIndex, embed_summary
+
+
+EMOTIONS = ["happiness", "sadness", "anger", "fear", "surprise", "neutral"]
+TOPICS = ["工作", "面试", "宠物", "同事", "家人", "考试", "旅行", "加班", "失眠", "搬家", "分手", "升职"]
+
+
+def build_summary(rng: random.Random, user_id: str, index: int) -> EmotionSummary:
+    shares = [rng.random() for _ in range(2)]
+    emotions = rng.sample(EMOTIONS, 2)
+    return EmotionSummary(
+        user_id=user_id,
+        session_id=f"s{index}",
+        dominant_emotion=emotions[0],
+        emotion_trend=rng.choice(["逐渐上升", "逐渐下降", "相对稳定"]),
+        sensitive_topics=rng.sample(TOPICS, 3),
+        created_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+        total_interactions=10,
+        average_intensity=rng.random(),
+        emotion_distribution={emotion: share / sum(shares) for emotion, share in zip(emotions, shares)}
+    )
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return statistics.median(latencies), latencies[max(0, int(len(latencies) * 0.99) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eme0 会话向量索引压测")
+    parser.add_argument("--vectors", type=int, default=300000)
+    parser.add_argument("--users", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    directory = tempfile.mkdtemp(prefix="eme0_vectors_")
+    rng = random.Random(args.seed)
+    templates = [build_summary(rng, "template", i) for i in range(512)]
+    
+    index = SessionVectorIndex(directory)
+    started = time.perf_counter()
+    for i in range(args.vectors):
+        summary = templates[i % len(templates)].model_copy(update={"session_id": f"s{i}"})
+        index.add(f"user{i % args.users}", summary)
+    write_seconds = time.perf_counter() - started
+    index.close()
+    
+    started = time.perf_counter()
+    index = SessionVectorIndex(directory)
+    open_ms = (time.perf_counter() - started) * 1000
+    
+    queries = [embed_summary(build_summary(rng, "query", i)) for i in range(args.queries)]
+    user_latencies = []
+    global_latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, args.top_k, user_id=f"user{rng.randrange(args.users)}")
+        user_latencies.append((time.perf_counter() - started) * 1000)
+        
+        started = time.perf_counter()
+        index.search(query, args.top_k)
+        global_latencies.append((time.perf_counter() - started) * 1000)
+    index.close()
+    shutil.rmtree(directory)
+    
+    print("\n" + "=" * 60)
+    print(f"✍️  写入 {args.vectors} 个向量: {write_seconds:.2f}s ({args.vectors / write_seconds:.0f} 条/s), 重新打开 {open_ms:.0f}ms")
+    print(f"👤 按用户检索（约 {args.vectors // args.users} 个向量/用户）: p50={percentiles(user_latencies)[0]:.3f}ms, "
+          f"p99={percentiles(user_latencies)[1]:.3f}ms")
+    print(f"🌐 全量检索（{args.vectors} 个向量）: p50={percentiles(global_latencies)[0]:.2f}ms, "
+          f"p99={percentiles(global_latencies)[1]:.2f}ms")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
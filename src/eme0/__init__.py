@@ -11,4 +11,8 @@ from .config import MemoryConfig
 from .emotion_inference import EmotionInferenceEngine
 from .memory_manager import MemoryManager
 from .llm_client import LLMClient
-from .config import load_config
\ No newline at end of file
+from .config import load_config
+from .emotion_cache import EmotionResultCache
+from .lexicon import LexiconManager
+from .local_classifier import LocalEmotionClassifier
+from .ltm_storage import SQLiteStorage
\ No newline at end of file
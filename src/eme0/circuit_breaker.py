@@ -0,0 +1,112 @@
+"""千帆后端熔断器"""
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """基于失败率和慢调用率的熔断器（关闭 -> 打开 -> 半开 -> 关闭）"""
+    
+    def __init__(self, failure_rate_threshold: float = 0.5, slow_call_seconds: float = 10.0,
+                 window_size: int = 20, min_calls: int = 5, open_seconds: float = 30.0):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = max(1, min_calls)
+        self.open_seconds = open_seconds
+        self._outcomes: deque = deque(maxlen=max(self.min_calls, window_size))  # True表示失败或慢调用
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+        
+        self.open_count = 0  # 累计熔断次数
+        self.rejected_calls = 0  # 熔断期间被拒绝的调用数
+    
+    @property
+    def state(self) -> str:
+        """当前状态，打开时间超过冷却期后自动进入半开"""
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = STATE_HALF_OPEN
+            self._probe_started_at = None
+            logger.info("千帆熔断器进入半开状态，允许探测请求")
+        return self._state
+    
+    def allow_request(self) -> bool:
+        """判断是否允许调用后端；半开状态下每个冷却周期只放行一个探测请求"""
+        state = self.state
+        if state == STATE_CLOSED:
+            return True
+        
+        if state == STATE_HALF_OPEN:
+            now = time.monotonic()
+            if self._probe_started_at is None or now - self._probe_started_at >= self.open_seconds:
+                self._probe_started_at = now
+                return True
+        
+        self.rejected_calls += 1
+        return False
+    
+    def record_success(self, latency: float):
+        """记录一次成功调用，超过慢调用阈值的按失败计"""
+        if latency >= self.slow_call_seconds:
+            self._record(True)
+            return
+        
+        if self._state == STATE_HALF_OPEN:
+            self._close()
+        else:
+            self._record(False)
+    
+    def record_failure(self):
+        """记录一次失败调用"""
+        self._record(True)
+    
+    def _record(self, failed: bool):
+        if self._state == STATE_HALF_OPEN:
+            if failed:
+                self._open()
+            return
+        
+        self._outcomes.append(failed)
+        if self._state == STATE_CLOSED and len(self._outcomes) >= self.min_calls:
+            if self.failure_rate >= self.failure_rate_threshold:
+                self._open()
+    
+    def _open(self):
+        self._state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started_at = None
+        self.open_count += 1
+        logger.warning(f"千帆熔断器打开: 失败率={self.failure_rate:.2f}, {self.open_seconds}秒后探测恢复")
+    
+    def _close(self):
+        self._state = STATE_CLOSED
+        self._outcomes.clear()
+        self._probe_started_at = None
+        logger.info("千帆熔断器关闭，恢复调用LLM")
+    
+    @property
+    def failure_rate(self) -> float:
+        """滑动窗口内的失败率（含慢调用）"""
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+    
+    def stats(self) -> Dict[str, Any]:
+        """熔断器状态"""
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate, 3),
+            "window_calls": len(self._outcomes),
+            "failure_rate_threshold": self.failure_rate_threshold,
+            "slow_call_seconds": self.slow_call_seconds,
+            "open_seconds": self.open_seconds,
+            "open_count": self.open_count,
+            "rejected_calls": self.rejected_calls
+        }
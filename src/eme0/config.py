@@ -1,7 +1,7 @@
 """Eme0 情绪引擎配置模块"""
 import os
-from typing import Optional
-from dataclasses import dataclass
+from typing import List, Optional
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -11,18 +11,93 @@ class BaiduQianfanConfig:
     appid: Optional[str] = None
     model_name: str = "ernie-4.5-turbo-128k"  # 更新为Java示例中的模型
     endpoint: str = "https://qianfan.baidubce.com/v2/chat/completions"  # 更新为新的API端点
+    backend: str = "qianfan"  # LLM后端：qianfan, rule, mock
+    mock_endpoint: str = "http://127.0.0.1:8765/v2/chat/completions"  # 本地模拟千帆接口地址（backend=mock时使用）
+    pool_limit: int = 100  # 连接池总连接数上限
+    pool_limit_per_host: int = 20  # 单个主机的连接数上限
+    keepalive_timeout: float = 30.0  # 空闲连接保活时间（秒）
+    warmup_connections: int = 2  # 启动时预热的连接数
+    max_batch_size: int = 20  # 单次批量分析请求包含的最大对话条数
+    rate_limit_qps: float = 0.0  # 令牌桶每秒请求数，<=0 表示不限流
+    rate_limit_burst: int = 20  # 令牌桶容量（允许的突发请求数）
+    initial_concurrency: int = 8  # 自适应并发的初始上限
+    min_concurrency: int = 1  # 自适应并发的最小上限
+    max_concurrency: int = 64  # 自适应并发的最大上限
+    limiter_max_wait: float = 5.0  # 在限流和并发控制中排队的最长时间（秒），超过后降级为规则分析，<=0 表示不限制
+    max_retries: int = 3  # 429/5xx/网络错误的最大重试次数
+    retry_base_delay: float = 0.5  # 指数退避基础时间（秒）
+    retry_max_delay: float = 10.0  # 指数退避最长时间（秒）
+    request_timeout: float = 30.0  # 单次请求超时时间（秒）
+    breaker_failure_rate: float = 0.5  # 熔断器失败率阈值（含慢调用）
+    breaker_slow_call_seconds: float = 10.0  # 超过该耗时的调用计为慢调用
+    breaker_window_size: int = 20  # 熔断器统计的最近调用数
+    breaker_min_calls: int = 5  # 熔断器开始判断前的最少调用数
+    breaker_open_seconds: float = 30.0  # 熔断打开后的冷却/探测间隔（秒）
+    stream: bool = False  # 是否使用流式（SSE）响应，JSON结果闭合后提前结束
 
 
 @dataclass
 class MemoryConfig:
     """记忆管理配置（增强版）"""
     stm_max_length: int = 10  # 短期记忆最大长度
-    ltm_storage_type: str = "memory"  # 长期记忆存储类型：memory, vector_db
-    vector_db_path: Optional[str] = None
+    stm_raw_sample_rate: float = 0.0  # 短期记忆保留LLM原始输出的比例（0-1，仅用于调试）
+    stm_idle_ttl_seconds: float = 1800.0  # 会话空闲超过该时间后自动归档到长期记忆，<=0 表示不自动归档
+    stm_max_sessions: int = 100000  # 短期记忆最多保留的会话数，超出时归档最久未活跃的会话，<=0 表示不限制
+    stm_sweep_interval: float = 60.0  # 空闲会话清理间隔（秒）
+    ltm_storage_type: str = "memory"  # 长期记忆存储类型：memory, sqlite, vector_db（进程内存储 + 会话向量索引）
+    ltm_db_path: str = "eme0_ltm.db"  # SQLite长期记忆数据库路径（ltm_storage_type=sqlite时使用）
+    ltm_write_batch_size: int = 500  # SQLite每个事务最多提交的变更数
+    ltm_max_resident_users: int = 10000  # SQLite存储时内存中最多驻留的用户数，超出时换出最久未访问的，<=0 表示不限制
+    journal_dir: Optional[str] = None  # 记忆操作日志和快照目录，为空时不记录（进程内存储重启后丢失）
+    journal_commit_interval_ms: float = 10.0  # 日志组提交的最小间隔（毫秒）
+    journal_fsync: bool = True  # 每次组提交后是否fsync
+    snapshot_interval: float = 300.0  # 记忆快照间隔（秒），<=0 表示只在关闭时写快照
+    vector_db_path: Optional[str] = None  # 会话向量索引目录（ltm_storage_type=vector_db时使用）
     decay_rate: float = 0.95  # 情绪衰减率
     time_window_hours: int = 24  # 时间窗口（小时）
     min_weight: float = 0.1  # 最小权重
     trend_weight: float = 0.3  # 趋势权重
+    ltm_retention_hours: float = 0.0  # 长期记忆保留时长（小时），<=0 表示永久保留
+    ltm_delete_expired: bool = False  # 超出保留时长的总结是否从持久化存储中删除，默认只移出内存
+    ltm_topic_capacity: int = 32  # 每个用户跟踪的敏感话题数上限
+
+
+@dataclass
+class CacheConfig:
+    """情绪分析结果缓存配置"""
+    enabled: bool = True  # 是否启用结果缓存
+    max_size: int = 10000  # 内存缓存最大条目数
+    ttl_seconds: float = 3600.0  # 缓存有效期（秒）
+    disk_path: Optional[str] = None  # 磁盘缓存文件路径（SQLite），为空时仅使用内存缓存
+    disk_max_size: int = 100000  # 磁盘缓存最大条目数，超出时淘汰最旧的条目，<=0 表示不限制
+    purge_interval: float = 60.0  # 磁盘缓存清理过期条目的间隔（秒），<=0 表示只在写入量达到阈值时清理
+
+
+@dataclass
+class LexiconConfig:
+    """规则分析情绪词典配置"""
+    path: Optional[str] = None  # 词典文件或目录（*.json），为空时使用内置中文词典
+    reload_interval: float = 5.0  # 检查词典文件变化的间隔（秒），<=0 表示不自动重新加载
+
+
+@dataclass
+class ClassifierConfig:
+    """本地情绪分类器配置"""
+    model_path: Optional[str] = None  # 训练导出的分类器模型文件（.npz）
+    record_path: Optional[str] = None  # 记录LLM分析结果的JSONL文件（用于训练分类器），为空时不记录
+
+
+@dataclass
+class CascadeConfig:
+    """分层情绪分析配置：先用本地分析层，置信度不足时才升级到LLM"""
+    enabled: bool = False  # 是否启用分层分析（关闭时所有对话都调用LLM）
+    tiers: List[str] = field(default_factory=lambda: ["rules", "classifier"])  # 按顺序尝试的本地分析层
+    rule_confidence_threshold: float = 0.9  # 规则层结果的最低置信度（主要情绪得分占比）
+    rule_min_score: float = 1.0  # 规则层主要情绪的最低加权得分（约等于一个未被弱化的情绪词）
+    rule_min_coverage: float = 0.1  # 规则层情绪关键词覆盖文本的最低比例
+    classifier_confidence_threshold: float = 0.8  # 分类器结果的最低置信度
+    classifier_min_margin: float = 0.3  # 分类器前两名概率差低于该值视为有歧义
+    max_local_chars: int = 80  # 超过该长度的对话直接交给LLM
 
 
 @dataclass
@@ -30,16 +105,24 @@ class Eme0Config:
     """Eme0 全局配置"""
     baidu_qianfan: BaiduQianfanConfig
     memory: MemoryConfig
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    lexicon: LexiconConfig = field(default_factory=LexiconConfig)
+    classifier: ClassifierConfig = field(default_factory=ClassifierConfig)
+    cascade: CascadeConfig = field(default_factory=CascadeConfig)
     server_host: str = "127.0.0.1"
     server_port: int = 8000
+    latency_budget_ms: float = 0.0  # 情绪分析延迟预算（毫秒），超时先返回规则结果；0表示不限制
 
 
 def load_config() -> Eme0Config:
     """加载配置"""
     # 从环境变量读取配置
     api_key = os.getenv("BAIDU_QIANFAN_API_KEY")
-    # 检查是否配置了真实的API密钥
-    if not api_key:
+    backend = os.getenv("EME0_LLM_BACKEND", "qianfan")
+    # 检查是否配置了真实的API密钥（仅千帆后端需要）
+    if backend != "qianfan":
+        print(f"🔧 当前使用 {backend} 后端")
+    elif not api_key:
         print("⚠️  未检测到百度千帆API密钥配置")
         print("📝 请按以下步骤配置真实的API密钥:")
         print("1. 登录百度智能云控制台: https://cloud.baidu.com/")
@@ -70,18 +153,93 @@ def load_config() -> Eme0Config:
     baidu_config = BaiduQianfanConfig(
         api_key=api_key,
         appid=appid,
-        model_name=os.getenv("BAIDU_MODEL_NAME", "ernie-4.5-turbo-128k")
+        model_name=os.getenv("BAIDU_MODEL_NAME", "ernie-4.5-turbo-128k"),
+        endpoint=os.getenv("BAIDU_QIANFAN_ENDPOINT", "https://qianfan.baidubce.com/v2/chat/completions"),
+        backend=backend,
+        mock_endpoint=os.getenv("EME0_MOCK_ENDPOINT", "http://127.0.0.1:8765/v2/chat/completions"),
+        pool_limit=int(os.getenv("QIANFAN_POOL_LIMIT", "100")),
+        pool_limit_per_host=int(os.getenv("QIANFAN_POOL_LIMIT_PER_HOST", "20")),
+        keepalive_timeout=float(os.getenv("QIANFAN_KEEPALIVE_TIMEOUT", "30")),
+        warmup_connections=int(os.getenv("QIANFAN_WARMUP_CONNECTIONS", "2")),
+        max_batch_size=int(os.getenv("QIANFAN_MAX_BATCH_SIZE", "20")),
+        rate_limit_qps=float(os.getenv("QIANFAN_RATE_LIMIT_QPS", "0")),
+        rate_limit_burst=int(os.getenv("QIANFAN_RATE_LIMIT_BURST", "20")),
+        initial_concurrency=int(os.getenv("QIANFAN_INITIAL_CONCURRENCY", "8")),
+        min_concurrency=int(os.getenv("QIANFAN_MIN_CONCURRENCY", "1")),
+        max_concurrency=int(os.getenv("QIANFAN_MAX_CONCURRENCY", "64")),
+        limiter_max_wait=float(os.getenv("QIANFAN_LIMITER_MAX_WAIT", "5")),
+        max_retries=int(os.getenv("QIANFAN_MAX_RETRIES", "3")),
+        retry_base_delay=float(os.getenv("QIANFAN_RETRY_BASE_DELAY", "0.5")),
+        retry_max_delay=float(os.getenv("QIANFAN_RETRY_MAX_DELAY", "10")),
+        request_timeout=float(os.getenv("QIANFAN_REQUEST_TIMEOUT", "30")),
+        breaker_failure_rate=float(os.getenv("QIANFAN_BREAKER_FAILURE_RATE", "0.5")),
+        breaker_slow_call_seconds=float(os.getenv("QIANFAN_BREAKER_SLOW_CALL_SECONDS", "10")),
+        breaker_window_size=int(os.getenv("QIANFAN_BREAKER_WINDOW_SIZE", "20")),
+        breaker_min_calls=int(os.getenv("QIANFAN_BREAKER_MIN_CALLS", "5")),
+        breaker_open_seconds=float(os.getenv("QIANFAN_BREAKER_OPEN_SECONDS", "30")),
+        stream=os.getenv("QIANFAN_STREAM", "false").lower() in ("1", "true", "yes")
     )
     
     memory_config = MemoryConfig(
         stm_max_length=int(os.getenv("STM_MAX_LENGTH", "10")),
+        stm_raw_sample_rate=float(os.getenv("STM_RAW_SAMPLE_RATE", "0")),
+        stm_idle_ttl_seconds=float(os.getenv("STM_IDLE_TTL_SECONDS", "1800")),
+        stm_max_sessions=int(os.getenv("STM_MAX_SESSIONS", "100000")),
+        stm_sweep_interval=float(os.getenv("STM_SWEEP_INTERVAL", "60")),
+        ltm_storage_type=os.getenv("LTM_STORAGE_TYPE", "memory"),
+        ltm_db_path=os.getenv("LTM_DB_PATH", "eme0_ltm.db"),
+        vector_db_path=os.getenv("VECTOR_DB_PATH") or None,
+        ltm_write_batch_size=int(os.getenv("LTM_WRITE_BATCH_SIZE", "500")),
+        ltm_max_resident_users=int(os.getenv("LTM_MAX_RESIDENT_USERS", "10000")),
+        journal_dir=os.getenv("MEMORY_JOURNAL_DIR") or None,
+        journal_commit_interval_ms=float(os.getenv("MEMORY_JOURNAL_COMMIT_MS", "10")),
+        journal_fsync=os.getenv("MEMORY_JOURNAL_FSYNC", "true").lower() in ("1", "true", "yes"),
+        snapshot_interval=float(os.getenv("MEMORY_SNAPSHOT_INTERVAL", "300")),
         decay_rate=float(os.getenv("EMOTION_DECAY_RATE", "0.95")),
         time_window_hours=int(os.getenv("TIME_WINDOW_HOURS", "24")),
         min_weight=float(os.getenv("MIN_WEIGHT", "0.1")),
-        trend_weight=float(os.getenv("TREND_WEIGHT", "0.3"))
+        trend_weight=float(os.getenv("TREND_WEIGHT", "0.3")),
+        ltm_retention_hours=float(os.getenv("LTM_RETENTION_HOURS", "0")),
+        ltm_delete_expired=os.getenv("LTM_DELETE_EXPIRED", "false").lower() in ("1", "true", "yes"),
+        ltm_topic_capacity=int(os.getenv("LTM_TOPIC_CAPACITY", "32"))
+    )
+    
+    cache_config = CacheConfig(
+        enabled=os.getenv("EMOTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+        max_size=int(os.getenv("EMOTION_CACHE_SIZE", "10000")),
+        ttl_seconds=float(os.getenv("EMOTION_CACHE_TTL", "3600")),
+        disk_path=os.getenv("EMOTION_CACHE_PATH") or None,
+        disk_max_size=int(os.getenv("EMOTION_CACHE_DISK_SIZE", "100000")),
+        purge_interval=float(os.getenv("EMOTION_CACHE_PURGE_INTERVAL", "60"))
+    )
+    
+    lexicon_config = LexiconConfig(
+        path=os.getenv("EME0_LEXICON_PATH") or None,
+        reload_interval=float(os.getenv("EME0_LEXICON_RELOAD_INTERVAL", "5"))
+    )
+    
+    classifier_config = ClassifierConfig(
+        model_path=os.getenv("EME0_CLASSIFIER_PATH") or None,
+        record_path=os.getenv("EME0_RECORD_PATH") or None
+    )
+    
+    cascade_config = CascadeConfig(
+        enabled=os.getenv("EME0_CASCADE_ENABLED", "false").lower() in ("1", "true", "yes"),
+        tiers=[tier.strip() for tier in os.getenv("EME0_CASCADE_TIERS", "rules,classifier").split(",") if tier.strip()],
+        rule_confidence_threshold=float(os.getenv("EME0_CASCADE_RULE_CONFIDENCE", "0.9")),
+        rule_min_score=float(os.getenv("EME0_CASCADE_RULE_MIN_SCORE", "1.0")),
+        rule_min_coverage=float(os.getenv("EME0_CASCADE_RULE_MIN_COVERAGE", "0.1")),
+        classifier_confidence_threshold=float(os.getenv("EME0_CASCADE_CLASSIFIER_CONFIDENCE", "0.8")),
+        classifier_min_margin=float(os.getenv("EME0_CASCADE_CLASSIFIER_MARGIN", "0.3")),
+        max_local_chars=int(os.getenv("EME0_CASCADE_MAX_CHARS", "80"))
     )
     
     return Eme0Config(
         baidu_qianfan=baidu_config,
-        memory=memory_config
+        memory=memory_config,
+        cache=cache_config,
+        lexicon=lexicon_config,
+        classifier=classifier_config,
+        cascade=cascade_config,
+        latency_budget_ms=float(os.getenv("EME0_LATENCY_BUDGET_MS", "0"))
     )
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""情绪分析结果缓存（内存LRU + 可选SQLite持久化，磁盘写入由后台线程批量提交）"""
+import hashlib
+import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .schemas import EmotionResult
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_UPSERT_ENTRY = "INSERT OR REPLACE INTO emotion_cache (key, payload, created_at) VALUES (?, ?, ?)"
+_DELETE_EXPIRED = "DELETE FROM emotion_cache WHERE created_at < ?"
+# 超出容量时删除最旧的条目（按created_at倒序保留前N条）
+_DELETE_OLDEST = (
+    "DELETE FROM emotion_cache WHERE key IN "
+    "(SELECT key FROM emotion_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)"
+)
+
+
+def normalize_text(text: str) -> str:
+    """标准化对话文本：全角转半角、合并空白、转小写"""
+    text = unicodedata.normalize("NFKC", text)
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return text.lower()
+
+
+class EmotionResultCache:
+    """基于内容寻址的情绪分析结果缓存"""
+    
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600.0, disk_path: Optional[str] = None,
+                 disk_max_size: int = 100000, purge_interval: float = 60.0, batch_size: int = 200):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.disk_max_size = disk_max_size
+        self.purge_interval = purge_interval
+        self.batch_size = max(1, batch_size)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()  # 保护磁盘写入统计
+        
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.disk_writes = 0
+        self.disk_purged = 0
+        self.disk_write_errors = 0
+        
+        if disk_path:
+            self._open_disk(disk_path)
+    
+    def _connect(self, disk_path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(disk_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+    
+    def _open_disk(self, disk_path: str):
+        """打开磁盘缓存并启动后台写入线程"""
+        try:
+            self._db = self._connect(disk_path)
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS emotion_cache ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_emotion_cache_created ON emotion_cache (created_at);"
+            )
+            writer_db = self._connect(disk_path)
+            # 启动时清理已过期和超出容量的条目
+            self._purge(writer_db)
+            logger.info(f"已启用磁盘情绪缓存: {disk_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"磁盘情绪缓存打开失败，仅使用内存缓存: {e}")
+            self._db = None
+            return
+        self._writer = threading.Thread(target=self._write_loop, args=(writer_db,), name="eme0-cache-writer", daemon=True)
+        self._writer.start()
+    
+    @staticmethod
+    def make_key(text: str, model_name: str, prompt_version: str) -> str:
+        """根据标准化文本、模型名和prompt版本计算缓存键"""
+        raw = "\x00".join([prompt_version, model_name, normalize_text(text)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[EmotionResult]:
+        """读取缓存，命中时返回带新时间戳的结果"""
+        now = time.time()
+        entry = self._entries.get(key)
+        
+        if entry is not None:
+            created_at, payload = entry
+            if now - created_at <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return EmotionResult(**payload)
+            del self._entries[key]
+        
+        if self._db is not None:
+            entry = self._load_from_disk(key, now)
+            if entry is not None:
+                self._remember(key, *entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return EmotionResult(**entry[1])
+        
+        self.misses += 1
+        return None
+    
+    def put(self, key: str, result: EmotionResult):
+        """写入缓存（时间戳不参与缓存）"""
+        now = time.time()
+        payload = result.model_dump(exclude={"timestamp"})
+        self._remember(key, now, payload)
+        
+        # 磁盘写入只入队，由后台线程批量提交
+        if self._writer is not None:
+            self._queue.put((key, json.dumps(payload, ensure_ascii=False), now))
+    
+    def _write_loop(self, db: sqlite3.Connection):
+        """后台写入：批量提交已积累的条目，并按purge_interval清理过期和超出容量的条目"""
+        last_purge = time.monotonic()
+        written_since_purge = 0
+        stop = False
+        while not stop:
+            timeout = max(0.0, self.purge_interval - (time.monotonic() - last_purge)) if self.purge_interval > 0 else None
+            batch = []
+            try:
+                item = self._queue.get(timeout=timeout)
+                batch.append(item)
+                while item is not None and len(batch) < self.batch_size:
+                    item = self._queue.get_nowait()
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            
+            stop = bool(batch) and batch[-1] is None
+            rows = [row for row in batch if row is not None]
+            if rows:
+                try:
+                    with db:
+                        db.executemany(_UPSERT_ENTRY, rows)
+                    with self._lock:
+                        self.disk_writes += len(rows)
+                    written_since_purge += len(rows)
+                except sqlite3.Error as e:
+                    with self._lock:
+                        self.disk_write_errors += 1
+                    logger.warning(f"写入磁盘情绪缓存失败（{len(rows)}条）: {e}")
+            
+            # 定期清理；写入量超过容量的十分之一时提前清理，磁盘条目数不会明显超出上限
+            due = self.purge_interval > 0 and time.monotonic() - last_purge >= self.purge_interval
+            if due or (self.disk_max_size > 0 and written_since_purge >= max(1, self.disk_max_size // 10)):
+                self._purge(db)
+                last_purge = time.monotonic()
+                written_since_purge = 0
+            for _ in batch:
+                self._queue.task_done()
+        db.close()
+    
+    def _purge(self, db: sqlite3.Connection):
+        """删除过期条目，并按created_at淘汰最旧的条目直到不超过disk_max_size"""
+        try:
+            with db:
+                purged = db.execute(_DELETE_EXPIRED, (time.time() - self.ttl_seconds,)).rowcount
+                if self.disk_max_size > 0:
+                    purged += db.execute(_DELETE_OLDEST, (self.disk_max_size,)).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"清理磁盘情绪缓存失败: {e}")
+            return
+        with self._lock:
+            self.disk_purged += purged
+    
+    def _remember(self, key: str, created_at: float, payload: Dict[str, Any]):
+        """写入内存层并按LRU淘汰"""
+        self._entries[key] = (created_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def _load_from_disk(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """从磁盘层读取未过期的条目"""
+        try:
+            row = self._db.execute(
+                "SELECT payload, created_at FROM emotion_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取磁盘情绪缓存失败: {e}")
+            return None
+        
+        if row is None:
+            return None
+        
+        payload, created_at = row
+        if now - created_at > self.ttl_seconds:
+            return None
+        return created_at, json.loads(payload)
+    
+    def flush(self):
+        """等待已入队的磁盘写入完成"""
+        if self._writer is not None:
+            self._queue.join()
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        with self._lock:
+            disk = {
+                "disk_max_size": self.disk_max_size,
+                "disk_pending": self._queue.qsize(),
+                "disk_writes": self.disk_writes,
+                "disk_purged": self.disk_purged,
+                "disk_write_errors": self.disk_write_errors
+            }
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+            "disk_enabled": self._db is not None,
+            **disk
+        }
+    
+    def close(self):
+        """写入剩余条目并关闭磁盘缓存"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -1,26 +1,71 @@
 """情绪推理模型实现"""
+import asyncio
 import logging
-from typing import List
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 from .schemas import EmotionResult, EmotionContext
-from .llm_client import LLMClient
+from .llm_client import LLMClient, PROMPT_VERSION
+from .rule_engine import RULE_ANALYSIS_PREFIX
+from .emotion_cache import EmotionResultCache
+from .local_classifier import LLMResultRecorder, LocalEmotionClassifier
+from .config import CascadeConfig
 
 logger = logging.getLogger(__name__)
 
+ANALYSIS_TIERS = ["cache", "rules", "classifier", "llm", "fallback"]
+# 升级到LLM的原因：规则层未命中/命中太弱/主要情绪占比不足，分类器前两名太接近/置信度不足
+ESCALATION_REASONS = ["too_long", "no_hits", "weak_hits", "low_share", "low_margin", "low_confidence", "no_local_tier"]
+
 
 class EmotionInferenceEngine:
     """Eme0 情感引擎主类"""
     
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, cache: Optional[EmotionResultCache] = None,
+                 recorder: Optional[LLMResultRecorder] = None, classifier: Optional[LocalEmotionClassifier] = None,
+                 cascade: Optional[CascadeConfig] = None):
         self.llm_client = llm_client
+        self.cache = cache
+        self.recorder = recorder  # 记录LLM结果，用作本地分类器的训练数据
+        self.classifier = classifier
+        self.cascade = cascade or CascadeConfig()
+        self._inflight: Dict[str, asyncio.Future] = {}  # {内容键: 进行中的LLM分析}
+        self.coalesced_requests = 0  # 合并到已有请求的调用次数
+        self.tier_counts = {tier: 0 for tier in ANALYSIS_TIERS}  # 各分析层给出的结果数
+        self.escalations = {reason: 0 for reason in ESCALATION_REASONS}  # 升级到LLM的原因统计
     
     async def analyze_emotion(self, dialogue_turn: str, user_id: str, session_id: str = "") -> EmotionResult:
         """分析情绪"""
         logger.info(f"开始情绪分析: {user_id}/{session_id}")
         
         try:
-            # 调用百度千帆API分析情绪
-            emotion_result = await self.llm_client.analyze_emotion(dialogue_turn, user_id, session_id)
+            content_key = self._content_key(dialogue_turn)
+            if self.cache is not None:
+                cached_result = self.cache.get(content_key)
+                if cached_result is not None:
+                    logger.info(f"情绪分析命中缓存: {cached_result.primary_emotion}({cached_result.emotion_intensity})")
+                    return self._answered(cached_result, "cache")
+            
+            # 分层分析：本地分析层置信度足够时不调用LLM
+            local_result = self._analyze_locally(dialogue_turn)
+            if local_result is not None:
+                logger.info(f"情绪分析由{local_result.analysis_tier}层给出: "
+                            f"{local_result.primary_emotion}({local_result.emotion_intensity}), 置信度={local_result.confidence:.2f}")
+                return local_result
+            
+            # 相同内容的分析正在进行时直接复用，避免重复调用LLM
+            inflight = self._inflight.get(content_key)
+            if inflight is not None:
+                self.coalesced_requests += 1
+                logger.info(f"情绪分析合并到进行中的请求: {user_id}/{session_id}")
+                shared_result = await asyncio.shield(inflight)
+                return shared_result.model_copy(deep=True, update={"timestamp": datetime.now().isoformat()})
+            
+            # 调用百度千帆API分析情绪（独立任务，发起方取消时不影响其他等待者）
+            inflight = asyncio.ensure_future(self._analyze_and_cache(content_key, dialogue_turn, user_id, session_id))
+            self._inflight[content_key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(content_key, None))
+            emotion_result = (await asyncio.shield(inflight)).model_copy(deep=True)
             
             logger.info(f"情绪分析完成: {emotion_result.primary_emotion}({emotion_result.emotion_intensity}))")
             
@@ -32,4 +77,144 @@ class EmotionInferenceEngine:
                 emotion_intensity=0.5,
                 emotion_keywords=[],
                 raw_llm_response=f"分析过程出错: {str(e)}"
-            )
\ No newline at end of file
+            )
+    
+    def analyze_emotion_by_rules(self, dialogue_turn: str) -> EmotionResult:
+        """快速规则分析，用于LLM未能在延迟预算内返回或分析失败时的结果（作为应答返回时由调用方用record_answer计数）"""
+        emotion_result = self.llm_client.analyze_emotion_by_rules(dialogue_turn)
+        emotion_result.analysis_tier = "rules"
+        return emotion_result
+    
+    async def analyze_emotions_batch(self, turns: List[str], user_id: str, session_id: str = "") -> List[EmotionResult]:
+        """批量分析多轮对话情绪"""
+        logger.info(f"开始批量情绪分析: {user_id}/{session_id}, 对话条数={len(turns)}")
+        
+        try:
+            # 先查缓存，只把未命中的对话发送给LLM
+            emotion_results: List[Optional[EmotionResult]] = [None] * len(turns)
+            content_keys = [self._content_key(turn) for turn in turns]
+            pending = []
+            for i, content_key in enumerate(content_keys):
+                cached_result = self.cache.get(content_key) if self.cache is not None else None
+                if cached_result is not None:
+                    emotion_results[i] = self._answered(cached_result, "cache")
+                else:
+                    emotion_results[i] = self._analyze_locally(turns[i])
+                if emotion_results[i] is None:
+                    pending.append(i)
+            
+            if pending:
+                llm_results = await self.llm_client.analyze_emotions_batch(
+                    [turns[i] for i in pending], user_id, session_id
+                )
+                for i, emotion_result in zip(pending, llm_results):
+                    self._store_llm_result(content_keys[i], turns[i], emotion_result)
+                    emotion_results[i] = self._answered(emotion_result, self._llm_tier(emotion_result))
+            
+            logger.info(f"批量情绪分析完成: {len(emotion_results)}条, LLM分析{len(pending)}条")
+            
+            return emotion_results
+        except Exception as e:
+            logger.error(f"批量情绪分析失败: {e}")
+            return [
+                EmotionResult(
+                    primary_emotion="unknown",
+                    emotion_intensity=0.5,
+                    emotion_keywords=[],
+                    raw_llm_response=f"分析过程出错: {str(e)}"
+                )
+                for _ in turns
+            ]
+    
+    async def _analyze_and_cache(self, content_key: str, dialogue_turn: str, user_id: str, session_id: str) -> EmotionResult:
+        """调用LLM分析情绪并写入缓存"""
+        emotion_result = await self.llm_client.analyze_emotion(dialogue_turn, user_id, session_id)
+        self._store_llm_result(content_key, dialogue_turn, emotion_result)
+        return self._answered(emotion_result, self._llm_tier(emotion_result))
+    
+    def _analyze_locally(self, dialogue_turn: str) -> Optional[EmotionResult]:
+        """依次尝试本地分析层，置信度足够时返回结果，否则返回None（升级到LLM）"""
+        if not self.cascade.enabled:
+            return None
+        
+        if len(dialogue_turn) > self.cascade.max_local_chars:
+            self.escalations["too_long"] += 1
+            return None
+        
+        reason = "no_local_tier"
+        for tier in self.cascade.tiers:
+            if tier == "rules":
+                rule_engine = self.llm_client.rule_engine
+                score = rule_engine.score(dialogue_turn)
+                if not score.scores:
+                    reason = "no_hits"
+                elif (score.primary_score < self.cascade.rule_min_score
+                      or score.coverage(dialogue_turn) < self.cascade.rule_min_coverage):
+                    # 只有弱化的情绪词，或情绪词在长文本中只占很小一部分
+                    reason = "weak_hits"
+                elif score.confidence < self.cascade.rule_confidence_threshold:
+                    # 多种情绪同时命中，主要情绪占比不足
+                    reason = "low_share"
+                else:
+                    return self._answered(rule_engine.to_result(score), "rules")
+            elif tier == "classifier" and self.classifier is not None:
+                prediction = self.classifier.predict(dialogue_turn)
+                top, second = sorted(prediction.probabilities.values(), reverse=True)[:2]
+                if top - second < self.cascade.classifier_min_margin:
+                    reason = "low_margin"
+                elif prediction.confidence < self.cascade.classifier_confidence_threshold:
+                    reason = "low_confidence"
+                else:
+                    return self._answered(self.classifier.to_result(prediction), "classifier")
+        
+        self.escalations[reason] += 1
+        return None
+    
+    def _answered(self, emotion_result: EmotionResult, tier: str) -> EmotionResult:
+        """记录给出结果的分析层"""
+        emotion_result.analysis_tier = tier
+        self.record_answer(tier)
+        return emotion_result
+    
+    def record_answer(self, tier: str):
+        """记录一次由该分析层给出的应答"""
+        self.tier_counts[tier] += 1
+    
+    def _llm_tier(self, emotion_result: EmotionResult) -> str:
+        """LLM调用的结果来源：LLM本身，或LLM不可用时的规则降级"""
+        return "llm" if self._is_cacheable(emotion_result) else "fallback"
+    
+    def get_cascade_stats(self) -> Dict[str, Any]:
+        """分层分析统计"""
+        answered = sum(self.tier_counts.values())
+        return {
+            "enabled": self.cascade.enabled,
+            "tiers": self.cascade.tiers,
+            "classifier_loaded": self.classifier is not None,
+            "tier_counts": dict(self.tier_counts),
+            "escalations": dict(self.escalations),
+            "llm_share": round((self.tier_counts["llm"] + self.tier_counts["fallback"]) / answered, 3) if answered else 0.0
+        }
+    
+    def _store_llm_result(self, content_key: str, dialogue_turn: str, emotion_result: EmotionResult):
+        """LLM结果写入缓存，并记录为分类器训练数据"""
+        if not self._is_cacheable(emotion_result):
+            return
+        if self.cache is not None:
+            self.cache.put(content_key, emotion_result)
+        if self.recorder is not None:
+            try:
+                self.recorder.record(dialogue_turn, emotion_result)
+            except OSError as e:
+                logger.warning(f"记录LLM结果失败: {e}")
+    
+    def _content_key(self, dialogue_turn: str) -> str:
+        """计算对话内容键（缓存和请求合并共用）"""
+        return EmotionResultCache.make_key(dialogue_turn, self.llm_client.config.model_name, PROMPT_VERSION)
+    
+    def _is_cacheable(self, emotion_result: EmotionResult) -> bool:
+        """只缓存LLM给出的结果，规则降级结果不缓存，以便LLM恢复后重新分析"""
+        if emotion_result.primary_emotion == "unknown":
+            return False
+        raw = emotion_result.raw_llm_response or ""
+        return not raw.startswith(RULE_ANALYSIS_PREFIX)
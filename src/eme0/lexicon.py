@@ -0,0 +1,178 @@
+"""外部情绪词典加载与热更新
+
+词典文件为JSON格式，每个文件对应一种语言:
+
+    {
+        "language": "zh",
+        "emotions": {"happiness": {"开心": 1.0, "高兴": 1.2}, "sadness": ["难过", "伤心"]},
+        "negators": ["不", "没有"],
+        "intensifiers": {"非常": 1.5}
+    }
+
+emotions中的关键词可以是 {关键词: 权重} 或关键词列表（权重为1.0）。
+配置的路径可以是单个文件或包含多个 *.json 文件的目录，多个文件按文件名顺序合并。
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .rule_engine import RuleEmotionEngine, DEFAULT_EMOTION_LEXICON, DEFAULT_NEGATORS, DEFAULT_INTENSIFIERS
+
+logger = logging.getLogger(__name__)
+
+
+def _lexicon_files(path: str) -> List[str]:
+    """列出路径下的词典文件"""
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.endswith(".json")
+        )
+    return [path]
+
+
+def load_lexicon_file(path: str) -> Dict[str, Any]:
+    """读取并校验单个词典文件"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    
+    if not isinstance(data, dict) or not isinstance(data.get("emotions"), dict):
+        raise ValueError(f"词典文件缺少emotions字段: {path}")
+    
+    emotions: Dict[str, Dict[str, float]] = {}
+    for emotion, words in data["emotions"].items():
+        if emotion not in DEFAULT_EMOTION_LEXICON:
+            raise ValueError(f"词典文件包含未知情绪 {emotion}: {path}")
+        if isinstance(words, list):
+            words = {word: 1.0 for word in words}
+        emotions[emotion] = {str(word): float(weight) for word, weight in words.items() if word}
+    
+    return {
+        "language": data.get("language", os.path.splitext(os.path.basename(path))[0]),
+        "emotions": emotions,
+        "negators": [str(word) for word in data.get("negators", []) if word],
+        "intensifiers": {str(word): float(factor) for word, factor in data.get("intensifiers", {}).items() if word}
+    }
+
+
+def merge_lexicons(specs: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, float]], List[str], Dict[str, float]]:
+    """合并多个语言的词典，同一关键词以后加载的文件为准"""
+    # 情绪顺序与内置词典一致，保证同分时的判定规则不变
+    lexicon: Dict[str, Dict[str, float]] = {emotion: {} for emotion in DEFAULT_EMOTION_LEXICON}
+    negators: List[str] = []
+    intensifiers: Dict[str, float] = {}
+    for spec in specs:
+        for emotion, words in spec["emotions"].items():
+            lexicon[emotion].update(words)
+        for word in spec["negators"]:
+            if word not in negators:
+                negators.append(word)
+        intensifiers.update(spec["intensifiers"])
+    
+    # 未提供否定词/程度副词时沿用内置列表
+    return lexicon, negators or list(DEFAULT_NEGATORS), intensifiers or dict(DEFAULT_INTENSIFIERS)
+
+
+class LexiconManager:
+    """管理规则引擎词典：编译一次，文件变化或手动触发时原子替换"""
+    
+    def __init__(self, path: Optional[str] = None, reload_interval: float = 5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        started = time.perf_counter()
+        self.engine = RuleEmotionEngine()
+        self.compile_ms = (time.perf_counter() - started) * 1000
+        self.languages: List[str] = ["builtin"]
+        self.version = 0  # 每次成功替换词典后递增
+        self.reload_count = 0
+        self.reload_errors = 0
+        self.last_error: Optional[str] = None
+        self.last_reload_at: Optional[float] = None
+        self._fingerprint: Optional[Tuple] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        
+        if path:
+            self.reload(force=True)
+    
+    def _current_fingerprint(self) -> Tuple:
+        """词典文件的 (路径, 修改时间, 大小) 列表，用于检测变化"""
+        fingerprint = []
+        for file_path in _lexicon_files(self.path):
+            stat = os.stat(file_path)
+            fingerprint.append((file_path, stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+    
+    def reload(self, force: bool = False) -> bool:
+        """重新加载词典，返回是否替换了引擎；加载失败时保留当前引擎"""
+        if not self.path:
+            return False
+        
+        try:
+            fingerprint = self._current_fingerprint()
+            if not force and fingerprint == self._fingerprint:
+                return False
+            # 记录本次看到的文件版本，内容有误时不会每次轮询都重复加载
+            self._fingerprint = fingerprint
+            
+            specs = [load_lexicon_file(file_path) for file_path, _, _ in fingerprint]
+            if not specs:
+                raise ValueError(f"未找到词典文件: {self.path}")
+            lexicon, negators, intensifiers = merge_lexicons(specs)
+            
+            started = time.perf_counter()
+            engine = RuleEmotionEngine(lexicon, negators, intensifiers)
+            compile_ms = (time.perf_counter() - started) * 1000
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            self.reload_errors += 1
+            if str(e) != self.last_error:
+                logger.error(f"加载情绪词典失败，继续使用当前词典: {e}")
+            self.last_error = str(e)
+            return False
+        
+        # 引用赋值是原子的，正在使用旧引擎的调用不受影响
+        self.engine = engine
+        self.languages = [spec["language"] for spec in specs]
+        self.compile_ms = compile_ms
+        self.version += 1
+        self.reload_count += 1
+        self.last_error = None
+        self.last_reload_at = time.time()
+        logger.info(f"情绪词典已加载: 语言={self.languages}, 关键词={engine.keyword_count}, 编译耗时={compile_ms:.2f}ms")
+        return True
+    
+    def start_watching(self):
+        """启动后台轮询，文件变化时自动重新加载"""
+        if not self.path or self.reload_interval <= 0 or self._watch_task:
+            return
+        self._watch_task = asyncio.ensure_future(self._watch_loop())
+    
+    async def _watch_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            self.reload()
+    
+    def stop(self):
+        """停止后台轮询"""
+        if self._watch_task:
+            self._watch_task.cancel()
+            self._watch_task = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """词典状态"""
+        return {
+            "path": self.path,
+            "languages": self.languages,
+            "version": self.version,
+            "keywords": self.engine.keyword_count,
+            "negators": len(self.engine.negators),
+            "intensifiers": len(self.engine.intensifiers),
+            "automaton_states": self.engine.automaton.size,
+            "compile_ms": round(self.compile_ms, 3),
+            "reload_count": self.reload_count,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error,
+            "last_reload_at": self.last_reload_at
+        }
@@ -0,0 +1,120 @@
+"""LLM后端定义：千帆、纯规则和本地HTTP模拟"""
+from typing import Any, Dict, Protocol
+
+
+class LLMBackend(Protocol):
+    """LLM后端协议：描述请求发往哪里以及请求的格式，传输、重试和熔断由LLMClient负责"""
+    
+    name: str
+    endpoint: str
+    
+    @property
+    def available(self) -> bool:
+        """后端是否可用（不可用时LLMClient直接使用规则分析）"""
+        ...
+    
+    def build_payload(self, prompt: str) -> Dict[str, Any]:
+        """构造chat/completions请求体"""
+        ...
+    
+    def build_headers(self) -> Dict[str, str]:
+        """构造请求头"""
+        ...
+
+
+class QianfanBackend:
+    """百度千帆chat/completions后端"""
+    
+    name = "qianfan"
+    
+    def __init__(self, config):
+        self.config = config
+        self.endpoint = config.endpoint
+    
+    @property
+    def available(self) -> bool:
+        return bool(self.config.api_key)
+    
+    def build_payload(self, prompt: str) -> Dict[str, Any]:
+        return {
+            "model": self.config.model_name,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "web_search": {
+                "enable": False,
+                "enable_citation": False,
+                "enable_trace": False
+            },
+            "plugin_options": {}
+        }
+    
+    def build_headers(self) -> Dict[str, str]:
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.config.api_key}"
+        }
+        
+        # 如果配置了appid，添加appid头
+        if getattr(self.config, "appid", None):
+            headers["appid"] = self.config.appid
+        
+        return headers
+
+
+class MockBackend(QianfanBackend):
+    """本地模拟千帆接口的后端（用于离线压测和故障复现）"""
+    
+    name = "mock"
+    
+    def __init__(self, config):
+        super().__init__(config)
+        self.endpoint = getattr(config, "mock_endpoint", "http://127.0.0.1:8765/v2/chat/completions")
+    
+    @property
+    def available(self) -> bool:
+        return True
+    
+    def build_headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": "Bearer mock"
+        }
+
+
+class RuleOnlyBackend:
+    """纯规则后端，不调用任何LLM"""
+    
+    name = "rule"
+    endpoint = ""
+    
+    def __init__(self, config=None):
+        self.config = config
+    
+    @property
+    def available(self) -> bool:
+        return False
+    
+    def build_payload(self, prompt: str) -> Dict[str, Any]:
+        raise RuntimeError("规则后端不发送LLM请求")
+    
+    def build_headers(self) -> Dict[str, str]:
+        raise RuntimeError("规则后端不发送LLM请求")
+
+
+BACKENDS = {
+    QianfanBackend.name: QianfanBackend,
+    MockBackend.name: MockBackend,
+    RuleOnlyBackend.name: RuleOnlyBackend
+}
+
+
+def create_backend(config) -> LLMBackend:
+    """根据配置创建LLM后端"""
+    name = getattr(config, "backend", QianfanBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"未知的LLM后端: {name}，可选: {', '.join(BACKENDS)}")
+    return BACKENDS[name](config)
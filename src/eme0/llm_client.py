@@ -3,79 +3,393 @@ import asyncio
 import aiohttp
 import json
 import logging
+import time
+from typing import Any, Dict, List, Optional
 
 from .schemas import EmotionResult
+from .rate_limiter import TokenBucket, AdaptiveConcurrencyLimiter, LimiterOverloadError, parse_retry_after, backoff_delay
+from .circuit_breaker import CircuitBreaker, STATE_CLOSED
+from .llm_backends import LLMBackend, create_backend
+from .rule_engine import RuleEmotionEngine, RULE_ANALYSIS_PREFIX
+from .lexicon import LexiconManager
 
 logger = logging.getLogger(__name__)
 
+# prompt版本号，修改情绪分析prompt时需要同步更新，使旧的缓存结果失效
+PROMPT_VERSION = "v1"
+
+
+class _JsonEndDetector:
+    """增量检测流式输出中第一个完整的JSON对象/数组是否已经闭合"""
+    
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, text: str) -> bool:
+        """输入新的文本片段，JSON闭合时返回True"""
+        for ch in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                if self.started:
+                    self.in_string = True
+            elif ch in "{[":
+                self.started = True
+                self.depth += 1
+            elif ch in "}]" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
 
 class LLMClient:
     """百度千帆LLM客户端"""
     
-    def __init__(self, config):
+    def __init__(self, config, backend: Optional[LLMBackend] = None, lexicon: Optional[LexiconManager] = None):
         self.config = config
+        self.backend = backend or create_backend(config)
+        self.lexicon = lexicon or LexiconManager()
+        self._session: Optional[aiohttp.ClientSession] = None
+        max_wait = getattr(config, "limiter_max_wait", 5.0)
+        self.rate_limiter = TokenBucket(
+            rate=getattr(config, "rate_limit_qps", 0.0),
+            capacity=getattr(config, "rate_limit_burst", 20),
+            max_wait=max_wait
+        )
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=getattr(config, "initial_concurrency", 8),
+            min_limit=getattr(config, "min_concurrency", 1),
+            max_limit=getattr(config, "max_concurrency", 64),
+            max_wait=max_wait
+        )
+        self.retry_count = 0  # 累计重试次数
+        self.circuit_breaker = CircuitBreaker(
+            failure_rate_threshold=getattr(config, "breaker_failure_rate", 0.5),
+            slow_call_seconds=getattr(config, "breaker_slow_call_seconds", 10.0),
+            window_size=getattr(config, "breaker_window_size", 20),
+            min_calls=getattr(config, "breaker_min_calls", 5),
+            open_seconds=getattr(config, "breaker_open_seconds", 30.0)
+        )
+        self._probe_task: Optional[asyncio.Task] = None
+        self.stream_stats = {
+            "streams": 0,
+            "early_terminated": 0,
+            "connections_closed": 0,  # 提前结束时主动断开、不能放回连接池复用的连接数
+            "ttft_total": 0.0,
+            "stream_time_total": 0.0,
+            "last_ttft": None,
+            "last_stream_time": None
+        }
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享的连接池会话（首次调用时创建）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=getattr(self.config, "pool_limit", 100),
+                limit_per_host=getattr(self.config, "pool_limit_per_host", 20),
+                keepalive_timeout=getattr(self.config, "keepalive_timeout", 30.0),
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            logger.debug("已创建千帆API连接池会话")
+        return self._session
+    
+    @property
+    def rule_engine(self) -> RuleEmotionEngine:
+        """当前生效的规则引擎（词典热更新后自动切换）"""
+        return self.lexicon.engine
+    
+    async def warm_up(self):
+        """预热连接池，提前完成DNS解析和TCP/TLS握手"""
+        if not self.backend.available:
+            return
+        
+        session = self._get_session()
+        count = max(1, getattr(self.config, "warmup_connections", 1))
+        
+        async def _open_connection():
+            # 任意响应状态都可以，目的只是建立可复用的长连接
+            async with session.head(self.backend.endpoint, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                await response.read()
+        
+        results = await asyncio.gather(*(_open_connection() for _ in range(count)), return_exceptions=True)
+        failures = [r for r in results if isinstance(r, Exception)]
+        if failures:
+            logger.warning(f"千帆API连接池预热失败: {failures[0]}")
+        else:
+            logger.info(f"千帆API连接池预热完成: {count}个连接")
+    
+    async def close(self):
+        """关闭连接池会话"""
+        if self._probe_task is not None and not self._probe_task.done():
+            self._probe_task.cancel()
+        self._probe_task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     async def analyze_emotion(self, dialogue_turn: str, user_id: str, session_id: str = "") -> EmotionResult:
         """使用千帆大模型分析情绪"""
-        if not self.config.api_key:
-            logger.warning("千帆API密钥未配置，使用规则分析")
-            return await self._fallback_rule_analysis(dialogue_turn)
+        if not self.backend.available:
+            logger.warning(f"LLM后端不可用({self.backend.name})，使用规则分析")
+            return self._fallback_rule_analysis(dialogue_turn)
         
         try:
             # 构造情绪分析prompt
             prompt = self._build_emotion_prompt(dialogue_turn)
             
-            # 使用新的API格式 - 直接使用Bearer token认证
-            url = "https://qianfan.baidubce.com/v2/chat/completions"
-            
-            payload = {
-                "model": "ernie-4.5-turbo-128k",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "web_search": {
-                    "enable": False,
-                    "enable_citation": False,
-                    "enable_trace": False
-                },
-                "plugin_options": {}
-            }
+            result_text = await self._request_completion(prompt)
+            if result_text is None:
+                return self._fallback_rule_analysis(dialogue_turn)
             
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.config.api_key}"
-            }
-            # print(self.config.api_key)
-            
-            # 如果配置了appid，添加appid头
-            if hasattr(self.config, 'appid') and self.config.appid:
-                headers["appid"] = self.config.appid
+            return self._parse_emotion_result(result_text, dialogue_turn)
+        
+        except Exception as e:
+            logger.error(f"千帆API调用异常: {e}")
+            return self._fallback_rule_analysis(dialogue_turn)
+    
+    async def analyze_emotions_batch(self, turns: List[str], user_id: str, session_id: str = "") -> List[EmotionResult]:
+        """在一次千帆调用中批量分析多轮对话的情绪"""
+        if not turns:
+            return []
+        
+        if not self.backend.available:
+            logger.warning(f"LLM后端不可用({self.backend.name})，使用规则分析")
+            return self.analyze_emotions_by_rules(turns)
+        
+        # 超过单次批量上限时拆分为多个请求并发执行
+        batch_size = max(1, getattr(self.config, "max_batch_size", 20))
+        chunks = [turns[i:i + batch_size] for i in range(0, len(turns), batch_size)]
+        chunk_results = await asyncio.gather(*(self._analyze_batch_chunk(chunk) for chunk in chunks))
+        
+        return [result for chunk_result in chunk_results for result in chunk_result]
+    
+    async def _analyze_batch_chunk(self, turns: List[str]) -> List[EmotionResult]:
+        """分析一个批次的对话"""
+        try:
+            prompt = self._build_batch_emotion_prompt(turns)
+            result_text = await self._request_completion(prompt)
+        except Exception as e:
+            logger.error(f"千帆API批量调用异常: {e}")
+            result_text = None
+        
+        if result_text is None:
+            return self.analyze_emotions_by_rules(turns)
+        
+        return self._parse_batch_emotion_result(result_text, turns)
+    
+    async def _request_completion(self, prompt: str) -> Optional[str]:
+        """调用千帆chat/completions接口，返回模型输出文本；接口返回错误或熔断时返回None"""
+        url = self.backend.endpoint
+        payload = self.backend.build_payload(prompt)
+        headers = self.backend.build_headers()
+        stream = getattr(self.config, "stream", False)
+        if stream:
+            payload["stream"] = True
+        
+        session = self._get_session()
+        timeout = aiohttp.ClientTimeout(total=getattr(self.config, "request_timeout", 30.0))
+        max_retries = max(0, getattr(self.config, "max_retries", 3))
+        base_delay = getattr(self.config, "retry_base_delay", 0.5)
+        max_delay = getattr(self.config, "retry_max_delay", 10.0)
+        
+        for attempt in range(max_retries + 1):
+            # 熔断器打开时不再调用后端，直接降级为规则分析
+            if not self.circuit_breaker.allow_request():
+                logger.warning("千帆API熔断中，跳过LLM调用")
+                return None
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=headers, timeout=aiohttp.ClientTimeout(total=300)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # 新API格式返回结果在choices字段中
-                        if "choices" in data and len(data["choices"]) > 0:
-                            choice = data["choices"][0]
-                            if "message" in choice and "content" in choice["message"]:
-                                result_text = choice["message"]["content"]
-                                return self._parse_emotion_result(result_text)
+            try:
+                await self.rate_limiter.acquire()
+                async with self.concurrency_limiter:
+                    # 从发出请求开始计时，本地排队等待的时间不计入慢调用和首token耗时
+                    started = time.monotonic()
+                    async with session.post(url, json=payload, headers=headers, timeout=timeout) as response:
+                        if response.status == 200:
+                            if stream:
+                                result_text = await self._read_stream(response, started)
+                            else:
+                                result_text = self._extract_completion_text(await response.json())
+                            self.concurrency_limiter.on_success()
+                            self.circuit_breaker.record_success(time.monotonic() - started)
+                            return result_text
                         
-                        # 如果新格式解析失败，尝试旧格式
-                        result_text = data.get("result", "")
-                        return self._parse_emotion_result(result_text)
-                    else:
+                        status = response.status
                         error_text = await response.text()
-                        logger.error(f"千帆API调用失败: {response.status} - {error_text}")
-                        return await self._fallback_rule_analysis(dialogue_turn)
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            except LimiterOverloadError as e:
+                # 本地排队过长，后端本身没有失败，不计入熔断和并发调整，直接降级
+                logger.warning(f"千帆API本地排队过长，使用规则分析: {e}")
+                return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.concurrency_limiter.on_overload()
+                self._record_backend_failure()
+                if attempt >= max_retries:
+                    raise
+                delay = backoff_delay(attempt, base_delay, max_delay)
+                self.retry_count += 1
+                logger.warning(f"千帆API调用异常: {e}，{delay:.2f}秒后第{attempt + 1}次重试")
+                await asyncio.sleep(delay)
+                continue
+            
+            # 限流和服务端错误可重试，其他错误直接返回
+            if status == 429 or status >= 500:
+                self.concurrency_limiter.on_overload()
+                self._record_backend_failure()
+                if attempt < max_retries:
+                    delay = backoff_delay(attempt, base_delay, max_delay, retry_after)
+                    self.retry_count += 1
+                    logger.warning(f"千帆API调用失败: {status}，{delay:.2f}秒后第{attempt + 1}次重试")
+                    await asyncio.sleep(delay)
+                    continue
+            else:
+                # 请求本身有误（如鉴权失败），后端是健康的
+                self.circuit_breaker.record_success(time.monotonic() - started)
+            
+            logger.error(f"千帆API调用失败: {status} - {error_text}")
+            return None
         
-        except Exception as e:
-            logger.error(f"千帆API调用异常: {e}")
-            return await self._fallback_rule_analysis(dialogue_turn)
+        return None
+    
+    def _record_backend_failure(self):
+        """记录后端失败，熔断器打开时启动后台探测"""
+        self.circuit_breaker.record_failure()
+        if self.circuit_breaker.state != STATE_CLOSED and (self._probe_task is None or self._probe_task.done()):
+            self._probe_task = asyncio.ensure_future(self._probe_loop())
+    
+    async def _probe_loop(self):
+        """熔断期间定期发送探测请求，后端恢复后关闭熔断器"""
+        url = self.backend.endpoint
+        payload = self.backend.build_payload("你好")
+        payload["max_completion_tokens"] = 2
+        timeout = aiohttp.ClientTimeout(total=getattr(self.config, "request_timeout", 30.0))
+        
+        while self.circuit_breaker.state != STATE_CLOSED:
+            await asyncio.sleep(self.circuit_breaker.open_seconds)
+            if not self.circuit_breaker.allow_request():
+                continue
+            
+            started = time.monotonic()
+            try:
+                async with self._get_session().post(url, json=payload, headers=self.backend.build_headers(), timeout=timeout) as response:
+                    await response.read()
+                    healthy = response.status != 429 and response.status < 500
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                healthy = False
+            
+            if healthy:
+                self.circuit_breaker.record_success(time.monotonic() - started)
+            else:
+                self.circuit_breaker.record_failure()
+            logger.info(f"千帆熔断探测完成: {'成功' if healthy else '失败'}, 熔断器状态={self.circuit_breaker.state}")
+    
+    async def _read_stream(self, response: aiohttp.ClientResponse, started: float) -> str:
+        """增量解析SSE流，JSON结果闭合后立即停止读取并断开流"""
+        chunks = []
+        detector = _JsonEndDetector()
+        first_token_at = None
+        early_terminated = False
+        
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8", errors="ignore").strip()
+            if not line.startswith("data:"):
+                continue
+            
+            data_str = line[len("data:"):].strip()
+            if data_str == "[DONE]":
+                break
+            
+            try:
+                data = json.loads(data_str)
+            except json.JSONDecodeError:
+                continue
+            
+            choices = data.get("choices") or []
+            delta = choices[0].get("delta", {}) if choices else {}
+            content = delta.get("content") or data.get("result", "")
+            if not content:
+                continue
+            
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            chunks.append(content)
+            
+            if detector.feed(content):
+                early_terminated = True
+                break
+        
+        if early_terminated:
+            # 不再读取剩余token，直接断开连接：排空剩余流虽然能复用keep-alive连接，
+            # 但要等服务端生成完全部token；断开让服务端停止生成，代价是下次请求重新建连，计入统计
+            response.close()
+            self.stream_stats["connections_closed"] += 1
+        
+        self._record_stream_timing(started, first_token_at, early_terminated)
+        return "".join(chunks)
+    
+    def _record_stream_timing(self, started: float, first_token_at: Optional[float], early_terminated: bool):
+        """记录首token耗时和流总耗时"""
+        now = time.monotonic()
+        ttft = (first_token_at - started) if first_token_at is not None else now - started
+        stream_time = now - started
+        
+        stats = self.stream_stats
+        stats["streams"] += 1
+        stats["early_terminated"] += int(early_terminated)
+        stats["ttft_total"] += ttft
+        stats["stream_time_total"] += stream_time
+        stats["last_ttft"] = ttft
+        stats["last_stream_time"] = stream_time
+        logger.debug(f"千帆流式响应: 首token耗时={ttft * 1000:.1f}ms, 总耗时={stream_time * 1000:.1f}ms, 提前结束={early_terminated}")
+    
+    def get_stream_timings(self) -> Dict[str, Any]:
+        """获取流式响应耗时统计（毫秒）"""
+        stats = self.stream_stats
+        streams = stats["streams"]
+        return {
+            "enabled": getattr(self.config, "stream", False),
+            "streams": streams,
+            "early_terminated": stats["early_terminated"],
+            "connections_closed": stats["connections_closed"],
+            "avg_ttft_ms": stats["ttft_total"] / streams * 1000 if streams else None,
+            "avg_stream_ms": stats["stream_time_total"] / streams * 1000 if streams else None,
+            "last_ttft_ms": stats["last_ttft"] * 1000 if stats["last_ttft"] is not None else None,
+            "last_stream_ms": stats["last_stream_time"] * 1000 if stats["last_stream_time"] is not None else None
+        }
+    
+    def _extract_completion_text(self, data: Dict[str, Any]) -> str:
+        """从接口响应中提取模型输出文本"""
+        # 新API格式返回结果在choices字段中
+        if "choices" in data and len(data["choices"]) > 0:
+            choice = data["choices"][0]
+            if "message" in choice and "content" in choice["message"]:
+                return choice["message"]["content"]
+        
+        # 如果新格式解析失败，尝试旧格式
+        return data.get("result", "")
+    
+    def get_limits(self) -> Dict[str, Any]:
+        """获取当前限流、并发和重试状态"""
+        rate_stats = self.rate_limiter.stats()
+        concurrency_stats = self.concurrency_limiter.stats()
+        return {
+            "backend": self.backend.name,
+            "rate_limit": rate_stats,
+            "concurrency": concurrency_stats,
+            "queue_depth": rate_stats["waiting"] + concurrency_stats["waiting"],
+            "overload_rejected": rate_stats["rejected"] + concurrency_stats["rejected"],
+            "max_retries": getattr(self.config, "max_retries", 3),
+            "total_retries": self.retry_count
+        }
     
     def _build_emotion_prompt(self, dialogue: str) -> str:
         """构造情绪分析的prompt"""
@@ -93,7 +407,25 @@ class LLMClient:
 
 请直接返回JSON，不要包含其他文字。"""
     
-    def _parse_emotion_result(self, llm_response: str) -> EmotionResult:
+    def _build_batch_emotion_prompt(self, turns: List[str]) -> str:
+        """构造多轮对话批量情绪分析的prompt"""
+        numbered_turns = "\n".join(f"{i}. {turn}" for i, turn in enumerate(turns, 1))
+        return f"""请逐条分析以下{len(turns)}条对话中的情绪，并返回JSON数组格式的结果：
+
+对话内容：
+{numbered_turns}
+
+请返回与对话条数相同、顺序一致的JSON数组，每个元素格式如下：
+{{
+    "index": 对话编号（从1开始）,
+    "primary_emotion": "主要情绪（选择：happiness, sadness, anger, fear, surprise, neutral之一）",
+    "emotion_intensity": 情绪强度（0.0-1.0之间的数值），
+    "emotion_keywords": ["提取的情绪关键词1", "关键词2"]
+}}
+
+请直接返回JSON数组，不要包含其他文字。"""
+    
+    def _parse_emotion_result(self, llm_response: str, dialogue: Optional[str] = None) -> EmotionResult:
         """解析LLM返回的情绪分析结果"""
         try:
             # 尝试解析JSON
@@ -103,62 +435,88 @@ class LLMClient:
                 json_str = llm_response[start:end]
                 data = json.loads(json_str)
                 
-                primary_emotion = data.get("primary_emotion", "neutral")
-                emotion_intensity = float(data.get("emotion_intensity", 0.5))
-                emotion_keywords = data.get("emotion_keywords", [])
-                
-                # 验证和标准化
-                valid_emotions = ["happiness", "sadness", "anger", "fear", "surprise", "neutral"]
-                if primary_emotion not in valid_emotions:
-                    primary_emotion = "neutral"
-                
-                emotion_intensity = max(0.0, min(1.0, emotion_intensity))
-                
-                if not isinstance(emotion_keywords, list):
-                    emotion_keywords = []
-                
-                return EmotionResult(
-                    primary_emotion=primary_emotion,
-                    emotion_intensity=emotion_intensity,
-                    emotion_keywords=emotion_keywords,
-                    raw_llm_response=llm_response
-                )
+                return self._build_emotion_result(data, llm_response)
             else:
                 raise ValueError("响应不是有效的JSON格式")
         
         except Exception as e:
             logger.warning(f"解析LLM响应失败: {e}，使用规则分析")
-            # 如果解析失败，使用规则分析
-            return asyncio.create_task(self._fallback_rule_analysis(llm_response)).result()
+            # 如果解析失败，对原始对话使用规则分析
+            return self._fallback_rule_analysis(dialogue if dialogue is not None else llm_response)
     
-    async def _fallback_rule_analysis(self, dialogue: str) -> EmotionResult:
-        """备用规则分析"""
-        text = dialogue.lower()
-        
-        # 基础情绪关键词检测
-        emotion_keywords = {
-            "happiness": ["开心", "高兴", "快乐", "愉快", "兴奋", "满足", "棒", "太好了", "哈哈", "嘻嘻"],
-            "sadness": ["难过", "伤心", "失落", "沮丧", "不开心", "郁闷", "痛苦", "悲伤", "哭", "失望"],
-            "anger": ["生气", "愤怒", "恼火", "讨厌", "烦", "气死", "该死", "混蛋", "可恶", "操"],
-            "fear": ["害怕", "恐惧", "担心", "紧张", "焦虑", "不安", "恐慌", "忧虑", "怕", "慌"],
-            "surprise": ["惊讶", "意外", "震惊", "奇怪", "没想到", "居然", "天啊", "哇", "竟然"]
-        }
+    def _parse_batch_emotion_result(self, llm_response: str, turns: List[str]) -> List[EmotionResult]:
+        """解析批量情绪分析结果，无法解析的条目单独降级为规则分析"""
+        items: Dict[int, Dict[str, Any]] = {}
+        try:
+            start = llm_response.find("[")
+            end = llm_response.rfind("]") + 1
+            if start == -1 or end <= start:
+                raise ValueError("响应不是有效的JSON数组格式")
+            
+            data = json.loads(llm_response[start:end])
+            if not isinstance(data, list):
+                raise ValueError("响应不是有效的JSON数组格式")
+            
+            for position, item in enumerate(data, 1):
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    index = int(item.get("index", position))
+                except (TypeError, ValueError):
+                    index = position
+                items.setdefault(index, item)
+        except Exception as e:
+            logger.warning(f"解析批量LLM响应失败: {e}，使用规则分析")
+        
+        results: List[Optional[EmotionResult]] = []
+        for index in range(1, len(turns) + 1):
+            result = None
+            if index in items:
+                try:
+                    result = self._build_emotion_result(items[index], json.dumps(items[index], ensure_ascii=False))
+                except Exception as e:
+                    logger.warning(f"解析批量LLM响应第{index}条失败: {e}，使用规则分析")
+            results.append(result)
+        
+        # 缺失或无法解析的条目一起做批量规则分析
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            for i, result in zip(missing, self.analyze_emotions_by_rules([turns[i] for i in missing])):
+                results[i] = result
+        
+        return results
+    
+    def _build_emotion_result(self, data: Dict[str, Any], llm_response: str) -> EmotionResult:
+        """校验并标准化LLM返回的单条情绪数据"""
+        primary_emotion = data.get("primary_emotion", "neutral")
+        emotion_intensity = float(data.get("emotion_intensity", 0.5))
+        emotion_keywords = data.get("emotion_keywords", [])
         
-        primary_emotion = "neutral"
-        emotion_intensity = 0.3
-        detected_keywords = []
+        # 验证和标准化
+        valid_emotions = ["happiness", "sadness", "anger", "fear", "surprise", "neutral"]
+        if primary_emotion not in valid_emotions:
+            primary_emotion = "neutral"
         
-        # 检测情绪
-        for emotion, keywords in emotion_keywords.items():
-            for keyword in keywords:
-                if keyword in text:
-                    primary_emotion = emotion
-                    emotion_intensity = min(0.8, emotion_intensity + 0.15)
-                    detected_keywords.append(keyword)
+        emotion_intensity = max(0.0, min(1.0, emotion_intensity))
+        
+        if not isinstance(emotion_keywords, list):
+            emotion_keywords = []
         
         return EmotionResult(
             primary_emotion=primary_emotion,
             emotion_intensity=emotion_intensity,
-            emotion_keywords=detected_keywords,
-            raw_llm_response=f"规则分析结果: {primary_emotion}({emotion_intensity})"
-        )
\ No newline at end of file
+            emotion_keywords=emotion_keywords,
+            raw_llm_response=llm_response
+        )
+    
+    def analyze_emotion_by_rules(self, dialogue_turn: str) -> EmotionResult:
+        """只使用规则分析情绪（不调用LLM）"""
+        return self._fallback_rule_analysis(dialogue_turn)
+    
+    def analyze_emotions_by_rules(self, turns: List[str]) -> List[EmotionResult]:
+        """批量规则分析（一次扫描拼接后的文本并向量化打分，用于回填和批量降级）"""
+        return self.rule_engine.analyze_batch(turns)
+    
+    def _fallback_rule_analysis(self, dialogue: str) -> EmotionResult:
+        """备用规则分析"""
+        return self.rule_engine.analyze(dialogue)
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""本地轻量情绪分类器：字符n-gram哈希特征 + softmax线性模型（纯NumPy，CPU上微秒级推理）"""
+import json
+import logging
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .schemas import EmotionResult
+from .emotion_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# 分类器结果的原始输出前缀，用于区分分类器结果和LLM结果
+CLASSIFIER_ANALYSIS_PREFIX = "本地分类结果"
+
+EMOTION_LABELS = ["happiness", "sadness", "anger", "fear", "surprise", "neutral"]
+
+
+class HashedNgramFeaturizer:
+    """字符n-gram特征哈希（稳定的crc32哈希，不依赖词表）"""
+    
+    def __init__(self, n_features: int = 1 << 15, min_n: int = 1, max_n: int = 3):
+        self.n_features = n_features
+        self.min_n = min_n
+        self.max_n = max_n
+    
+    def transform(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """单条文本的稀疏特征 (特征下标, 特征值)，特征值为次线性词频并做L2归一化"""
+        text = normalize_text(text)
+        counts: Dict[int, int] = {}
+        n_features = self.n_features
+        for n in range(self.min_n, self.max_n + 1):
+            for i in range(len(text) - n + 1):
+                index = zlib.crc32(text[i:i + n].encode("utf-8")) % n_features
+                counts[index] = counts.get(index, 0) + 1
+        
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+        values /= np.sqrt(np.dot(values, values))
+        return indices, values
+    
+    def transform_batch(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """批量特征，返回CSR格式 (特征下标, 特征值, 行号)"""
+        all_indices = []
+        all_values = []
+        rows = []
+        for row, text in enumerate(texts):
+            indices, values = self.transform(text)
+            all_indices.append(indices)
+            all_values.append(values)
+            rows.append(np.full(len(indices), row, dtype=np.int64))
+        if not texts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(all_indices), np.concatenate(all_values), np.concatenate(rows)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class ClassifierPrediction:
+    """分类器预测结果"""
+    
+    __slots__ = ("primary_emotion", "emotion_intensity", "confidence", "probabilities")
+    
+    def __init__(self, primary_emotion: str, emotion_intensity: float, confidence: float, probabilities: Dict[str, float]):
+        self.primary_emotion = primary_emotion
+        self.emotion_intensity = emotion_intensity
+        self.confidence = confidence
+        self.probabilities = probabilities
+
+
+class LocalEmotionClassifier:
+    """softmax情绪分类 + 线性强度回归"""
+    
+    def __init__(self, featurizer: Optional[HashedNgramFeaturizer] = None, labels: Optional[List[str]] = None):
+        self.featurizer = featurizer or HashedNgramFeaturizer()
+        self.labels = list(labels or EMOTION_LABELS)
+        n_features, n_labels = self.featurizer.n_features, len(self.labels)
+        self.weights = np.zeros((n_features, n_labels), dtype=np.float64)
+        self.bias = np.zeros(n_labels, dtype=np.float64)
+        self.intensity_weights = np.zeros(n_features, dtype=np.float64)
+        self.intensity_bias = 0.5
+        self.trained_samples = 0
+    
+    def predict(self, text: str) -> ClassifierPrediction:
+        """预测单条文本"""
+        indices, values = self.featurizer.transform(text)
+        logits = values @ self.weights[indices] + self.bias
+        probabilities = _softmax(logits)
+        intensity = float(np.clip(values @ self.intensity_weights[indices] + self.intensity_bias, 0.0, 1.0))
+        best = int(np.argmax(probabilities))
+        return ClassifierPrediction(
+            primary_emotion=self.labels[best],
+            emotion_intensity=intensity,
+            confidence=float(probabilities[best]),
+            probabilities={label: float(p) for label, p in zip(self.labels, probabilities)}
+        )
+    
+    def predict_batch(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """批量预测，返回 (各情绪概率矩阵, 强度)"""
+        indices, values, rows = self.featurizer.transform_batch(texts)
+        logits = self._sparse_dot(indices, values, rows, len(texts), self.weights) + self.bias
+        intensities = np.bincount(rows, weights=values * self.intensity_weights[indices], minlength=len(texts))
+        return _softmax(logits), np.clip(intensities + self.intensity_bias, 0.0, 1.0)
+    
+    def analyze(self, text: str) -> EmotionResult:
+        """分析情绪，返回带置信度的EmotionResult"""
+        return self.to_result(self.predict(text))
+    
+    def to_result(self, prediction: ClassifierPrediction) -> EmotionResult:
+        """把预测结果转换为EmotionResult"""
+        return EmotionResult(
+            primary_emotion=prediction.primary_emotion,
+            emotion_intensity=prediction.emotion_intensity,
+            emotion_keywords=[],
+            raw_llm_response=f"{CLASSIFIER_ANALYSIS_PREFIX}: {prediction.primary_emotion}({prediction.confidence:.3f})",
+            confidence=prediction.confidence
+        )
+    
+    @staticmethod
+    def _sparse_dot(indices: np.ndarray, values: np.ndarray, rows: np.ndarray, n_rows: int, matrix: np.ndarray) -> np.ndarray:
+        """稀疏特征矩阵 (n_rows x n_features) 乘以稠密矩阵"""
+        contributions = values[:, None] * matrix[indices]
+        result = np.empty((n_rows, matrix.shape[1]), dtype=np.float64)
+        for column in range(matrix.shape[1]):
+            result[:, column] = np.bincount(rows, weights=contributions[:, column], minlength=n_rows)
+        return result
+    
+    def fit(self, texts: Sequence[str], labels: Sequence[str], intensities: Sequence[float], epochs: int = 10,
+            learning_rate: float = 0.5, l2: float = 1e-6, batch_size: int = 128, seed: int = 0) -> Dict[str, float]:
+        """小批量梯度下降训练（交叉熵 + 强度均方误差），返回训练集指标"""
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        y = np.array([label_index.get(label, label_index["neutral"]) for label in labels], dtype=np.int64)
+        target_intensity = np.asarray(intensities, dtype=np.float64)
+        
+        # 特征只计算一次，每个批次按行切片
+        features = [self.featurizer.transform(text) for text in texts]
+        rng = np.random.default_rng(seed)
+        
+        for _ in range(epochs):
+            order = rng.permutation(len(texts))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                indices = np.concatenate([features[i][0] for i in batch])
+                values = np.concatenate([features[i][1] for i in batch])
+                rows = np.concatenate([np.full(len(features[i][0]), row, dtype=np.int64) for row, i in enumerate(batch)])
+                n = len(batch)
+                
+                probabilities = _softmax(self._sparse_dot(indices, values, rows, n, self.weights) + self.bias)
+                grad_logits = probabilities
+                grad_logits[np.arange(n), y[batch]] -= 1.0
+                grad_logits /= n
+                
+                predicted = np.bincount(rows, weights=values * self.intensity_weights[indices], minlength=n) + self.intensity_bias
+                grad_intensity = (predicted - target_intensity[batch]) / n
+                
+                # 只更新本批次出现过的特征行
+                touched, inverse = np.unique(indices, return_inverse=True)
+                row_grads = values[:, None] * grad_logits[rows]
+                grad_weights = np.empty((len(touched), len(self.labels)), dtype=np.float64)
+                for column in range(len(self.labels)):
+                    grad_weights[:, column] = np.bincount(inverse, weights=row_grads[:, column], minlength=len(touched))
+                grad_intensity_weights = np.bincount(inverse, weights=values * grad_intensity[rows], minlength=len(touched))
+                
+                decay = 1.0 - learning_rate * l2
+                self.weights[touched] = self.weights[touched] * decay - learning_rate * grad_weights
+                self.intensity_weights[touched] = self.intensity_weights[touched] * decay - learning_rate * grad_intensity_weights
+                self.bias -= learning_rate * grad_logits.sum(axis=0)
+                self.intensity_bias -= learning_rate * float(grad_intensity.sum())
+        
+        self.trained_samples += len(texts)
+        return self.evaluate(texts, labels, intensities)
+    
+    def evaluate(self, texts: Sequence[str], labels: Sequence[str], intensities: Sequence[float]) -> Dict[str, float]:
+        """计算准确率和强度平均绝对误差"""
+        if not texts:
+            return {"accuracy": 0.0, "intensity_mae": 0.0, "samples": 0}
+        probabilities, predicted_intensity = self.predict_batch(texts)
+        predicted = [self.labels[i] for i in np.argmax(probabilities, axis=1)]
+        accuracy = sum(p == label for p, label in zip(predicted, labels)) / len(texts)
+        mae = float(np.mean(np.abs(predicted_intensity - np.asarray(intensities, dtype=np.float64))))
+        return {"accuracy": accuracy, "intensity_mae": mae, "samples": len(texts)}
+    
+    def save(self, path: str):
+        """导出模型（NumPy npz格式）"""
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            intensity_weights=self.intensity_weights,
+            intensity_bias=np.array(self.intensity_bias),
+            labels=np.array(self.labels),
+            featurizer=np.array([self.featurizer.n_features, self.featurizer.min_n, self.featurizer.max_n]),
+            trained_samples=np.array(self.trained_samples)
+        )
+    
+    @classmethod
+    def load(cls, path: str) -> "LocalEmotionClassifier":
+        """加载导出的模型"""
+        started = time.perf_counter()
+        with np.load(path, allow_pickle=False) as data:
+            n_features, min_n, max_n = (int(v) for v in data["featurizer"])
+            classifier = cls(HashedNgramFeaturizer(n_features, min_n, max_n), [str(label) for label in data["labels"]])
+            classifier.weights = data["weights"]
+            classifier.bias = data["bias"]
+            classifier.intensity_weights = data["intensity_weights"]
+            classifier.intensity_bias = float(data["intensity_bias"])
+            classifier.trained_samples = int(data["trained_samples"])
+        logger.info(f"本地情绪分类器已加载: {path}, 训练样本={classifier.trained_samples}, "
+                    f"耗时={(time.perf_counter() - started) * 1000:.1f}ms")
+        return classifier
+
+
+class LLMResultRecorder:
+    """记录LLM情绪分析结果（JSONL），作为本地分类器的训练数据"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.recorded = 0
+        self._file = open(path, "a", encoding="utf-8")
+    
+    def record(self, dialogue_turn: str, emotion_result: EmotionResult):
+        """追加一条记录"""
+        self._file.write(json.dumps({
+            "text": dialogue_turn,
+            "primary_emotion": emotion_result.primary_emotion,
+            "emotion_intensity": emotion_result.emotion_intensity,
+            "emotion_keywords": emotion_result.emotion_keywords
+        }, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.recorded += 1
+    
+    def close(self):
+        self._file.close()
+
+
+def load_training_records(path: str) -> Tuple[List[str], List[str], List[float]]:
+    """读取LLMResultRecorder记录的数据，返回 (文本, 情绪标签, 强度)"""
+    texts: List[str] = []
+    labels: List[str] = []
+    intensities: List[float] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record: Dict[str, Any] = json.loads(line)
+            if record.get("primary_emotion") not in EMOTION_LABELS:
+                continue
+            texts.append(record["text"])
+            labels.append(record["primary_emotion"])
+            intensities.append(float(record.get("emotion_intensity", 0.5)))
+    return texts, labels, intensities
@@ -0,0 +1,239 @@
+"""长期记忆持久化存储：进程内（不持久化）或SQLite（WAL模式，后台线程批量写入）"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .schemas import EmotionSummary, EmotionProfile
+
+logger = logging.getLogger(__name__)
+
+# 固定的SQL文本，sqlite3按文本缓存预编译语句
+_INSERT_SUMMARY = "INSERT INTO ltm_summaries (user_id, session_id, created_at, payload) VALUES (?, ?, ?, ?)"
+_DELETE_SUMMARIES = "DELETE FROM ltm_summaries WHERE user_id = ? AND created_at < ?"
+_UPSERT_PROFILE = (
+    "INSERT INTO ltm_profiles (user_id, payload, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET payload = excluded.payload, updated_at = excluded.updated_at"
+)
+_SELECT_SUMMARIES = (
+    "SELECT created_at, payload FROM ltm_summaries WHERE user_id = ? AND created_at >= ? ORDER BY created_at, id"
+)
+_SELECT_PROFILE = "SELECT payload FROM ltm_profiles WHERE user_id = ?"
+
+
+class LTMStorage:
+    """长期记忆存储接口：写入接口只登记变更，读取接口按用户加载"""
+    
+    persistent = False
+    
+    def append_summary(self, user_id: str, summary: EmotionSummary, timestamp: float):
+        """追加一条情绪总结"""
+    
+    def delete_before(self, user_id: str, cutoff: float):
+        """删除用户创建时间早于cutoff的总结"""
+    
+    def save_profile(self, profile: EmotionProfile):
+        """保存用户情绪画像"""
+    
+    def load_user(self, user_id: str, since: float) -> Tuple[List[Tuple[float, EmotionSummary]], Optional[EmotionProfile]]:
+        """加载用户创建时间不早于since的总结（按时间排序）和情绪画像，读取失败时抛出异常（可在线程中调用）"""
+        return [], None
+    
+    def flush(self):
+        """等待已登记的变更写入完成"""
+    
+    def close(self):
+        """写入剩余变更并关闭存储"""
+    
+    def stats(self) -> Dict[str, Any]:
+        """存储状态"""
+        return {"type": "memory"}
+
+
+class SQLiteStorage(LTMStorage):
+    """SQLite存储：写入在后台线程中按批提交，读取走索引 (user_id, created_at)"""
+    
+    persistent = True
+    
+    def __init__(self, path: str, batch_size: int = 500, max_retries: int = 3, retry_delay: float = 0.1):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max(0, max_retries)  # 批次提交失败（如数据库被锁）后的重试次数
+        self.retry_delay = retry_delay  # 首次重试前的等待时间（秒），之后每次加倍
+        self._reader = self._connect()
+        self._reader.executescript(
+            "CREATE TABLE IF NOT EXISTS ltm_summaries ("
+            "id INTEGER PRIMARY KEY, user_id TEXT NOT NULL, session_id TEXT NOT NULL, "
+            "created_at REAL NOT NULL, payload TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_ltm_summaries_user_time ON ltm_summaries (user_id, created_at);"
+            "CREATE TABLE IF NOT EXISTS ltm_profiles ("
+            "user_id TEXT PRIMARY KEY, payload TEXT NOT NULL, updated_at REAL NOT NULL);"
+        )
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()  # 保护写入统计和待写入计数
+        self._committed = threading.Condition(self._lock)  # 每批提交后通知等待特定用户写入完成的加载
+        self._read_lock = threading.Lock()  # 读连接可能被多个加载线程同时使用
+        self._pending_users: Dict[str, int] = {}  # {user_id: 已入队尚未提交的变更数}，加载时据此保证读到自己的写入
+        self.written_summaries = 0
+        self.written_profiles = 0
+        self.deleted_summaries = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.dropped_writes = 0  # 重试后仍未能写入而丢弃的变更数（内存中仍然保留）
+        self.loads = 0
+        self.last_load_ms = 0.0
+        self._writer = threading.Thread(target=self._write_loop, name="eme0-ltm-writer", daemon=True)
+        self._writer.start()
+        logger.info(f"已启用SQLite长期记忆存储: {path}")
+    
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+    
+    def _enqueue(self, sql: str, params: tuple):
+        """登记变更（参数的第一项是用户ID）"""
+        with self._lock:
+            self._pending_users[params[0]] = self._pending_users.get(params[0], 0) + 1
+        self._queue.put((sql, params))
+    
+    def append_summary(self, user_id: str, summary: EmotionSummary, timestamp: float):
+        self._enqueue(_INSERT_SUMMARY, (user_id, summary.session_id, timestamp, summary.model_dump_json()))
+    
+    def delete_before(self, user_id: str, cutoff: float):
+        self._enqueue(_DELETE_SUMMARIES, (user_id, cutoff))
+    
+    def save_profile(self, profile: EmotionProfile):
+        self._enqueue(_UPSERT_PROFILE, (profile.user_id, profile.model_dump_json(), time.time()))
+    
+    def _write_loop(self):
+        """后台写入：取出队列中已积累的变更，在一个事务内提交"""
+        db = self._connect()
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while item is not None and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            
+            stop = batch[-1] is None
+            operations = [op for op in batch if op is not None]
+            if operations:
+                self._write_batch(db, operations)
+                with self._lock:
+                    for _, params in operations:
+                        count = self._pending_users[params[0]] - 1
+                        if count:
+                            self._pending_users[params[0]] = count
+                        else:
+                            del self._pending_users[params[0]]
+                    self._committed.notify_all()
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                break
+        db.close()
+    
+    def _write_batch(self, db: sqlite3.Connection, operations: List[Tuple[str, tuple]]):
+        """按顺序把相邻的同类语句合并为executemany；同一批次内每个用户的画像只写最后一次"""
+        last_profile = {params[0]: i for i, (sql, params) in enumerate(operations) if sql is _UPSERT_PROFILE}
+        groups: List[Tuple[str, List[tuple]]] = []
+        for i, (sql, params) in enumerate(operations):
+            if sql is _UPSERT_PROFILE and last_profile[params[0]] != i:
+                continue
+            if groups and groups[-1][0] is sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                with db:
+                    for sql, rows in groups:
+                        db.executemany(sql, rows)
+                break
+            except sqlite3.Error as e:
+                with self._lock:
+                    self.write_errors += 1
+                if attempt < self.max_retries:
+                    delay = self.retry_delay * (2 ** attempt)
+                    logger.warning(f"写入长期记忆失败（{len(operations)}条变更）: {e}，{delay:.2f}秒后重试")
+                    time.sleep(delay)
+                    continue
+                dropped = sum(len(rows) for _, rows in groups)
+                with self._lock:
+                    self.dropped_writes += dropped
+                logger.error(f"写入长期记忆失败，已重试{self.max_retries}次，丢弃{dropped}条变更: {e}")
+                return
+        
+        with self._lock:
+            self.batches += 1
+            for sql, rows in groups:
+                if sql is _INSERT_SUMMARY:
+                    self.written_summaries += len(rows)
+                elif sql is _UPSERT_PROFILE:
+                    self.written_profiles += len(rows)
+                else:
+                    self.deleted_summaries += len(rows)
+    
+    def load_user(self, user_id: str, since: float) -> Tuple[List[Tuple[float, EmotionSummary]], Optional[EmotionProfile]]:
+        started = time.perf_counter()
+        with self._committed:
+            # 用户被换出后很快再次访问时，只等待该用户自己的变更写入，不等待其他用户
+            self._committed.wait_for(lambda: user_id not in self._pending_users or not self._writer.is_alive())
+        try:
+            with self._read_lock:
+                rows = self._reader.execute(_SELECT_SUMMARIES, (user_id, since)).fetchall()
+                profile_row = self._reader.execute(_SELECT_PROFILE, (user_id,)).fetchone()
+        except sqlite3.Error as e:
+            # 不能当作新用户处理，否则之后保存的空画像会覆盖库中已有的画像
+            logger.error(f"读取长期记忆失败: {user_id}, {e}")
+            raise
+        
+        summaries = [(created_at, EmotionSummary.model_validate_json(payload)) for created_at, payload in rows]
+        profile = EmotionProfile.model_validate_json(profile_row[0]) if profile_row else None
+        with self._lock:
+            self.loads += 1
+            self.last_load_ms = (time.perf_counter() - started) * 1000
+        return summaries, profile
+    
+    def flush(self):
+        self._queue.join()
+    
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._reader.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "type": "sqlite",
+                "path": self.path,
+                "pending_writes": self._queue.qsize(),
+                "batches": self.batches,
+                "written_summaries": self.written_summaries,
+                "written_profiles": self.written_profiles,
+                "deleted_summaries": self.deleted_summaries,
+                "write_errors": self.write_errors,
+                "dropped_writes": self.dropped_writes,
+                "loads": self.loads,
+                "last_load_ms": round(self.last_load_ms, 3)
+            }
+
+
+def create_ltm_storage(storage_type: str, db_path: Optional[str] = None, batch_size: int = 500) -> LTMStorage:
+    """根据配置创建长期记忆存储"""
+    if storage_type == "sqlite":
+        return SQLiteStorage(db_path or "eme0_ltm.db", batch_size=batch_size)
+    # vector_db模式的长期记忆在进程内，会话总结另外写入本地向量索引
+    if storage_type not in ("memory", "vector_db"):
+        logger.warning(f"不支持的长期记忆存储类型 {storage_type}，使用进程内存储")
+    return LTMStorage()
@@ -11,11 +11,18 @@ from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
 # 使用绝对导入避免相对导入问题
-from eme0.schemas import EmotionContext, EmotionProfile, DecayConfig
+from eme0.schemas import EmotionContext, EmotionProfile, DecayConfig, PROFILE_ACCUMULATOR_FIELDS
 from eme0.emotion_inference import EmotionInferenceEngine
 from eme0.memory_manager import MemoryManager
 from eme0.config import load_config
 from eme0.llm_client import LLMClient
+from eme0.emotion_cache import EmotionResultCache
+from eme0.lexicon import LexiconManager
+from eme0.local_classifier import LLMResultRecorder, LocalEmotionClassifier
+from eme0.user_locks import UserLockManager
+from eme0.ltm_storage import create_ltm_storage
+from eme0.memory_journal import MemoryJournal
+from eme0.session_index import SessionVectorIndex
 
 # 配置日志格式
 logging.basicConfig(
@@ -87,6 +94,15 @@ class Eme0MCPServer:
         self.emotion_engine: Optional[EmotionInferenceEngine] = None
         self.memory_manager: Optional[MemoryManager] = None
         self.llm_client: Optional[LLMClient] = None
+        self.emotion_cache: Optional[EmotionResultCache] = None
+        self.lexicon_manager: Optional[LexiconManager] = None
+        self.result_recorder: Optional[LLMResultRecorder] = None
+        self.latency_budget_ms: float = 0.0
+        self._background_tasks: set = set()  # 超出延迟预算后仍在进行的LLM分析
+        self._sweeper_task: Optional[asyncio.Task] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self.user_locks = UserLockManager()  # 按用户串行化记忆读写
+        self._pending_analyses: Dict[str, int] = {}  # {user_id: 锁外进行中的LLM分析数}
     
     async def initialize(self):
         """初始化服务器"""
@@ -94,29 +110,126 @@ class Eme0MCPServer:
         
         config = load_config()
         
+        self.latency_budget_ms = config.latency_budget_ms
+        
+        # 加载规则分析词典，文件变化时自动热更新
+        self.lexicon_manager = LexiconManager(config.lexicon.path, config.lexicon.reload_interval)
+        self.lexicon_manager.start_watching()
+        
         # 初始化LLM客户端
-        self.llm_client = LLMClient(config.baidu_qianfan)
+        self.llm_client = LLMClient(config.baidu_qianfan, lexicon=self.lexicon_manager)
+        
+        # 预热连接池，避免首个请求承担握手开销
+        await self.llm_client.warm_up()
+        
+        # 初始化情绪分析结果缓存
+        self.emotion_cache = None
+        if config.cache.enabled:
+            self.emotion_cache = EmotionResultCache(
+                max_size=config.cache.max_size,
+                ttl_seconds=config.cache.ttl_seconds,
+                disk_path=config.cache.disk_path,
+                disk_max_size=config.cache.disk_max_size,
+                purge_interval=config.cache.purge_interval
+            )
+        
+        # 记录LLM分析结果，用于训练本地分类器
+        self.result_recorder = None
+        if config.classifier.record_path:
+            self.result_recorder = LLMResultRecorder(config.classifier.record_path)
+        
+        # 加载本地情绪分类器（分层分析的中间层）
+        classifier = None
+        if config.classifier.model_path:
+            try:
+                classifier = LocalEmotionClassifier.load(config.classifier.model_path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"加载本地情绪分类器失败，分层分析将跳过分类器层: {e}")
         
         # 初始化情绪引擎
-        self.emotion_engine = EmotionInferenceEngine(self.llm_client)
+        self.emotion_engine = EmotionInferenceEngine(
+            self.llm_client,
+            cache=self.emotion_cache,
+            recorder=self.result_recorder,
+            classifier=classifier,
+            cascade=config.cascade
+        )
         
         # 初始化记忆管理器（带衰减配置）
         decay_config = DecayConfig(
             decay_rate=config.memory.decay_rate,
             time_window_hours=config.memory.time_window_hours,
             min_weight=config.memory.min_weight,
-            trend_weight=config.memory.trend_weight
+            trend_weight=config.memory.trend_weight,
+            retention_hours=config.memory.ltm_retention_hours,
+            delete_expired=config.memory.ltm_delete_expired,
+            topic_capacity=config.memory.ltm_topic_capacity
         )
         self.memory_manager = MemoryManager(
             max_stm_length=config.memory.stm_max_length,
-            decay_config=decay_config
+            decay_config=decay_config,
+            stm_raw_sample_rate=config.memory.stm_raw_sample_rate,
+            stm_idle_ttl_seconds=config.memory.stm_idle_ttl_seconds,
+            stm_max_sessions=config.memory.stm_max_sessions,
+            ltm_storage=create_ltm_storage(
+                config.memory.ltm_storage_type,
+                db_path=config.memory.ltm_db_path,
+                batch_size=config.memory.ltm_write_batch_size
+            ),
+            journal=MemoryJournal(
+                config.memory.journal_dir,
+                commit_interval_ms=config.memory.journal_commit_interval_ms,
+                fsync=config.memory.journal_fsync
+            ) if config.memory.journal_dir else None,
+            ltm_index=SessionVectorIndex(
+                config.memory.vector_db_path or "eme0_vectors"
+            ) if config.memory.ltm_storage_type == "vector_db" else None,
+            ltm_max_resident_users=config.memory.ltm_max_resident_users
         )
         
+        # 从快照和操作日志恢复进程内的记忆
+        if self.memory_manager.journal is not None:
+            started = time.perf_counter()
+            events = self.memory_manager.recover()
+            logger.info(f"已从操作日志恢复记忆: 事件数={events}, 会话数={len(self.memory_manager.stm.sessions)}, "
+                        f"耗时={(time.perf_counter() - started) * 1000:.1f}ms")
+            if config.memory.snapshot_interval > 0:
+                self._snapshot_task = asyncio.ensure_future(self._snapshot_memory(config.memory.snapshot_interval))
+        
+        # 后台定期归档空闲会话
+        if config.memory.stm_idle_ttl_seconds > 0 and config.memory.stm_sweep_interval > 0:
+            self._sweeper_task = asyncio.ensure_future(self._sweep_idle_sessions(config.memory.stm_sweep_interval))
+        
         logger.info("Eme0 情绪引擎初始化完成！")
     
+    async def shutdown(self):
+        """关闭服务器并释放资源"""
+        for task in list(self._background_tasks):
+            task.cancel()
+        if self._sweeper_task:
+            self._sweeper_task.cancel()
+            self._sweeper_task = None
+        if self._snapshot_task:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        if self.lexicon_manager:
+            self.lexicon_manager.stop()
+        if self.llm_client:
+            await self.llm_client.close()
+        if self.emotion_cache:
+            self.emotion_cache.close()
+        if self.result_recorder:
+            self.result_recorder.close()
+        if self.memory_manager:
+            # 关闭前写入快照，下次启动无需重放日志
+            if self.memory_manager.journal is not None and self.memory_manager.journal.frames_since_snapshot:
+                self.memory_manager.snapshot()
+            self.memory_manager.close()
+        logger.info("Eme0 情绪引擎已关闭")
+    
     @log_tool_usage
-    async def analyze_emotion(self, dialogue_turn: str, user_id: str, session_id: str = "") -> Dict[str, Any]:
-        """实时情绪分析"""
+    async def analyze_emotion(self, dialogue_turn: str, user_id: str, session_id: str = "", latency_budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        """实时情绪分析（可选延迟预算：超时先返回规则结果，LLM结果到达后更新短期记忆）"""
         start_time = time.time()
         
         if not self.emotion_engine or not self.memory_manager:
@@ -125,11 +238,56 @@ class Eme0MCPServer:
         try:
             logger.info(f"📊 开始情绪分析 - 用户={user_id}, 会话={session_id}, 对话长度={len(dialogue_turn)}")
             
-            # 调用情绪分析引擎
-            emotion_result = await self.emotion_engine.analyze_emotion(dialogue_turn, user_id, session_id)
-            
-            # 存储到短期记忆
-            self.memory_manager.analyze_and_store(dialogue_turn, user_id, session_id, emotion_result)
+            # 按调用顺序在用户锁内占位：缓存或本地分析层能立即给出结果时直接写入，
+            # 否则先写入规则分析结果占住短期记忆中的位置，LLM调用在锁外进行
+            async with self.user_locks.lock(user_id):
+                analysis_task = asyncio.ensure_future(self.emotion_engine.analyze_emotion(dialogue_turn, user_id, session_id))
+                done, _ = await asyncio.wait({analysis_task}, timeout=0)
+                if done:
+                    emotion_result = analysis_task.result()
+                    if emotion_result.primary_emotion == "unknown":
+                        # 分析失败时改用规则结果，与LLM返回unknown时保留规则结果一致
+                        emotion_result = self.emotion_engine.analyze_emotion_by_rules(dialogue_turn)
+                        self.emotion_engine.record_answer("rules")
+                    slot_record = None
+                    self.memory_manager.analyze_and_store(dialogue_turn, user_id, session_id, emotion_result)
+                else:
+                    rule_result = self.emotion_engine.analyze_emotion_by_rules(dialogue_turn)
+                    emotion_result = rule_result
+                    slot_record = self.memory_manager.analyze_and_store(dialogue_turn, user_id, session_id, rule_result)
+            
+            provisional = False
+            if slot_record is not None:
+                budget_ms = self.latency_budget_ms if latency_budget_ms is None else latency_budget_ms
+                if budget_ms and budget_ms > 0:
+                    remaining = budget_ms / 1000 - (time.time() - start_time)
+                    done, _ = await asyncio.wait({analysis_task}, timeout=max(0.0, remaining))
+                    provisional = not done
+                
+                if provisional:
+                    # LLM未在预算内返回，先用规则结果应答，LLM结果到达后替换短期记忆
+                    self.emotion_engine.record_answer("rules")
+                    self._upgrade_when_ready(analysis_task, user_id, session_id, slot_record)
+                    logger.info(f"⏱️ LLM分析超出延迟预算({budget_ms}ms)，先返回规则分析结果")
+                else:
+                    self._pending_analyses[user_id] = self._pending_analyses.get(user_id, 0) + 1
+                    try:
+                        emotion_result = await asyncio.shield(analysis_task)
+                    except asyncio.CancelledError:
+                        # 调用方取消时LLM分析继续进行，结果到达后仍替换占位的规则结果
+                        self._upgrade_when_ready(analysis_task, user_id, session_id, slot_record)
+                        raise
+                    finally:
+                        self._release_pending(user_id)
+                    
+                    if emotion_result.primary_emotion == "unknown":
+                        # 与超出预算时的升级一致：分析失败时保留占位的规则结果，不用unknown覆盖
+                        emotion_result = rule_result
+                        self.emotion_engine.record_answer("rules")
+                    else:
+                        # 重新加锁，把结果写入调用时占住的位置（会话已归档或记录已淘汰时丢弃）
+                        async with self.user_locks.lock(user_id):
+                            self.memory_manager.replace_short_term_result(user_id, session_id, slot_record, emotion_result)
             
             execution_time = time.time() - start_time
             logger.info(f"🎭 情绪分析完成 - 主要情绪={emotion_result.primary_emotion}, 强度={emotion_result.emotion_intensity:.2f}, 耗时={execution_time:.3f}s")
@@ -139,6 +297,9 @@ class Eme0MCPServer:
                 "emotion_intensity": emotion_result.emotion_intensity,
                 "emotion_keywords": emotion_result.emotion_keywords,
                 "raw_llm_response": emotion_result.raw_llm_response,
+                "analysis_tier": emotion_result.analysis_tier,
+                "confidence": emotion_result.confidence,
+                "provisional": provisional,
                 "success": True
             }
         except Exception as e:
@@ -152,6 +313,66 @@ class Eme0MCPServer:
                 "error": str(e)
             }
     
+    def _release_pending(self, user_id: str):
+        """LLM分析结束，减少用户进行中的分析数"""
+        count = self._pending_analyses.get(user_id, 0) - 1
+        if count > 0:
+            self._pending_analyses[user_id] = count
+        else:
+            self._pending_analyses.pop(user_id, None)
+    
+    def _user_busy(self, user_id: str) -> bool:
+        """用户正在更新记忆或有进行中的LLM分析（空闲会话归档时跳过）"""
+        return self.user_locks.is_locked(user_id) or user_id in self._pending_analyses
+    
+    def _upgrade_when_ready(self, analysis_task: asyncio.Future, user_id: str, session_id: str, provisional_record):
+        """LLM分析完成后用其结果替换短期记忆中的临时规则结果"""
+        self._background_tasks.add(analysis_task)
+        self._pending_analyses[user_id] = self._pending_analyses.get(user_id, 0) + 1
+        
+        def _on_done(task: asyncio.Future):
+            self._background_tasks.discard(task)
+            self._release_pending(user_id)
+            if task.cancelled() or task.exception() is not None:
+                return
+            
+            llm_result = task.result()
+            if llm_result.primary_emotion == "unknown":
+                return
+            
+            # 替换时保留该轮对话原本的时间戳，保证短期记忆顺序不变
+            if self.memory_manager.replace_short_term_result(user_id, session_id, provisional_record, llm_result):
+                logger.info(f"🔄 LLM分析结果已更新短期记忆 - 用户={user_id}, 会话={session_id}, 主要情绪={llm_result.primary_emotion}")
+            else:
+                logger.debug(f"临时结果已不在短期记忆中，丢弃LLM结果 - 用户={user_id}, 会话={session_id}")
+        
+        analysis_task.add_done_callback(_on_done)
+    
+    async def _sweep_idle_sessions(self, interval: float):
+        """定期将空闲会话归档到长期记忆"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # 先在线程中加载待归档用户的长期记忆，归档本身不再同步读取存储
+                now = time.time()
+                for user_id in self.memory_manager.idle_users(now):
+                    if not self._user_busy(user_id):
+                        await self.memory_manager.preload_user(user_id)
+                self.memory_manager.sweep_idle_sessions(now, is_busy=self._user_busy)
+            except Exception as e:
+                logger.error(f"归档空闲会话失败: {e}")
+    
+    async def _snapshot_memory(self, interval: float):
+        """定期把记忆写为快照，压缩操作日志"""
+        while True:
+            await asyncio.sleep(interval)
+            if not self.memory_manager.journal.frames_since_snapshot:
+                continue
+            try:
+                self.memory_manager.snapshot()
+            except Exception as e:
+                logger.error(f"写入记忆快照失败: {e}")
+    
     @log_tool_usage
     async def get_emotion_context(self, user_id: str, session_id: str = "") -> Dict[str, Any]:
         """获取情绪上下文（增强版）"""
@@ -160,46 +381,49 @@ class Eme0MCPServer:
         if not self.memory_manager:
             raise RuntimeError("服务器未初始化")
         
-        try:
-            logger.info(f"📝 获取情绪上下文 - 用户={user_id}, 会话={session_id}")
-            
-            # 获取短期历史
-            short_term_history = self.memory_manager.get_short_term_history(user_id, session_id)
-            logger.debug(f"📋 获取短期历史 - 记录数={len(short_term_history)}")
-            
-            # 生成短期摘要
-            stm_summary = self.memory_manager.stm.generate_summary(user_id, session_id)
-            
-            # 获取增强的长期画像
-            long_term_profile = self._get_enhanced_long_term_profile(user_id, short_term_history)
-            
-            # 基于历史和当前情绪进行意图推断
-            inferred_intention = await self._infer_intention(user_id, session_id, short_term_history)
-            
-            # 建议回复语气
-            suggested_tone = await self._suggest_agent_tone(short_term_history)
-            
-            execution_time = time.time() - start_time
-            logger.info(f"🔍 情绪上下文生成完成 - 短期摘要={stm_summary.dominant_emotion}, 长期画像长度={len(long_term_profile)}, 耗时={execution_time:.3f}s")
-            
-            return {
-                "short_term_summary": stm_summary.dominant_emotion,
-                "long_term_profile": long_term_profile,
-                "inferred_intention": inferred_intention,
-                "suggested_agent_tone": suggested_tone,
-                "success": True
-            }
-        except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"❌ 获取情绪上下文失败 - 耗时={execution_time:.3f}s, 错误={str(e)}")
-            return {
-                "short_term_summary": "当前情绪数据获取失败",
-                "long_term_profile": "历史情绪数据获取失败",
-                "inferred_intention": "未知",
-                "suggested_agent_tone": "中立",
-                "success": False,
-                "error": str(e)
-            }
+        # 读取期间不与该用户的记忆写入交错
+        async with self.user_locks.lock(user_id):
+            try:
+                logger.info(f"📝 获取情绪上下文 - 用户={user_id}, 会话={session_id}")
+                await self.memory_manager.preload_user(user_id)
+                
+                # 获取短期历史
+                short_term_history = self.memory_manager.get_short_term_history(user_id, session_id)
+                logger.debug(f"📋 获取短期历史 - 记录数={len(short_term_history)}")
+                
+                # 生成短期摘要
+                stm_summary = self.memory_manager.stm.generate_summary(user_id, session_id)
+                
+                # 获取增强的长期画像
+                long_term_profile = self._get_enhanced_long_term_profile(user_id, short_term_history)
+                
+                # 基于历史和当前情绪进行意图推断
+                inferred_intention = await self._infer_intention(user_id, session_id, short_term_history)
+                
+                # 建议回复语气
+                suggested_tone = await self._suggest_agent_tone(short_term_history)
+                
+                execution_time = time.time() - start_time
+                logger.info(f"🔍 情绪上下文生成完成 - 短期摘要={stm_summary.dominant_emotion}, 长期画像长度={len(long_term_profile)}, 耗时={execution_time:.3f}s")
+                
+                return {
+                    "short_term_summary": stm_summary.dominant_emotion,
+                    "long_term_profile": long_term_profile,
+                    "inferred_intention": inferred_intention,
+                    "suggested_agent_tone": suggested_tone,
+                    "success": True
+                }
+            except Exception as e:
+                execution_time = time.time() - start_time
+                logger.error(f"❌ 获取情绪上下文失败 - 耗时={execution_time:.3f}s, 错误={str(e)}")
+                return {
+                    "short_term_summary": "当前情绪数据获取失败",
+                    "long_term_profile": "历史情绪数据获取失败",
+                    "inferred_intention": "未知",
+                    "suggested_agent_tone": "中立",
+                    "success": False,
+                    "error": str(e)
+                }
     
     @log_tool_usage
     async def update_long_term_memory(self, user_id: str, session_id: str = "") -> Dict[str, Any]:
@@ -209,48 +433,40 @@ class Eme0MCPServer:
         if not self.memory_manager:
             raise RuntimeError("服务器未初始化")
         
-        try:
-            logger.info(f"📊 更新长期记忆 - 用户={user_id}, 会话={session_id}")
-            
-            # 生成最终总结（带会话统计）
-            short_term_history = self.memory_manager.get_short_term_history(user_id, session_id)
-            summary = self.memory_manager.stm.generate_summary(user_id, session_id)
-            
-            # 添加会话统计信息
-            summary.duration_minutes = len(short_term_history) * 0.5  # 估算会话时长
-            summary.total_interactions = len(short_term_history)
-            
-            logger.debug(f"?? 生成记忆总结 - 主导情绪={summary.dominant_emotion}, 趋势={summary.emotion_trend}, 交互次数={summary.total_interactions}")
-            
-            # 存储到长期记忆（带时间衰减）
-            self.memory_manager.update_long_term_memory(user_id, summary)
-            
-            # 清除该会话的短期记忆
-            self.memory_manager.clear_session(user_id, session_id)
-            
-            execution_time = time.time() - start_time
-            logger.info(f"✅ 长期记忆更新完成 - 耗时={execution_time:.3f}s, 清除会话={session_id}, 新增交互={summary.total_interactions}")
-            
-            return {
-                "success": True,
-                "summary_model": {
-                    "user_id": summary.user_id,
-                    "session_id": summary.session_id,
-                    "dominant_emotion": summary.dominant_emotion,
-                    "emotion_trend": summary.emotion_trend,
-                    "sensitive_topics": summary.sensitive_topics,
-                    "created_at": summary.created_at,
-                    "duration_minutes": summary.duration_minutes,
-                    "total_interactions": summary.total_interactions
+        # 归档期间不与该用户的分析结果写入交错
+        async with self.user_locks.lock(user_id):
+            try:
+                logger.info(f"📊 更新长期记忆 - 用户={user_id}, 会话={session_id}")
+                await self.memory_manager.preload_user(user_id)
+                
+                # 生成最终总结（带会话统计），存储到长期记忆并清除该会话的短期记忆
+                summary = self.memory_manager.archive_session(user_id, session_id)
+                
+                logger.debug(f"?? 生成记忆总结 - 主导情绪={summary.dominant_emotion}, 趋势={summary.emotion_trend}, 交互次数={summary.total_interactions}")
+                
+                execution_time = time.time() - start_time
+                logger.info(f"✅ 长期记忆更新完成 - 耗时={execution_time:.3f}s, 清除会话={session_id}, 新增交互={summary.total_interactions}")
+                
+                return {
+                    "success": True,
+                    "summary_model": {
+                        "user_id": summary.user_id,
+                        "session_id": summary.session_id,
+                        "dominant_emotion": summary.dominant_emotion,
+                        "emotion_trend": summary.emotion_trend,
+                        "sensitive_topics": summary.sensitive_topics,
+                        "created_at": summary.created_at,
+                        "duration_minutes": summary.duration_minutes,
+                        "total_interactions": summary.total_interactions
+                    }
+                }
+            except Exception as e:
+                execution_time = time.time() - start_time
+                logger.error(f"❌ 更新长期记忆失败 - 耗时={execution_time:.3f}s, 错误={str(e)}")
+                return {
+                    "success": False,
+                    "error": str(e)
                 }
-            }
-        except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"❌ 更新长期记忆失败 - 耗时={execution_time:.3f}s, 错误={str(e)}")
-            return {
-                "success": False,
-                "error": str(e)
-            }
     
     @log_tool_usage
     async def get_detailed_emotion_profile(self, user_id: str) -> Dict[str, Any]:
@@ -262,6 +478,7 @@ class Eme0MCPServer:
         
         try:
             logger.info(f"📊 获取详细情绪画像 - 用户={user_id}")
+            await self.memory_manager.preload_user(user_id)
             
             profile = self.memory_manager.get_detailed_emotion_profile(user_id)
             
@@ -271,7 +488,7 @@ class Eme0MCPServer:
             if profile:
                 return {
                     "success": True,
-                    "profile": profile.dict()
+                    "profile": profile.model_dump(exclude=PROFILE_ACCUMULATOR_FIELDS)
                 }
             else:
                 return {
@@ -296,6 +513,7 @@ class Eme0MCPServer:
         
         try:
             logger.info(f"📈 分析情绪趋势 - 用户={user_id}, 时间窗口={window_hours}小时")
+            await self.memory_manager.preload_user(user_id)
             
             trend_analysis = self.memory_manager.analyze_emotion_trend(user_id, window_hours)
             
@@ -314,6 +532,96 @@ class Eme0MCPServer:
                 "error": str(e)
             }
     
+    @log_tool_usage
+    async def get_engine_stats(self) -> Dict[str, Any]:
+        """获取引擎运行状态（限流、并发、缓存等）"""
+        start_time = time.time()
+        
+        if not self.llm_client or not self.emotion_engine:
+            raise RuntimeError("服务器未初始化")
+        
+        try:
+            stats = {
+                "llm": self.llm_client.get_limits(),
+                "circuit_breaker": self.llm_client.circuit_breaker.stats(),
+                "streaming": self.llm_client.get_stream_timings(),
+                "cache": self.emotion_cache.stats() if self.emotion_cache else None,
+                "lexicon": self.lexicon_manager.stats() if self.lexicon_manager else None,
+                "coalesced_requests": self.emotion_engine.coalesced_requests,
+                "cascade": self.emotion_engine.get_cascade_stats(),
+                "memory": self.memory_manager.get_stats() if self.memory_manager else None,
+                "user_locks": self.user_locks.stats()
+            }
+            
+            execution_time = time.time() - start_time
+            logger.info(f"✅ 引擎状态获取完成 - 耗时={execution_time:.3f}s")
+            
+            return {
+                "success": True,
+                "stats": stats
+            }
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error(f"❌ 获取引擎状态失败 - 耗时={execution_time:.3f}s, 错误={str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    @log_tool_usage
+    async def find_similar_sessions(self, user_id: str, session_id: str = "", top_k: int = 5) -> Dict[str, Any]:
+        """检索用户过去的相似会话"""
+        start_time = time.time()
+        
+        if not self.memory_manager:
+            raise RuntimeError("服务器未初始化")
+        
+        try:
+            async with self.user_locks.lock(user_id):
+                await self.memory_manager.preload_user(user_id)
+                similar_sessions = self.memory_manager.find_similar_sessions(user_id, session_id, top_k)
+            
+            execution_time = time.time() - start_time
+            logger.info(f"✅ 相似会话检索完成 - 耗时={execution_time:.3f}s, 结果数={len(similar_sessions)}")
+            
+            return {
+                "success": True,
+                "similar_sessions": similar_sessions
+            }
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.error(f"❌ 相似会话检索失败 - 耗时={execution_time:.3f}s, 错误={str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    @log_tool_usage
+    async def reload_lexicon(self) -> Dict[str, Any]:
+        """立即重新加载情绪词典（管理工具）"""
+        start_time = time.time()
+        
+        if not self.lexicon_manager:
+            raise RuntimeError("服务器未初始化")
+        
+        if not self.lexicon_manager.path:
+            return {
+                "success": False,
+                "error": "未配置词典路径（EME0_LEXICON_PATH），当前使用内置词典"
+            }
+        
+        reloaded = self.lexicon_manager.reload(force=True)
+        execution_time = time.time() - start_time
+        logger.info(f"✅ 情绪词典重新加载 - 成功={reloaded}, 耗时={execution_time:.3f}s")
+        
+        result = {
+            "success": reloaded,
+            "lexicon": self.lexicon_manager.stats()
+        }
+        if not reloaded:
+            result["error"] = self.lexicon_manager.last_error
+        return result
+    
     async def _infer_intention(self, user_id: str, session_id: str, history: list) -> str:
         """推断用户意图（增强版）"""
         start_time = time.time()
@@ -468,7 +776,8 @@ TOOLS = [
             "properties": {
                 "dialogue_turn": {"type": "string", "description": "对话文本内容"},
                 "user_id": {"type": "string", "description": "用户唯一标识"},
-                "session_id": {"type": "string", "description": "会话ID（可选）"}
+                "session_id": {"type": "string", "description": "会话ID（可选）"},
+                "latency_budget_ms": {"type": "number", "description": "延迟预算（毫秒，可选）。LLM未在预算内返回时先返回规则分析结果，LLM结果到达后自动更新短期记忆"}
             },
             "required": ["dialogue_turn", "user_id"]
         }
@@ -519,6 +828,35 @@ TOOLS = [
             },
             "required": ["user_id"]
         }
+    ),
+    Tool(
+        name="eme0_find_similar_sessions",
+        description="检索相似会话工具。在用户过去的会话总结中检索与当前会话（或最近一次会话）情绪分布和话题最相似的会话，作为对话上下文。需要 LTM_STORAGE_TYPE=vector_db。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "user_id": {"type": "string", "description": "用户唯一标识"},
+                "session_id": {"type": "string", "description": "当前会话标识（可选）"},
+                "top_k": {"type": "number", "description": "返回的会话数（默认5）"}
+            },
+            "required": ["user_id"]
+        }
+    ),
+    Tool(
+        name="eme0_reload_lexicon",
+        description="重新加载情绪词典工具（管理用）。从配置的词典文件重新编译规则分析词典并原子替换，无需重启服务。",
+        inputSchema={
+            "type": "object",
+            "properties": {}
+        }
+    ),
+    Tool(
+        name="eme0_get_engine_stats",
+        description="获取引擎运行状态工具。返回千帆API限流、自适应并发上限、排队深度、重试次数、熔断器状态、流式响应耗时、结果缓存命中率、情绪词典规模/编译耗时、分层分析各层命中数和短期记忆会话数/归档统计等指标。",
+        inputSchema={
+            "type": "object",
+            "properties": {}
+        }
     )
 ]
 
@@ -554,8 +892,9 @@ async def handle_call_tool(name: str, arguments: dict) -> List[TextContent]:
             dialogue_turn = arguments.get("dialogue_turn", "")
             user_id = arguments.get("user_id", "")
             session_id = arguments.get("session_id", "")
+            latency_budget_ms = arguments.get("latency_budget_ms")
             
-            result = await eme0_server.analyze_emotion(dialogue_turn, user_id, session_id)
+            result = await eme0_server.analyze_emotion(dialogue_turn, user_id, session_id, latency_budget_ms)
             result_content = [TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
         
         elif name == "eme0_get_emotion_context":
@@ -585,6 +924,22 @@ async def handle_call_tool(name: str, arguments: dict) -> List[TextContent]:
             result = await eme0_server.analyze_emotion_trend(user_id, window_hours)
             result_content = [TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
         
+        elif name == "eme0_find_similar_sessions":
+            user_id = arguments.get("user_id", "")
+            session_id = arguments.get("session_id", "")
+            top_k = int(arguments.get("top_k", 5))
+            
+            result = await eme0_server.find_similar_sessions(user_id, session_id, top_k)
+            result_content = [TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+        
+        elif name == "eme0_reload_lexicon":
+            result = await eme0_server.reload_lexicon()
+            result_content = [TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+        
+        elif name == "eme0_get_engine_stats":
+            result = await eme0_server.get_engine_stats()
+            result_content = [TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+        
         else:
             result_content = [TextContent(type="text", text=f"未知工具: {name}")]
         
@@ -613,13 +968,16 @@ async def main():
     logger.info("⏳ 等待MCP客户端连接...")
     
     # 使用stdio服务器运行
-    async with stdio_server() as (read_stream, write_stream):
-        logger.info("?? 开始MCP协议通信")
-        await server.run(
-            read_stream,
-            write_stream,
-            initialization_options={}
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            logger.info("?? 开始MCP协议通信")
+            await server.run(
+                read_stream,
+                write_stream,
+                initialization_options={}
+            )
+    finally:
+        await eme0_server.shutdown()
     
     total_time = time.time() - start_time
     logger.info(f"🛑 Eme0 情绪引擎 MCP Server 已停止，总运行时间={total_time:.3f}s")
@@ -0,0 +1,461 @@
+"""记忆操作日志：追加写入的二进制日志 + 定期快照，用于进程内存储的崩溃恢复
+
+目录中的文件按代（generation）编号:
+
+    snapshot.00000003.bin  第3代快照：第3代日志之前的全部状态
+    journal.00000003.log   第3代日志：快照之后的变更
+    journal.00000004.log   ...
+
+每条记录的帧格式为 [payload长度 u32][crc32 u32][事件类型 u8][payload]；payload以定长数值字段开头，
+之后是u16长度前缀的UTF-8字符串。
+恢复时加载最新的快照，再按代依次重放之后的日志；遇到不完整或校验失败的帧即停止读取该文件。
+
+格式版本：快照以FORMAT帧开头记录写入时的FORMAT_VERSION（没有该帧的旧快照为版本1），
+payload布局变化时使用新的事件类型，旧类型继续按原布局解码。
+版本1的长期记忆总结（类型4/5）没有情绪分布，版本2使用类型7/8并带上情绪分布和总结ID。
+"""
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .schemas import EmotionSummary
+
+logger = logging.getLogger(__name__)
+
+# 事件类型
+STM_APPEND = 1  # 短期记忆追加记录
+STM_REPLACE = 2  # 短期记忆替换记录（按距末尾的偏移定位）
+STM_CLEAR = 3  # 清除会话
+LTM_STORE = 4  # 存储长期记忆总结（同时更新画像）
+LTM_RESTORE = 5  # 快照中的长期记忆总结（只恢复历史，不更新画像）
+LTM_PROFILE = 6  # 快照中的情绪画像（JSON）
+LTM_STORE_V2 = 7  # 版本2的LTM_STORE（带情绪分布和总结ID）
+LTM_RESTORE_V2 = 8  # 版本2的LTM_RESTORE
+FORMAT = 9  # 快照开头的格式版本
+
+FORMAT_VERSION = 2
+
+# 总结事件写入时使用的当前版本类型，读取时归并回逻辑事件类型
+_SUMMARY_KINDS = {LTM_STORE: LTM_STORE_V2, LTM_RESTORE: LTM_RESTORE_V2}
+_LOGICAL_KINDS = {LTM_STORE_V2: LTM_STORE, LTM_RESTORE_V2: LTM_RESTORE}
+
+_HEADER = struct.Struct("<IIB")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+
+# 各事件的定长字段，放在payload开头一次解析
+_APPEND_FIXED = struct.Struct("<ddd")  # 强度, 时间戳, 会话活跃时间
+_REPLACE_FIXED = struct.Struct("<Hdd")  # 距末尾偏移, 强度, 时间戳
+_SUMMARY_FIXED = struct.Struct("<dddI")  # 创建时间, 会话时长, 平均强度, 交互次数
+
+# 事件类型字节参与校验和，预先计算其crc32作为初值
+_KIND_CRC = {kind: zlib.crc32(bytes((kind,))) for kind in range(1, 10)}
+
+_FILE_RE = re.compile(r"^(journal|snapshot)\.(\d{8})\.(log|bin)$")
+
+# u16长度前缀能表示的最大字符串字节数和列表长度
+MAX_STR_BYTES = 0xFFFF
+
+
+def clip_str(value: str, limit: int = MAX_STR_BYTES) -> str:
+    """把字符串截断到不超过limit个UTF-8字节（不截断多字节字符）"""
+    data = value.encode("utf-8")
+    if len(data) <= limit:
+        return value
+    return data[:limit].decode("utf-8", "ignore")
+
+
+def _str(value: str) -> bytes:
+    data = value.encode("utf-8")
+    if len(data) > MAX_STR_BYTES:
+        raise ValueError(f"记忆日志字符串过长: {len(data)}字节（上限{MAX_STR_BYTES}）")
+    return _U16.pack(len(data)) + data
+
+
+def _strs(values: Sequence[str]) -> bytes:
+    if len(values) > MAX_STR_BYTES:
+        raise ValueError(f"记忆日志列表过长: {len(values)}项（上限{MAX_STR_BYTES}）")
+    return _U16.pack(len(values)) + b"".join([_str(value) for value in values])
+
+
+def _frame(kind: int, payload: bytes) -> bytes:
+    crc = zlib.crc32(payload, _KIND_CRC[kind])
+    return _HEADER.pack(len(payload), crc, kind) + payload
+
+
+class _Decoder:
+    """按帧格式读取payload"""
+    
+    __slots__ = ("data", "offset")
+    
+    def __init__(self, data: memoryview):
+        self.data = data
+        self.offset = 0
+    
+    def fixed(self, fmt: struct.Struct) -> Tuple[Any, ...]:
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+    
+    def str(self) -> str:
+        offset = self.offset
+        length = self.data[offset] | (self.data[offset + 1] << 8)
+        self.offset = offset + 2 + length
+        return str(self.data[offset + 2:self.offset], "utf-8")
+    
+    def text(self) -> str:
+        (length,) = _U32.unpack_from(self.data, self.offset)
+        start = self.offset + 4
+        self.offset = start + length
+        return str(self.data[start:self.offset], "utf-8")
+    
+    def strs(self) -> List[str]:
+        offset = self.offset
+        count = self.data[offset] | (self.data[offset + 1] << 8)
+        self.offset = offset + 2
+        return [self.str() for _ in range(count)]
+
+
+def encode_stm_append(user_id: str, session_id: str, emotion: str, intensity: float, timestamp: float,
+                      keywords: Sequence[str], last_active: float) -> bytes:
+    return _frame(STM_APPEND, b"".join([
+        _APPEND_FIXED.pack(intensity, timestamp, last_active), _str(user_id), _str(session_id), _str(emotion), _strs(keywords)
+    ]))
+
+
+def encode_stm_replace(user_id: str, session_id: str, offset: int, emotion: str, intensity: float, timestamp: float,
+                       keywords: Sequence[str]) -> bytes:
+    return _frame(STM_REPLACE, b"".join([
+        _REPLACE_FIXED.pack(offset, intensity, timestamp), _str(user_id), _str(session_id), _str(emotion), _strs(keywords)
+    ]))
+
+
+def encode_stm_clear(user_id: str, session_id: str) -> bytes:
+    return _frame(STM_CLEAR, _str(user_id) + _str(session_id))
+
+
+def encode_summary(user_id: str, summary: EmotionSummary, timestamp: float, kind: int = LTM_STORE) -> bytes:
+    """按当前格式编码总结事件，kind为逻辑事件类型LTM_STORE或LTM_RESTORE"""
+    return _frame(_SUMMARY_KINDS[kind], b"".join([
+        _SUMMARY_FIXED.pack(timestamp, summary.duration_minutes, summary.average_intensity, summary.total_interactions),
+        _str(user_id), _str(summary.session_id), _str(summary.dominant_emotion), _str(summary.emotion_trend),
+        _strs(summary.sensitive_topics), _str(summary.created_at), _strs(list(summary.emotion_distribution)),
+        b"".join([_F64.pack(share) for share in summary.emotion_distribution.values()]), _str(summary.summary_id)
+    ]))
+
+
+def encode_format(version: int = FORMAT_VERSION) -> bytes:
+    return _frame(FORMAT, _U16.pack(version))
+
+
+def encode_profile(user_id: str, profile_json: str) -> bytes:
+    data = profile_json.encode("utf-8")
+    return _frame(LTM_PROFILE, _str(user_id) + _U32.pack(len(data)) + data)
+
+
+def decode_event(kind: int, payload: memoryview) -> Tuple[Any, ...]:
+    """解码事件payload，返回字段元组（顺序与对应的encode函数参数一致）"""
+    d = _Decoder(payload)
+    if kind == STM_APPEND:
+        intensity, timestamp, last_active = d.fixed(_APPEND_FIXED)
+        return d.str(), d.str(), d.str(), intensity, timestamp, d.strs(), last_active
+    if kind == STM_REPLACE:
+        offset, intensity, timestamp = d.fixed(_REPLACE_FIXED)
+        return d.str(), d.str(), offset, d.str(), intensity, timestamp, d.strs()
+    if kind == STM_CLEAR:
+        return d.str(), d.str()
+    if kind in (LTM_STORE, LTM_RESTORE, LTM_STORE_V2, LTM_RESTORE_V2):
+        timestamp, duration, intensity, interactions = d.fixed(_SUMMARY_FIXED)
+        user_id, session_id, dominant, trend, topics, created_at = d.str(), d.str(), d.str(), d.str(), d.strs(), d.str()
+        emotions, shares, summary_id = [], (), ""
+        if kind in _LOGICAL_KINDS:
+            emotions = d.strs()
+            shares = d.fixed(struct.Struct(f"<{len(emotions)}d"))
+            summary_id = d.str()
+        summary = EmotionSummary(
+            user_id=user_id,
+            session_id=session_id,
+            dominant_emotion=dominant,
+            emotion_trend=trend,
+            sensitive_topics=topics,
+            created_at=created_at,
+            duration_minutes=duration,
+            total_interactions=interactions,
+            average_intensity=intensity,
+            emotion_distribution=dict(zip(emotions, shares)),
+            summary_id=summary_id
+        )
+        return user_id, summary, timestamp
+    if kind == LTM_PROFILE:
+        return d.str(), d.text()
+    if kind == FORMAT:
+        return d.fixed(_U16)
+    raise ValueError(f"未知的日志事件类型: {kind}")
+
+
+def read_frames(path: str) -> Iterator[Tuple[int, memoryview]]:
+    """依次读取文件中的完整帧，遇到截断或校验失败时停止"""
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        length, crc, kind = _HEADER.unpack_from(data, offset)
+        start = offset + _HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or kind not in _KIND_CRC or zlib.crc32(payload, _KIND_CRC[kind]) != crc:
+            logger.warning(f"记忆日志在偏移 {offset} 处不完整，忽略之后的内容: {path}")
+            return
+        yield kind, payload
+        offset = start + length
+
+
+class MemoryJournal:
+    """追加写入的记忆日志：调用方只把帧放入待写队列，后台线程每隔commit_interval把积累的帧一次写入并fsync（组提交）"""
+    
+    def __init__(self, directory: str, commit_interval_ms: float = 10.0, fsync: bool = True):
+        self.directory = directory
+        self.commit_interval = commit_interval_ms / 1000
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self.generation = 0
+        self._pending: deque = deque()  # 待写入的帧、快照和停止标记（deque的append/popleft是线程安全的）
+        self._appended = 0  # 调用方累计放入的条目数
+        self._processed = 0  # 后台线程累计处理完成的条目数
+        self._done = threading.Condition()  # 处理进度推进时通知flush
+        self._wake = threading.Event()  # 提前唤醒后台线程（flush/close）
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()  # 保护写入统计
+        self.frames_since_snapshot = 0  # 上次快照之后追加的帧数（调用方线程维护）
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.bytes_since_snapshot = 0
+        self.commits = 0
+        self.snapshots = 0
+        self.last_snapshot_ms = 0.0
+        self.last_snapshot_bytes = 0
+        self.write_errors = 0
+        self.cleanup_errors = 0  # 删除旧快照和日志失败的次数
+        self.failure: Optional[BaseException] = None  # 后台线程异常退出的原因，之后的追加会抛出异常
+        self.recovered_events = 0
+        self.recovery_ms = 0.0
+    
+    def _path(self, kind: str, generation: int) -> str:
+        suffix = "log" if kind == "journal" else "bin"
+        return os.path.join(self.directory, f"{kind}.{generation:08d}.{suffix}")
+    
+    def _files(self) -> Dict[str, List[int]]:
+        files: Dict[str, List[int]] = {"journal": [], "snapshot": []}
+        for name in os.listdir(self.directory):
+            match = _FILE_RE.match(name)
+            if match:
+                files[match.group(1)].append(int(match.group(2)))
+        return {kind: sorted(generations) for kind, generations in files.items()}
+    
+    def recover(self) -> Iterator[Tuple[int, Tuple[Any, ...]]]:
+        """按顺序产出最新快照和其后日志中的事件 (逻辑事件类型, 字段)，各版本的总结事件归并为LTM_STORE/LTM_RESTORE"""
+        started = time.perf_counter()
+        files = self._files()
+        base = files["snapshot"][-1] if files["snapshot"] else 0
+        paths = [self._path("snapshot", base)] if files["snapshot"] else []
+        paths += [self._path("journal", generation) for generation in files["journal"] if generation >= base]
+        
+        for path in paths:
+            for kind, payload in read_frames(path):
+                fields = decode_event(kind, payload)
+                if kind == FORMAT:
+                    if fields[0] > FORMAT_VERSION:
+                        raise ValueError(f"记忆日志格式版本{fields[0]}高于当前支持的版本{FORMAT_VERSION}: {path}")
+                    continue
+                self.recovered_events += 1
+                yield _LOGICAL_KINDS.get(kind, kind), fields
+        
+        self.generation = max(files["journal"] + files["snapshot"] + [0])
+        self.recovery_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"记忆日志恢复完成: 事件数={self.recovered_events}, 耗时={self.recovery_ms:.1f}ms")
+    
+    def start(self):
+        """开始写入新一代日志（恢复之后调用）"""
+        if self._writer is not None:
+            return
+        self.generation += 1
+        self._writer = threading.Thread(target=self._write_loop, args=(self.generation,), name="eme0-journal-writer",
+                                        daemon=True)
+        self._writer.start()
+    
+    def _check(self):
+        """后台线程已异常退出时抛出异常，避免调用方以为变更仍会持久化"""
+        if self.failure is not None:
+            raise RuntimeError(f"记忆日志写入线程已停止，变更不再持久化: {self.failure}") from self.failure
+    
+    def append(self, frame: bytes):
+        """追加一帧"""
+        self._check()
+        self.frames_since_snapshot += 1
+        self._appended += 1
+        self._pending.append(frame)
+    
+    def snapshot(self, build: Callable[[], bytes]):
+        """切换到新一代日志，并把当前完整状态写为该代的快照；之前的快照和日志在快照落盘后删除
+        
+        build在后台线程中调用，返回快照内容；调用方负责让它只读取调用时捕获的不可变状态。
+        """
+        self._check()
+        self.generation += 1
+        self.frames_since_snapshot = 0
+        self._appended += 1
+        self._pending.append(("snapshot", self.generation, build))
+    
+    def _write_loop(self, generation: int):
+        try:
+            self._run(generation)
+        except BaseException as e:
+            self.failure = e
+            logger.exception(f"记忆日志写入线程异常退出: {e}")
+            with self._done:
+                self._done.notify_all()
+    
+    def _run(self, generation: int):
+        log = open(self._path("journal", generation), "ab")
+        stop = False
+        while not stop:
+            self._wake.wait(self.commit_interval)
+            self._wake.clear()
+            
+            frames = bytearray()
+            count = 0
+            processed = 0
+            while self._pending:
+                item = self._pending.popleft()
+                processed += 1
+                if isinstance(item, bytes):
+                    frames += item
+                    count += 1
+                    continue
+                # 快照或停止前先提交当前日志
+                self._commit(log, frames, count)
+                frames = bytearray()
+                count = 0
+                if item is None:
+                    stop = True
+                    break
+                _, generation, build = item
+                log.close()
+                log = open(self._path("journal", generation), "ab")
+                self._write_snapshot(generation, build)
+            self._commit(log, frames, count)
+            
+            if processed:
+                with self._done:
+                    self._processed += processed
+                    self._done.notify_all()
+        log.close()
+    
+    def _commit(self, log, frames: bytearray, count: int):
+        if not frames:
+            return
+        try:
+            log.write(frames)
+            log.flush()
+            if self.fsync:
+                os.fsync(log.fileno())
+        except OSError as e:
+            with self._lock:
+                self.write_errors += 1
+            logger.error(f"写入记忆日志失败: {e}")
+            return
+        with self._lock:
+            self.commits += 1
+            self.bytes_written += len(frames)
+            self.bytes_since_snapshot += len(frames)
+            self.frames_written += count
+    
+    def _write_snapshot(self, generation: int, build: Callable[[], bytes]):
+        started = time.perf_counter()
+        path = self._path("snapshot", generation)
+        try:
+            data = encode_format() + build()
+        except Exception as e:
+            # 没有新快照时保留旧快照和日志，恢复仍然完整
+            with self._lock:
+                self.write_errors += 1
+            logger.error(f"生成记忆快照失败: {e}")
+            return
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            with self._lock:
+                self.write_errors += 1
+            logger.error(f"写入记忆快照失败: {e}")
+            return
+        
+        # 新快照已落盘，删除更早的快照和日志
+        for kind, generations in self._files().items():
+            for old in generations:
+                if old < generation:
+                    try:
+                        os.remove(self._path(kind, old))
+                    except OSError as e:
+                        # 残留的旧文件只占用空间，恢复时以最新快照为准
+                        with self._lock:
+                            self.cleanup_errors += 1
+                        logger.warning(f"删除旧的记忆日志文件失败: {e}")
+        
+        with self._lock:
+            self.snapshots += 1
+            self.bytes_since_snapshot = 0
+            self.last_snapshot_bytes = len(data)
+            self.last_snapshot_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"记忆快照已写入: 第{generation}代, 大小={len(data) / 1024:.1f}KB, 耗时={self.last_snapshot_ms:.1f}ms")
+    
+    def flush(self):
+        """等待已放入的帧和快照写入完成"""
+        if self._writer is None:
+            return
+        target = self._appended
+        self._wake.set()
+        with self._done:
+            self._done.wait_for(lambda: self._processed >= target or not self._writer.is_alive())
+        self._check()
+    
+    def close(self):
+        """提交剩余的帧并停止后台写入"""
+        if self._writer is not None and self._writer.is_alive():
+            self._appended += 1
+            self._pending.append(None)
+            self._wake.set()
+            self._writer.join()
+        self._writer = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """日志状态"""
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "generation": self.generation,
+                "pending": len(self._pending),
+                "frames_written": self.frames_written,
+                "bytes_written": self.bytes_written,
+                "frames_since_snapshot": self.frames_since_snapshot,
+                "bytes_since_snapshot": self.bytes_since_snapshot,
+                "commits": self.commits,
+                "snapshots": self.snapshots,
+                "last_snapshot_bytes": self.last_snapshot_bytes,
+                "last_snapshot_ms": round(self.last_snapshot_ms, 3),
+                "write_errors": self.write_errors,
+                "cleanup_errors": self.cleanup_errors,
+                "writer_error": repr(self.failure) if self.failure is not None else None,
+                "recovered_events": self.recovered_events,
+                "recovery_ms": round(self.recovery_ms, 3)
+            }
+
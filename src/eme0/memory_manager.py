@@ -1,83 +1,311 @@
 """情绪记忆管理模块"""
-from typing import Dict, List, Optional, Any
-from collections import deque
+from typing import Callable, Dict, List, Optional, Any, Set, Tuple
+from collections import deque, OrderedDict
+import asyncio
+import itertools
+import math
 import time
 import json
 import logging
+import random
+import bisect
+import uuid
 from datetime import datetime, timedelta
 
+import numpy as np
+
 from .schemas import EmotionResult, EmotionSummary, EmotionProfile, DecayConfig
+from .ltm_storage import LTMStorage
+from .session_index import SessionVectorIndex, embed_summary
+from .memory_journal import (
+    MemoryJournal, STM_APPEND, STM_REPLACE, STM_CLEAR, LTM_STORE, LTM_RESTORE, LTM_PROFILE,
+    clip_str, encode_stm_append, encode_stm_replace, encode_stm_clear, encode_summary, encode_profile
+)
 
 logger = logging.getLogger(__name__)
 
 
+class _Interner:
+    """字符串驻留表：字符串 <-> 整数编码（条目不会释放，只用于取值有限的情绪标签）"""
+    
+    __slots__ = ("_codes", "_values")
+    
+    def __init__(self, values: Optional[List[str]] = None):
+        self._codes: Dict[str, int] = {}
+        self._values: List[str] = []
+        for value in values or []:
+            self.intern(value)
+    
+    def intern(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._values)
+            self._codes[value] = code
+            self._values.append(value)
+        return code
+    
+    def lookup(self, code: int) -> str:
+        return self._values[code]
+    
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+# 常见情绪预先驻留，编码稳定
+EMOTION_LABELS = ["happiness", "sadness", "anger", "fear", "surprise", "neutral", "unknown"]
+
+# 敏感话题前向衰减的指数超过该值时重置基准时间，避免计数溢出
+_TOPIC_RESCALE_EXPONENT = 50.0
+
+
+class EmotionRecord:
+    """短期记忆中的紧凑情绪记录（情绪编码、强度、时间戳、关键词）"""
+    
+    __slots__ = ("emotion_code", "intensity", "timestamp", "keywords", "raw_llm_response")
+    
+    def __init__(self, emotion_code: int, intensity: float, timestamp: float, keywords: Tuple[str, ...],
+                 raw_llm_response: Optional[str] = None):
+        self.emotion_code = emotion_code
+        self.intensity = intensity
+        self.timestamp = timestamp  # epoch秒
+        self.keywords = keywords  # LLM输出的自由文本，随记录一起释放
+        self.raw_llm_response = raw_llm_response
+
+
+def _parse_timestamp(value: str) -> float:
+    """ISO时间字符串转epoch秒，解析失败时使用当前时间"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class SessionMemory:
+    """单个会话的短期记忆，追加和淘汰时增量维护聚合统计"""
+    
+    __slots__ = ("records", "emotion_positions", "keyword_counts", "intensity_sum", "appended", "last_active")
+    
+    def __init__(self):
+        self.records: deque = deque()  # deque[EmotionRecord]
+        self.emotion_positions: Dict[int, List[int]] = {}  # {情绪编码: 窗口内出现位置（追加序号）}
+        self.keyword_counts: Dict[str, int] = {}  # 关键词多重集合 {关键词: 次数}
+        self.intensity_sum = 0.0  # 窗口内情绪强度之和
+        self.appended = 0  # 累计追加条数，用作记录的序号
+        self.last_active = time.time()  # 最近一次追加的时间（epoch秒）
+    
+    def append(self, record: EmotionRecord, max_length: int) -> Optional[EmotionRecord]:
+        """追加记录，超出长度时淘汰最早的记录并返回"""
+        evicted = None
+        if len(self.records) >= max_length:
+            evicted = self.records.popleft()
+            self._remove_stats(evicted, self.appended - max_length)
+        self.records.append(record)
+        self._add_stats(record, self.appended)
+        self.appended += 1
+        return evicted
+    
+    def index_of(self, record: EmotionRecord) -> Optional[int]:
+        """记录在窗口中的下标（按对象身份匹配）"""
+        for i, existing in enumerate(self.records):
+            if existing is record:
+                return i
+        return None
+    
+    def replace_at(self, index: int, new_record: EmotionRecord):
+        """替换窗口中指定下标的记录"""
+        position = self.appended - len(self.records) + index
+        self._remove_stats(self.records[index], position)
+        self.records[index] = new_record
+        self._add_stats(new_record, position)
+    
+    def replace(self, old_record: EmotionRecord, new_record: EmotionRecord) -> bool:
+        """替换指定记录（按对象身份匹配）"""
+        index = self.index_of(old_record)
+        if index is None:
+            return False
+        self.replace_at(index, new_record)
+        return True
+    
+    def _add_stats(self, record: EmotionRecord, position: int):
+        positions = self.emotion_positions.get(record.emotion_code)
+        if positions is None:
+            self.emotion_positions[record.emotion_code] = [position]
+        else:
+            bisect.insort(positions, position)
+        self.intensity_sum += record.intensity
+        for keyword in record.keywords:
+            self.keyword_counts[keyword] = self.keyword_counts.get(keyword, 0) + 1
+    
+    def _remove_stats(self, record: EmotionRecord, position: int):
+        positions = self.emotion_positions[record.emotion_code]
+        positions.remove(position)
+        if not positions:
+            del self.emotion_positions[record.emotion_code]
+        self.intensity_sum -= record.intensity
+        for keyword in record.keywords:
+            count = self.keyword_counts[keyword] - 1
+            if count:
+                self.keyword_counts[keyword] = count
+            else:
+                del self.keyword_counts[keyword]
+    
+    def dominant_emotion_code(self) -> int:
+        """出现次数最多的情绪；次数相同时取在窗口内最先出现的"""
+        return max(self.emotion_positions.items(), key=lambda item: (len(item[1]), -item[1][0]))[0]
+    
+    def emotion_distribution(self) -> Dict[int, float]:
+        """窗口内各情绪的占比 {情绪编码: 占比}（由情绪位置计数得出）"""
+        count = len(self.records)
+        return {code: len(positions) / count for code, positions in self.emotion_positions.items()}
+
+
 class ShortTermMemory:
     """短期情绪记忆管理"""
     
-    def __init__(self, max_length: int = 10):
-        self.memories: Dict[str, Dict[str, deque]] = {}  # {user_id: {session_id: deque}}
+    def __init__(self, max_length: int = 10, raw_sample_rate: float = 0.0):
+        # {(user_id, session_id): SessionMemory}，按最近活跃时间排序（最久未活跃的在前）
+        self.sessions: "OrderedDict[Tuple[str, str], SessionMemory]" = OrderedDict()
         self.max_length = max_length
+        self.raw_sample_rate = raw_sample_rate  # 保留LLM原始输出的比例（仅用于调试）
+        self.emotions = _Interner(EMOTION_LABELS)
     
-    def add_emotion_result(self, user_id: str, session_id: str, emotion_result: EmotionResult):
-        """添加情绪分析结果"""
-        key = f"{user_id}_{session_id}"
+    def add_emotion_result(self, user_id: str, session_id: str, emotion_result: EmotionResult) -> EmotionRecord:
+        """添加情绪分析结果，返回存储的记录"""
+        record = self.to_record(emotion_result)
+        self.append_record(user_id, session_id, record, time.time())
+        logger.debug(f"已添加短期记忆: {user_id}/{session_id}")
+        return record
+    
+    def append_record(self, user_id: str, session_id: str, record: EmotionRecord, last_active: float):
+        """追加紧凑记录并更新会话的活跃时间"""
+        key = (user_id, session_id)
+        
+        session = self.sessions.get(key)
+        if session is None:
+            session = self.sessions[key] = SessionMemory()
+        else:
+            self.sessions.move_to_end(key)
         
-        if key not in self.memories:
-            self.memories[key] = {}
+        session.append(record, self.max_length)
+        session.last_active = last_active
+    
+    def make_record(self, emotion: str, intensity: float, timestamp: float, keywords: List[str]) -> EmotionRecord:
+        """由字段构造紧凑记录（用于日志恢复）"""
+        return EmotionRecord(
+            emotion_code=self.emotions.intern(emotion),
+            intensity=intensity,
+            timestamp=timestamp,
+            keywords=tuple(keywords)
+        )
+    
+    def offset_from_end(self, user_id: str, session_id: str, record: EmotionRecord) -> Optional[int]:
+        """记录距会话窗口末尾的偏移（最新一条为0）"""
+        session = self.sessions.get((user_id, session_id))
+        index = session.index_of(record) if session is not None else None
+        return None if index is None else len(session.records) - 1 - index
+    
+    def replace_from_end(self, user_id: str, session_id: str, offset: int, new_record: EmotionRecord) -> bool:
+        """按距末尾的偏移替换记录（用于日志恢复）"""
+        session = self.sessions.get((user_id, session_id))
+        if session is None or offset >= len(session.records):
+            return False
+        session.replace_at(len(session.records) - 1 - offset, new_record)
+        return True
+    
+    def replace_emotion_result(self, user_id: str, session_id: str, old_record: EmotionRecord, new_result: EmotionResult) -> bool:
+        """用新的分析结果替换短期记忆中的指定记录（保留原时间戳），记录已不存在时返回False"""
+        new_record = self.to_record(new_result)
+        new_record.timestamp = old_record.timestamp
+        return self.replace_record(user_id, session_id, old_record, new_record)
+    
+    def replace_record(self, user_id: str, session_id: str, old_record: EmotionRecord, new_record: EmotionRecord) -> bool:
+        """用新记录替换短期记忆中的指定记录，记录已不存在时返回False"""
+        session = self.sessions.get((user_id, session_id))
+        if session is None:
+            return False
         
-        if session_id not in self.memories[key]:
-            self.memories[key][session_id] = deque(maxlen=self.max_length)
+        if session.replace(old_record, new_record):
+            logger.debug(f"已替换短期记忆: {user_id}/{session_id}")
+            return True
         
-        self.memories[key][session_id].append(emotion_result)
-        logger.debug(f"已添加短期记忆: {user_id}/{session_id}")
+        return False
+    
+    def get_recent_records(self, user_id: str, session_id: str) -> List[EmotionRecord]:
+        """获取最近的短期情绪记录（内部紧凑格式）"""
+        session = self.sessions.get((user_id, session_id))
+        return list(session.records) if session is not None else []
     
     def get_recent_emotions(self, user_id: str, session_id: str) -> List[EmotionResult]:
         """获取最近的短期情绪记忆"""
-        key = f"{user_id}_{session_id}"
-        
-        if key not in self.memories or session_id not in self.memories[key]:
-            return []
-        
-        return list(self.memories[key][session_id])
+        return [self.to_result(record) for record in self.get_recent_records(user_id, session_id)]
     
     def clear_session(self, user_id: str, session_id: str):
         """清除指定会话的记忆"""
-        key = f"{user_id}_{session_id}"
-        
-        if key in self.memories and session_id in self.memories[key]:
-            del self.memories[key][session_id]
-            # 如果用户的会话为空，则删除整个用户记录
-            if not self.memories[key]:
-                del self.memories[key]
+        self.sessions.pop((user_id, session_id), None)
+    
+    def idle_sessions(self, cutoff: float) -> List[Tuple[str, str]]:
+        """最近活跃时间早于cutoff的会话（按活跃时间顺序，遇到活跃会话即停止）"""
+        idle = []
+        for key, session in self.sessions.items():
+            if session.last_active >= cutoff:
+                break
+            idle.append(key)
+        return idle
+    
+    def least_recent_sessions(self, count: int) -> List[Tuple[str, str]]:
+        """最久未活跃的count个会话"""
+        return list(itertools.islice(self.sessions.keys(), max(0, count)))
+    
+    def last_active(self, user_id: str, session_id: str) -> Optional[float]:
+        session = self.sessions.get((user_id, session_id))
+        return session.last_active if session is not None else None
+    
+    def to_record(self, emotion_result: EmotionResult) -> EmotionRecord:
+        """分析结果转换为紧凑记录（关键词截断到日志可记录的长度）"""
+        raw = None
+        if self.raw_sample_rate > 0 and random.random() < self.raw_sample_rate:
+            raw = emotion_result.raw_llm_response
+        return EmotionRecord(
+            emotion_code=self.emotions.intern(emotion_result.primary_emotion),
+            intensity=float(emotion_result.emotion_intensity),
+            timestamp=_parse_timestamp(emotion_result.timestamp),
+            keywords=tuple(clip_str(keyword) for keyword in emotion_result.emotion_keywords),
+            raw_llm_response=raw
+        )
+    
+    def to_result(self, record: EmotionRecord) -> EmotionResult:
+        """紧凑记录转换为API使用的EmotionResult"""
+        return EmotionResult(
+            primary_emotion=self.emotions.lookup(record.emotion_code),
+            emotion_intensity=record.intensity,
+            emotion_keywords=list(record.keywords),
+            raw_llm_response=record.raw_llm_response,
+            timestamp=datetime.fromtimestamp(record.timestamp).isoformat()
+        )
     
     def generate_summary(self, user_id: str, session_id: str) -> EmotionSummary:
         """生成情绪总结"""
-        recent_emotions = self.get_recent_emotions(user_id, session_id)
+        session = self.sessions.get((user_id, session_id))
         
-        if not recent_emotions:
+        if session is None or not session.records:
             return EmotionSummary(
                 user_id=user_id,
                 session_id=session_id,
                 dominant_emotion="unknown",
                 emotion_trend="unknown",
                 sensitive_topics=[],
-                created_at=time.strftime("%Y-%m-%d %H:%M:%S")
+                created_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+                summary_id=uuid.uuid4().hex
             )
         
-        # 计算主导情绪
-        emotion_counts = {}
-        for emotion in recent_emotions:
-            if emotion.primary_emotion in emotion_counts:
-                emotion_counts[emotion.primary_emotion] += 1
-            else:
-                emotion_counts[emotion.primary_emotion] = 1
-        
-        dominant_emotion = max(emotion_counts.items(), key=lambda x: x[1])[0]
+        # 主导情绪（由增量维护的情绪计数得出）
+        dominant_emotion = self.emotions.lookup(session.dominant_emotion_code())
         
         # 分析情绪趋势
-        if len(recent_emotions) >= 2:
-            first_intensity = recent_emotions[0].emotion_intensity
-            last_intensity = recent_emotions[-1].emotion_intensity
+        records = session.records
+        if len(records) >= 2:
+            first_intensity = records[0].intensity
+            last_intensity = records[-1].intensity
         else:
             first_intensity = last_intensity = 0.5
         
@@ -88,11 +316,8 @@ class ShortTermMemory:
         else:
             trend = "相对稳定"
         
-        # 收集敏感话题
-        sensitive_topics = []
-        for emotion in recent_emotions:
-            sensitive_topics.extend(emotion.emotion_keywords)
-        sensitive_topics = list(set(sensitive_topics))
+        # 敏感话题（关键词多重集合中的全部关键词）
+        sensitive_topics = list(session.keyword_counts)
         
         return EmotionSummary(
             user_id=user_id,
@@ -100,83 +325,231 @@ class ShortTermMemory:
             dominant_emotion=dominant_emotion,
             emotion_trend=trend,
             sensitive_topics=sensitive_topics,
-            created_at=time.strftime("%Y-%m-%d %H:%M:%S")
+            created_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+            average_intensity=session.intensity_sum / len(records),
+            emotion_distribution={
+                self.emotions.lookup(code): share for code, share in session.emotion_distribution().items()
+            },
+            summary_id=uuid.uuid4().hex
         )
 
 
+class EmotionHistory:
+    """单个用户的长期情绪历史，按列存放在可增长的NumPy数组中（按时间排序）"""
+    
+    __slots__ = ("timestamps", "emotion_codes", "intensities", "interactions", "start", "end")
+    
+    def __init__(self, capacity: int = 16):
+        self.timestamps = np.empty(capacity, dtype=np.float64)  # epoch秒
+        self.emotion_codes = np.empty(capacity, dtype=np.int32)
+        self.intensities = np.empty(capacity, dtype=np.float32)
+        self.interactions = np.empty(capacity, dtype=np.int32)
+        self.start = 0  # 有效数据为 [start, end)，过期数据从队首移出
+        self.end = 0
+    
+    def __len__(self) -> int:
+        return self.end - self.start
+    
+    def _reserve(self):
+        """容量不足时先压缩已过期的队首空间，仍不足再翻倍扩容"""
+        size = len(self)
+        capacity = len(self.timestamps)
+        new_capacity = capacity * 2 if size * 2 >= capacity else capacity
+        for name in ("timestamps", "emotion_codes", "intensities", "interactions"):
+            column = getattr(self, name)
+            resized = np.empty(new_capacity, dtype=column.dtype)
+            resized[:size] = column[self.start:self.end]
+            setattr(self, name, resized)
+        self.start, self.end = 0, size
+    
+    def append(self, timestamp: float, emotion_code: int, intensity: float, interactions: int) -> int:
+        """追加一条记录，返回其在有效数据中的位置（时间戳早于末尾时按时间插入）"""
+        if self.end == len(self.timestamps):
+            self._reserve()
+        position = self.end
+        if self.end > self.start and timestamp < self.timestamps[self.end - 1]:
+            position = int(np.searchsorted(self.timestamps[self.start:self.end], timestamp, side="right")) + self.start
+            for column in (self.timestamps, self.emotion_codes, self.intensities, self.interactions):
+                column[position + 1:self.end + 1] = column[position:self.end]
+        self.timestamps[position] = timestamp
+        self.emotion_codes[position] = emotion_code
+        self.intensities[position] = intensity
+        self.interactions[position] = interactions
+        self.end += 1
+        return position - self.start
+    
+    def expire(self, cutoff: float) -> int:
+        """移出时间戳早于cutoff的记录，返回移出条数"""
+        if self.end == self.start or self.timestamps[self.start] >= cutoff:
+            return 0
+        expired = int(np.searchsorted(self.timestamps[self.start:self.end], cutoff, side="left"))
+        self.start += expired
+        return expired
+    
+    def window(self, since: float) -> slice:
+        """时间戳不早于since的记录所在区间（二分查找）"""
+        offset = int(np.searchsorted(self.timestamps[self.start:self.end], since, side="left"))
+        return slice(self.start + offset, self.end)
+
+
 class LongTermMemory:
     """长期情绪记忆管理"""
     
-    def __init__(self, storage_type: str = "memory", decay_config: Optional[DecayConfig] = None):
+    def __init__(self, storage_type: str = "memory", decay_config: Optional[DecayConfig] = None,
+                 storage: Optional[LTMStorage] = None, index: Optional[SessionVectorIndex] = None,
+                 max_resident_users: int = 0):
         self.storage_type = storage_type
-        self.memories: Dict[str, List[EmotionSummary]] = {}  # {user_id: [EmotionSummary]}}
+        self.storage = storage or LTMStorage()
+        self.index = index  # 会话总结的向量索引（vector_db模式），为空时不建立索引
+        # 已从持久化存储加载、驻留在内存中的用户，按最近访问排序（最久未访问的在前）
+        self._loaded_users: "OrderedDict[str, None]" = OrderedDict()
+        self.max_resident_users = max_resident_users  # 持久化存储时最多驻留的用户数，<=0 表示不限制
+        self.evicted_users = 0  # 超出驻留上限被换出的用户数
+        self.memories: Dict[str, deque] = {}  # {user_id: deque[EmotionSummary]}，按创建时间排列
+        self.histories: Dict[str, EmotionHistory] = {}  # {user_id: EmotionHistory}，与memories一一对应的列式历史
+        self.emotions = _Interner(EMOTION_LABELS)
         self.profiles: Dict[str, EmotionProfile] = {}  # {user_id: EmotionProfile}
+        self.dirty_profiles: Set[str] = set()  # 上次快照之后变更过的画像
         self.decay_config = decay_config or DecayConfig()
+        self.retention_seconds = self._retention_seconds(self.decay_config)
+        # 敏感话题前向衰减的速率：权重按 exp(topic_decay * (t - 基准时间)) 增长，等价于旧计数按decay_rate衰减
+        config = self.decay_config
+        self.topic_decay = -math.log(config.decay_rate) / (config.time_window_hours * 3600) \
+            if 0 < config.decay_rate < 1 and config.time_window_hours > 0 else 0.0
+        self.expired_summaries = 0  # 超出保留时长被清理的总结数
         self.emotion_history: Dict[str, List[Dict[str, Any]]] = {}  # 详细情绪历史记录
     
-    def store_summary(self, user_id: str, summary: EmotionSummary):
-        """存储情绪总结（带时间衰减）"""
+    @staticmethod
+    def _retention_seconds(decay_config: DecayConfig) -> float:
+        """长期记忆保留时长：只在显式配置时过期，否则永久保留（min_weight只是权重下限，不是过期策略）"""
+        if decay_config.retention_hours > 0:
+            return decay_config.retention_hours * 3600
+        return float("inf")
+    
+    def summary_weight(self, timestamp: float, now: Optional[float] = None) -> float:
+        """总结的时间衰减权重：decay_rate ** (经过小时数 / time_window_hours)，不低于min_weight"""
+        if now is None:
+            now = time.time()
+        hours = max(0.0, now - timestamp) / 3600
+        config = self.decay_config
+        if config.time_window_hours <= 0:
+            return 1.0
+        return max(config.min_weight, config.decay_rate ** (hours / config.time_window_hours))
+    
+    def _ensure_loaded(self, user_id: str):
+        """首次访问用户时从持久化存储加载保留期内的总结和情绪画像（读取失败时抛出异常，用户保持未加载）"""
+        if not self.storage.persistent:
+            return
+        if user_id in self._loaded_users:
+            self._loaded_users.move_to_end(user_id)
+            return
+        
+        summaries, profile = self.storage.load_user(user_id, self._load_since())
+        self._install(user_id, summaries, profile)
+    
+    async def preload_user(self, user_id: str):
+        """在线程中从持久化存储加载用户，避免读取阻塞事件循环（调用方需持有该用户的锁）"""
+        if not self.storage.persistent or user_id in self._loaded_users:
+            return
+        summaries, profile = await asyncio.to_thread(self.storage.load_user, user_id, self._load_since())
+        if user_id not in self._loaded_users:
+            self._install(user_id, summaries, profile)
+    
+    def _load_since(self) -> float:
+        return time.time() - self.retention_seconds if math.isfinite(self.retention_seconds) else 0.0
+    
+    def _install(self, user_id: str, summaries: List[Tuple[float, EmotionSummary]], profile: Optional[EmotionProfile]):
+        """把加载的数据放入内存并标记为已加载"""
+        self._loaded_users[user_id] = None
+        for timestamp, summary in summaries:
+            self._append(user_id, summary, timestamp)
+        if profile is not None:
+            self.profiles[user_id] = profile
+        
+        # 超出驻留上限时换出最久未访问的用户，其数据已在持久化存储中，再次访问时重新加载
+        while 0 < self.max_resident_users < len(self._loaded_users):
+            evicted, _ = self._loaded_users.popitem(last=False)
+            self.memories.pop(evicted, None)
+            self.histories.pop(evicted, None)
+            self.profiles.pop(evicted, None)
+            self.dirty_profiles.discard(evicted)
+            self.evicted_users += 1
+    
+    def _append(self, user_id: str, summary: EmotionSummary, timestamp: float):
+        """按创建时间把总结放入用户的历史"""
         if user_id not in self.memories:
-            self.memories[user_id] = []
+            self.memories[user_id] = deque()
+            self.histories[user_id] = EmotionHistory()
+        
+        summaries, history = self.memories[user_id], self.histories[user_id]
+        position = history.append(timestamp, self.emotions.intern(summary.dominant_emotion),
+                                  summary.average_intensity, summary.total_interactions)
+        if position == len(summaries):
+            summaries.append(summary)
+        else:
+            summaries.insert(position, summary)
+    
+    def restore_summary(self, user_id: str, summary: EmotionSummary, timestamp: float):
+        """恢复一条已存储过的总结（不更新画像，不写入存储）"""
+        self._append(user_id, summary, timestamp)
+    
+    def restore_profile(self, profile: EmotionProfile):
+        """恢复已保存的情绪画像（不写入存储）"""
+        self.profiles[profile.user_id] = profile
+        self.dirty_profiles.add(profile.user_id)
+    
+    def store_summary(self, user_id: str, summary: EmotionSummary):
+        """存储情绪总结（原样存储，衰减权重在读取时计算）"""
+        self._ensure_loaded(user_id)
         
-        # 应用时间衰减权重
-        weighted_summary = self._apply_time_decay(user_id, summary)
-        self.memories[user_id].append(weighted_summary)
+        timestamp = _parse_timestamp(summary.created_at)
+        self._append(user_id, summary, timestamp)
+        history = self.histories[user_id]
+        self._expire(user_id, history.timestamps[history.end - 1])
         
         # 更新用户情绪画像
-        self._update_emotion_profile(user_id, summary)
+        self._update_emotion_profile(user_id, summary, timestamp)
+        
+        # 持久化（SQLite存储在后台线程批量写入）
+        self.storage.append_summary(user_id, summary, timestamp)
+        self.storage.save_profile(self.profiles[user_id])
+        if self.index is not None:
+            self.index.add(user_id, summary)
         
         logger.info(f"已存储长期记忆: {user_id}, 总结数: {len(self.memories[user_id])}")
     
-    def _apply_time_decay(self, user_id: str, summary: EmotionSummary) -> EmotionSummary:
-        """应用时间衰减权重"""
-        if user_id not in self.memories:
-            return summary
-        
-        # 计算时间衰减权重
-        current_time = datetime.now()
+    def _expire(self, user_id: str, now: float):
+        """从队首清理超出保留时长的总结（均摊O(1)）；只有开启delete_expired时才同时从持久化存储中删除"""
+        if not math.isfinite(self.retention_seconds):
+            return
         summaries = self.memories[user_id]
-        
-        if not summaries:
-            return summary
-        
-        # 计算每个总结的时间权重（新数据权重更高）
-        recent_summaries = []
-        for s in summaries:
-            # 计算时间差异（小时）
-            try:
-                summary_time = datetime.fromisoformat(s.created_at)
-                hours_diff = (current_time - summary_time).total_seconds() / 3600
-                # 计算衰减权重：随时间的增长而衰减
-                weight = max(self.decay_config.min_weight, 
-                           self.decay_config.decay_rate ** (hours_diff / self.decay_config.time_window_hours))
-                
-                # 创建带权重的总结副本
-                weighted_summary = EmotionSummary(
-                    user_id=s.user_id,
-                    session_id=s.session_id,
-                    dominant_emotion=s.dominant_emotion,
-                    emotion_trend=s.emotion_trend,
-                    sensitive_topics=s.sensitive_topics,
-                    created_at=s.created_at,
-                    duration_minutes=s.duration_minutes,
-                    total_interactions=s.total_interactions
-                )
-                weighted_summary._weight = weight  # 添加权重属性
-                recent_summaries.append(weighted_summary)
-            except Exception as e:
-                logger.warning(f"计算时间衰减权重失败: {e}")
-                # 如果无法计算，使用默认权重
-                s._weight = self.decay_config.min_weight
-                recent_summaries.append(s)
-        
-        # 更新历史记录，只保留最近的数据
-        self.memories[user_id] = recent_summaries[-self.decay_config.time_window_hours:]  # 保留最近的时间窗口内的数据
-        
-        return summary
+        cutoff = now - self.retention_seconds
+        expired = self.histories[user_id].expire(cutoff)
+        if not expired:
+            return
+        for _ in range(expired):
+            summaries.popleft()
+        self.expired_summaries += expired
+        if self.decay_config.delete_expired:
+            self.storage.delete_before(user_id, cutoff)
     
-    def _update_emotion_profile(self, user_id: str, summary: EmotionSummary):
-        """更新用户情绪画像"""
+    def get_weighted_summaries(self, user_id: str, now: Optional[float] = None) -> List[Tuple[EmotionSummary, float]]:
+        """获取用户保留期内的总结及其当前衰减权重，按创建时间排列"""
+        self._ensure_loaded(user_id)
+        if user_id not in self.memories:
+            return []
+        if now is None:
+            now = time.time()
+        self._expire(user_id, now)
+        history = self.histories[user_id]
+        timestamps = history.timestamps[history.start:history.end].tolist()
+        return [
+            (summary, self.summary_weight(timestamp, now))
+            for summary, timestamp in zip(self.memories[user_id], timestamps)
+        ]
+    
+    def _update_emotion_profile(self, user_id: str, summary: EmotionSummary, timestamp: float):
+        """更新用户情绪画像（只累加原始计数，与历史长度无关的O(1)）"""
         if user_id not in self.profiles:
             # 初始化用户画像
             self.profiles[user_id] = EmotionProfile(
@@ -192,38 +565,21 @@ class LongTermMemory:
         
         profile = self.profiles[user_id]
         
-        # 更新主导情绪分布
+        # 主导情绪计数
         emotion = summary.dominant_emotion
-        if emotion in profile.dominant_emotions:
-            profile.dominant_emotions[emotion] += 1
-        else:
-            profile.dominant_emotions[emotion] = 1
-        
-        # 归一化情绪分布
-        total = sum(profile.dominant_emotions.values())
-        for e in profile.dominant_emotions:
-            profile.dominant_emotions[e] = profile.dominant_emotions[e] / total
-        
-        # 更新情绪趋势
-        trend_direction = self._parse_trend_direction(summary.emotion_trend)
-        if emotion in profile.emotion_trends:
-            profile.emotion_trends[emotion] += trend_direction
-        else:
-            profile.emotion_trends[emotion] = trend_direction
+        profile.emotion_counts[emotion] = profile.emotion_counts.get(emotion, 0) + 1
         
-        # 归一化趋势强度
-        max_trend = max(abs(t) for t in profile.emotion_trends.values()) if profile.emotion_trends else 1
-        if max_trend > 0:
-            for e in profile.emotion_trends:
-                profile.emotion_trends[e] = profile.emotion_trends[e] / max_trend
+        # 情绪趋势方向之和
+        profile.trend_sums[emotion] = profile.trend_sums.get(emotion, 0.0) + self._parse_trend_direction(summary.emotion_trend)
         
-        # 更新情绪稳定性（基于情绪变化频率）
-        profile.emotional_stability = self._calculate_emotional_stability(user_id)
+        # 情绪变化次数（用于稳定性）
+        if profile.summary_count > 0 and emotion != profile.last_emotion:
+            profile.emotion_changes += 1
+        profile.last_emotion = emotion
+        profile.summary_count += 1
         
         # 更新敏感话题
-        for topic in summary.sensitive_topics:
-            if topic not in profile.sensitive_topics:
-                profile.sensitive_topics.append(topic)
+        self._update_sensitive_topics(profile, summary.sensitive_topics, timestamp)
         
         # 更新个性特征（基于情绪模式）
         self._update_personality_traits(profile, summary)
@@ -233,6 +589,7 @@ class LongTermMemory:
         
         # 更新时间戳
         profile.last_updated = datetime.now().isoformat()
+        self.dirty_profiles.add(user_id)
     
     def _parse_trend_direction(self, trend_str: str) -> float:
         """解析趋势方向"""
@@ -246,30 +603,20 @@ class LongTermMemory:
         }
         return trend_mapping.get(trend_str, 0.0)
     
-    def _calculate_emotional_stability(self, user_id: str) -> float:
-        """计算情绪稳定性分数"""
-        if user_id not in self.memories or len(self.memories[user_id]) < 2:
+    def _calculate_emotional_stability(self, profile: EmotionProfile) -> float:
+        """计算情绪稳定性分数：相邻总结主导情绪变化越少越稳定"""
+        if profile.summary_count < 2:
             return 0.5
-        
-        summaries = self.memories[user_id]
-        
-        # 计算情绪变化的频率和幅度
-        emotion_changes = 0
-        for i in range(1, len(summaries)):
-            if summaries[i].dominant_emotion != summaries[i-1].dominant_emotion:
-                emotion_changes += 1
-        
-        # 稳定性得分：变化越少越稳定
-        stability = 1.0 - (emotion_changes / len(summaries))
+        stability = 1.0 - (profile.emotion_changes / profile.summary_count)
         return max(0.1, min(0.9, stability))
     
     def _update_personality_traits(self, profile: EmotionProfile, summary: EmotionSummary):
-        """更新个性特征"""
+        """更新个性特征得分之和"""
         # 基于情绪模式推断个性特征
-        traits = profile.personality_traits
+        traits = profile.trait_sums
         
         # 情绪稳定性关联谨慎程度
-        if profile.emotional_stability > 0.7:
+        if self._calculate_emotional_stability(profile) > 0.7:
             traits["谨慎"] = traits.get("谨慎", 0.0) + 0.1
         else:
             traits["随性"] = traits.get("随性", 0.0) + 0.1
@@ -281,19 +628,70 @@ class LongTermMemory:
         # 负面情绪关联敏感程度
         if summary.dominant_emotion in ["sadness", "anxiety", "anger"]:
             traits["敏感"] = traits.get("敏感", 0.0) + 0.05
+    
+    def _update_sensitive_topics(self, profile: EmotionProfile, topics: List[str], timestamp: float):
+        """Space-Saving更新敏感话题计数：计数器满时由新话题接管计数最小的一个，每个用户最多topic_capacity个"""
+        if not topics:
+            return
+        if not profile.topic_counts:
+            profile.topic_landmark = timestamp
+        
+        # 前向衰减：越新的出现权重越大，所有计数同比缩放，排序不随时间变化
+        exponent = self.topic_decay * (timestamp - profile.topic_landmark)
+        if exponent > _TOPIC_RESCALE_EXPONENT:
+            # 权重过大时把基准时间移到当前，整体缩小计数
+            scale = math.exp(-exponent)
+            for topic in profile.topic_counts:
+                profile.topic_counts[topic] *= scale
+                profile.topic_errors[topic] *= scale
+            profile.topic_landmark = timestamp
+            exponent = 0.0
+        weight = math.exp(exponent)
+        
+        counts, errors = profile.topic_counts, profile.topic_errors
+        capacity = max(1, self.decay_config.topic_capacity)
+        for topic in topics:
+            if topic in counts:
+                counts[topic] += weight
+            elif len(counts) < capacity:
+                counts[topic] = weight
+                errors[topic] = 0.0
+            else:
+                victim = min(counts, key=counts.get)
+                minimum = counts.pop(victim)
+                del errors[victim]
+                counts[topic] = minimum + weight
+                errors[topic] = minimum
+    
+    def _refresh_profile(self, profile: EmotionProfile) -> EmotionProfile:
+        """由原始累加量推导归一化的分布、趋势、稳定性和个性特征"""
+        if profile.summary_count == 0:
+            return profile  # 旧版本保存的画像没有累加量，保持原样
+        
+        total = profile.summary_count
+        profile.dominant_emotions = {e: count / total for e, count in profile.emotion_counts.items()}
+        
+        max_trend = max(abs(t) for t in profile.trend_sums.values())
+        profile.emotion_trends = {e: t / max_trend for e, t in profile.trend_sums.items()} if max_trend > 0 else dict(profile.trend_sums)
+        
+        profile.emotional_stability = self._calculate_emotional_stability(profile)
         
-        # 归一化个性特征
-        max_trait = max(traits.values()) if traits else 1
-        if max_trait > 0:
-            for trait in traits:
-                traits[trait] = min(1.0, traits[trait] / max_trait)
+        max_trait = max(profile.trait_sums.values()) if profile.trait_sums else 0.0
+        profile.personality_traits = {t: min(1.0, s / max_trait) for t, s in profile.trait_sums.items()} if max_trait > 0 else {}
+        
+        if profile.topic_counts:
+            # 按保证计数（计数减去高估上界）排序，刚接管计数器的新话题不会排在前面
+            counts, errors = profile.topic_counts, profile.topic_errors
+            profile.sensitive_topics = sorted(counts, key=lambda topic: (counts[topic] - errors[topic], counts[topic]), reverse=True)
+        return profile
     
     def get_user_profile(self, user_id: str) -> str:
         """获取用户情绪画像（增强版）"""
+        self._ensure_loaded(user_id)
         if user_id not in self.profiles:
             return "暂无历史情绪数据"
         
-        profile = self.profiles[user_id]
+        profile = self._refresh_profile(self.profiles[user_id])
         
         # 构建详细的情绪画像描述
         profile_parts = []
@@ -339,20 +737,141 @@ class LongTermMemory:
     
     def get_detailed_profile(self, user_id: str) -> Optional[EmotionProfile]:
         """获取详细的情绪画像数据"""
-        return self.profiles.get(user_id)
+        self._ensure_loaded(user_id)
+        profile = self.profiles.get(user_id)
+        return self._refresh_profile(profile) if profile is not None else None
+    
+    def get_history(self, user_id: str) -> Optional[EmotionHistory]:
+        """获取用户的列式情绪历史"""
+        self._ensure_loaded(user_id)
+        return self.histories.get(user_id)
+    
+    def close(self):
+        """写入剩余变更并关闭持久化存储和向量索引"""
+        self.storage.close()
+        if self.index is not None:
+            self.index.close()
 
 
 class MemoryManager:
     """情绪记忆管理器（增强版）"""
     
-    def __init__(self, max_stm_length: int = 10, decay_config: Optional[DecayConfig] = None):
-        self.stm = ShortTermMemory(max_length=max_stm_length)
-        self.ltm = LongTermMemory(decay_config=decay_config)
+    def __init__(self, max_stm_length: int = 10, decay_config: Optional[DecayConfig] = None, stm_raw_sample_rate: float = 0.0,
+                 stm_idle_ttl_seconds: float = 0.0, stm_max_sessions: int = 0, ltm_storage: Optional[LTMStorage] = None,
+                 journal: Optional[MemoryJournal] = None, ltm_index: Optional[SessionVectorIndex] = None,
+                 ltm_max_resident_users: int = 0):
+        self.stm = ShortTermMemory(max_length=max_stm_length, raw_sample_rate=stm_raw_sample_rate)
+        self.ltm = LongTermMemory(decay_config=decay_config, storage=ltm_storage, index=ltm_index,
+                                  max_resident_users=ltm_max_resident_users)
         self.decay_config = decay_config or DecayConfig()
+        self.stm_idle_ttl_seconds = stm_idle_ttl_seconds  # 会话空闲超过该时间后归档，<=0 表示不按空闲时间淘汰
+        self.stm_max_sessions = stm_max_sessions  # 短期记忆最多保留的会话数，<=0 表示不限制
+        self.journal = journal  # 进程内存储的操作日志，为空时不记录
+        self._profile_frames: Dict[str, bytes] = {}  # {user_id: 画像帧}，快照时只重新编码变更过的画像
+        self.eviction_stats = {
+            "evicted_idle": 0,  # 空闲超时归档的会话数
+            "evicted_lru": 0,  # 超出会话数上限归档的会话数
+            "archive_lag_seconds_max": 0.0,  # 会话到期到实际归档的最大延迟
+            "archive_lag_seconds_last": 0.0
+        }
+    
+    def analyze_and_store(self, dialogue_turn: str, user_id: str, session_id: str, emotion_result: EmotionResult) -> EmotionRecord:
+        """分析并存储情绪，返回短期记忆中的记录"""
+        record = self.stm.to_record(emotion_result)
+        last_active = time.time()
+        # 先编码日志帧，字段无法记录时在修改记忆之前失败
+        frame = encode_stm_append(
+            user_id, session_id, emotion_result.primary_emotion, record.intensity, record.timestamp,
+            record.keywords, last_active
+        ) if self.journal is not None else None
+        self.stm.append_record(user_id, session_id, record, last_active)
+        if frame is not None:
+            self.journal.append(frame)
+        
+        # 超出会话数上限时归档最久未活跃的会话
+        if self.stm_max_sessions > 0 and len(self.stm.sessions) > self.stm_max_sessions:
+            for lru_user_id, lru_session_id in self.stm.least_recent_sessions(len(self.stm.sessions) - self.stm_max_sessions):
+                self.archive_session(lru_user_id, lru_session_id)
+                self.eviction_stats["evicted_lru"] += 1
+        
+        return record
+    
+    def archive_session(self, user_id: str, session_id: str) -> EmotionSummary:
+        """将会话的短期记忆总结归档到长期记忆，并清除该会话"""
+        history_length = len(self.stm.get_recent_records(user_id, session_id))
+        summary = self.stm.generate_summary(user_id, session_id)
+        
+        # 添加会话统计信息
+        summary.duration_minutes = history_length * 0.5  # 估算会话时长
+        summary.total_interactions = history_length
+        
+        self.update_long_term_memory(user_id, summary)
+        self.clear_session(user_id, session_id)
+        return summary
+    
+    async def preload_user(self, user_id: str):
+        """预先在线程中加载用户的长期记忆（持久化存储时）"""
+        await self.ltm.preload_user(user_id)
+    
+    def idle_users(self, now: float) -> Set[str]:
+        """有会话空闲超时、下一轮清理会归档的用户"""
+        if self.stm_idle_ttl_seconds <= 0:
+            return set()
+        return {user_id for user_id, _ in self.stm.idle_sessions(now - self.stm_idle_ttl_seconds)}
     
-    def analyze_and_store(self, dialogue_turn: str, user_id: str, session_id: str, emotion_result: EmotionResult):
-        """分析并存储情绪"""
-        self.stm.add_emotion_result(user_id, session_id, emotion_result)
+    def sweep_idle_sessions(self, now: Optional[float] = None, is_busy: Optional[Callable[[str], bool]] = None) -> int:
+        """归档空闲超时的会话，返回归档数；is_busy(user_id)为True的用户本轮跳过"""
+        if self.stm_idle_ttl_seconds <= 0:
+            return 0
+        
+        now = time.time() if now is None else now
+        cutoff = now - self.stm_idle_ttl_seconds
+        idle = [key for key in self.stm.idle_sessions(cutoff) if is_busy is None or not is_busy(key[0])]
+        for user_id, session_id in idle:
+            lag = now - (self.stm.last_active(user_id, session_id) + self.stm_idle_ttl_seconds)
+            self.archive_session(user_id, session_id)
+            self.eviction_stats["evicted_idle"] += 1
+            self.eviction_stats["archive_lag_seconds_last"] = lag
+            self.eviction_stats["archive_lag_seconds_max"] = max(self.eviction_stats["archive_lag_seconds_max"], lag)
+        
+        if idle:
+            logger.info(f"已归档空闲会话: {len(idle)}个, 剩余会话: {len(self.stm.sessions)}")
+        return len(idle)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """记忆管理状态"""
+        stats = {
+            "live_sessions": len(self.stm.sessions),
+            "idle_ttl_seconds": self.stm_idle_ttl_seconds,
+            "max_sessions": self.stm_max_sessions,
+            "ltm_users": len(self.ltm.memories),
+            "ltm_retention_hours": round(self.ltm.retention_seconds / 3600, 2) if math.isfinite(self.ltm.retention_seconds) else None,
+            "ltm_expired_summaries": self.ltm.expired_summaries,
+            "ltm_evicted_users": self.ltm.evicted_users,
+            "ltm_storage": self.ltm.storage.stats(),
+            "journal": self.journal.stats() if self.journal is not None else None,
+            "ltm_index": self.ltm.index.stats() if self.ltm.index is not None else None
+        }
+        stats.update(self.eviction_stats)
+        return stats
+    
+    def replace_short_term_result(self, user_id: str, session_id: str, old_record: EmotionRecord, new_result: EmotionResult) -> bool:
+        """替换短期记忆中的临时结果"""
+        new_record = self.stm.to_record(new_result)
+        new_record.timestamp = old_record.timestamp
+        frame = None
+        if self.journal is not None:
+            offset = self.stm.offset_from_end(user_id, session_id, old_record)
+            if offset is None:
+                return False
+            frame = encode_stm_replace(
+                user_id, session_id, offset, new_result.primary_emotion, new_record.intensity,
+                new_record.timestamp, new_record.keywords
+            )
+        replaced = self.stm.replace_record(user_id, session_id, old_record, new_record)
+        if replaced and frame is not None:
+            self.journal.append(frame)
+        return replaced
     
     def get_short_term_history(self, user_id: str, session_id: str) -> List[EmotionResult]:
         """获取短期历史"""
@@ -368,70 +887,189 @@ class MemoryManager:
     
     def analyze_emotion_trend(self, user_id: str, window_hours: int = 24) -> Dict[str, Any]:
         """分析指定时间窗口内的情绪趋势"""
-        if user_id not in self.ltm.memories:
+        history = self.ltm.get_history(user_id)
+        if history is None:
             return {"error": "用户暂无情绪数据"}
         
-        summaries = self.ltm.memories[user_id]
-        current_time = datetime.now()
-        
-        # 过滤指定时间窗口内的数据
-        recent_summaries = []
-        for summary in summaries:
-            try:
-                summary_time = datetime.fromisoformat(summary.created_at)
-                hours_diff = (current_time - summary_time).total_seconds() / 3600
-                if hours_diff <= window_hours:
-                    recent_summaries.append(summary)
-            except:
-                continue
+        # 二分查找时间窗口的起点
+        now = time.time()
+        window = history.window(now - window_hours * 3600)
+        timestamps = history.timestamps[window]
+        codes = history.emotion_codes[window]
+        intensities = history.intensities[window]
         
-        if not recent_summaries:
+        if len(codes) == 0:
             return {"error": f"最近{window_hours}小时内无情绪数据"}
         
         # 分析趋势
         trend_analysis = {
             "time_window_hours": window_hours,
-            "total_summaries": len(recent_summaries),
+            "total_summaries": len(codes),
+            "total_interactions": int(history.interactions[window].sum()),
             "dominant_emotions": {},
             "trend_directions": {},
-            "emotional_volatility": self._calculate_volatility(recent_summaries)
+            "emotional_volatility": self._calculate_volatility(codes)
         }
         
-        # 统计主导情绪
-        for summary in recent_summaries:
-            emotion = summary.dominant_emotion
-            if emotion in trend_analysis["dominant_emotions"]:
-                trend_analysis["dominant_emotions"][emotion] += 1
-            else:
-                trend_analysis["dominant_emotions"][emotion] = 1
+        # 统计主导情绪（按首次出现的顺序）
+        unique_codes, first_index, counts = np.unique(codes, return_index=True, return_counts=True)
+        for i in np.argsort(first_index):
+            trend_analysis["dominant_emotions"][self.ltm.emotions.lookup(int(unique_codes[i]))] = int(counts[i])
         
         # 分析趋势方向
-        if len(recent_summaries) >= 2:
-            first_emotion = recent_summaries[0].dominant_emotion
-            last_emotion = recent_summaries[-1].dominant_emotion
+        if len(codes) >= 2:
+            first_emotion = self.ltm.emotions.lookup(int(codes[0]))
+            last_emotion = self.ltm.emotions.lookup(int(codes[-1]))
             trend_analysis["trend_directions"]["recent_change"] = f"从{first_emotion}到{last_emotion}"
+            
+            # 强度随时间变化的最小二乘斜率（每小时）
+            hours = (timestamps - timestamps[0]) / 3600
+            hours_centered = hours - hours.mean()
+            denominator = float(np.dot(hours_centered, hours_centered))
+            if denominator > 0:
+                slope = float(np.dot(hours_centered, intensities - intensities.mean())) / denominator
+                trend_analysis["trend_directions"]["intensity_slope_per_hour"] = round(slope, 6)
         
         return trend_analysis
     
-    def _calculate_volatility(self, summaries: List[EmotionSummary]) -> float:
-        """计算情绪波动性"""
-        if len(summaries) < 2:
+    def _calculate_volatility(self, emotion_codes: np.ndarray) -> float:
+        """计算情绪波动性：相邻总结主导情绪发生变化的比例"""
+        if len(emotion_codes) < 2:
             return 0.0
         
-        volatility = 0.0
-        emotion_changes = 0
+        emotion_changes = int(np.count_nonzero(emotion_codes[1:] != emotion_codes[:-1]))
+        return emotion_changes / len(emotion_codes)
+    
+    def find_similar_sessions(self, user_id: str, session_id: str = "", top_k: int = 5) -> List[Dict[str, Any]]:
+        """检索用户过去与当前会话最相似的会话；当前会话没有短期记忆时以最近一次归档的会话为查询"""
+        index = self.ltm.index
+        if index is None:
+            raise RuntimeError("未启用会话向量索引（需要 LTM_STORAGE_TYPE=vector_db）")
         
-        for i in range(1, len(summaries)):
-            if summaries[i].dominant_emotion != summaries[i-1].dominant_emotion:
-                emotion_changes += 1
+        if self.stm.get_recent_records(user_id, session_id):
+            query = self.stm.generate_summary(user_id, session_id)
+            exclude = None
+        else:
+            summaries = self.ltm.memories.get(user_id)
+            if summaries:
+                query = summaries[-1]
+            else:
+                # 长期记忆未恢复（如重启后没有操作日志）时以索引中该用户最近的会话为查询
+                row = index.latest_row(user_id)
+                if row is None:
+                    return []
+                _, query = index.get(row)
+            exclude = query.key
         
-        volatility = emotion_changes / len(summaries)
-        return volatility
+        similar = []
+        for row, score in index.search(embed_summary(query), top_k + (exclude is not None), user_id=user_id):
+            _, summary = index.get(row)
+            if summary.key == exclude:
+                continue
+            similar.append({
+                "session_id": summary.session_id,
+                "created_at": summary.created_at,
+                "similarity": round(score, 4),
+                "dominant_emotion": summary.dominant_emotion,
+                "emotion_trend": summary.emotion_trend,
+                "emotion_distribution": summary.emotion_distribution,
+                "sensitive_topics": summary.sensitive_topics,
+                "total_interactions": summary.total_interactions
+            })
+        return similar[:top_k]
     
     def update_long_term_memory(self, user_id: str, summary: EmotionSummary):
         """更新长期记忆"""
+        # 持久化存储自身保证长期记忆的持久性，日志只记录进程内存储的变更
+        frame = encode_summary(user_id, summary, _parse_timestamp(summary.created_at)) \
+            if self.journal is not None and not self.ltm.storage.persistent else None
         self.ltm.store_summary(user_id, summary)
+        if frame is not None:
+            self.journal.append(frame)
     
     def clear_session(self, user_id: str, session_id: str):
         """清除会话记忆"""
-        self.stm.clear_session(user_id, session_id)
\ No newline at end of file
+        frame = encode_stm_clear(user_id, session_id) if self.journal is not None else None
+        self.stm.clear_session(user_id, session_id)
+        if frame is not None:
+            self.journal.append(frame)
+    
+    def recover(self) -> int:
+        """加载最新快照并重放之后的日志，然后开始写入新日志，返回重放的事件数"""
+        if self.journal is None:
+            return 0
+        
+        events = 0
+        for kind, fields in self.journal.recover():
+            events += 1
+            if kind == STM_APPEND:
+                user_id, session_id, emotion, intensity, timestamp, keywords, last_active = fields
+                self.stm.append_record(user_id, session_id, self.stm.make_record(emotion, intensity, timestamp, keywords), last_active)
+            elif kind == STM_REPLACE:
+                user_id, session_id, offset, emotion, intensity, timestamp, keywords = fields
+                self.stm.replace_from_end(user_id, session_id, offset, self.stm.make_record(emotion, intensity, timestamp, keywords))
+            elif kind == STM_CLEAR:
+                self.stm.clear_session(*fields)
+            elif kind == LTM_STORE:
+                user_id, summary, _ = fields
+                self.ltm.store_summary(user_id, summary)
+            elif kind == LTM_RESTORE:
+                self.ltm.restore_summary(*fields)
+            elif kind == LTM_PROFILE:
+                user_id, profile_json = fields
+                self.ltm.restore_profile(EmotionProfile.model_validate_json(profile_json))
+        
+        self.journal.start()
+        return events
+    
+    def snapshot(self) -> int:
+        """把当前完整状态写为快照并切换到新日志，返回快照中的会话数
+        
+        事件循环中只复制记录引用（记录和总结创建后不再修改），编码和写入在日志的后台线程中进行；
+        画像会被原地更新，只重新编码上次快照之后变更过的画像。
+        """
+        if self.journal is None:
+            return 0
+        
+        sessions = [
+            (user_id, session_id, tuple(session.records), session.last_active)
+            for (user_id, session_id), session in self.stm.sessions.items()
+        ]
+        summaries = []
+        if not self.ltm.storage.persistent:
+            for user_id, memories in self.ltm.memories.items():
+                history = self.ltm.histories[user_id]
+                summaries.append((user_id, tuple(memories), history.timestamps[history.start:history.end].copy()))
+            for user_id in self.ltm.dirty_profiles:
+                profile = self.ltm.profiles.get(user_id)
+                if profile is None:
+                    self._profile_frames.pop(user_id, None)
+                else:
+                    self._profile_frames[user_id] = encode_profile(user_id, profile.model_dump_json())
+        self.ltm.dirty_profiles.clear()
+        profile_frames = list(self._profile_frames.values())
+        emotions = self.stm.emotions
+        
+        def build() -> bytes:
+            frames = bytearray()
+            for user_id, session_id, records, last_active in sessions:
+                for record in records:
+                    frames += encode_stm_append(
+                        user_id, session_id, emotions.lookup(record.emotion_code), record.intensity, record.timestamp,
+                        record.keywords, last_active
+                    )
+            for user_id, memories, timestamps in summaries:
+                for summary, timestamp in zip(memories, timestamps.tolist()):
+                    frames += encode_summary(user_id, summary, timestamp, LTM_RESTORE)
+            for frame in profile_frames:
+                frames += frame
+            return bytes(frames)
+        
+        self.journal.snapshot(build)
+        return len(sessions)
+    
+    def close(self):
+        """关闭操作日志和长期记忆存储"""
+        if self.journal is not None:
+            self.journal.close()
+        self.ltm.close()
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""本地模拟的千帆chat/completions接口（用于离线压测和后端降级复现）
+
+用法:
+    python -m eme0.mock_qianfan --port 8765 --latency-ms 800 --latency-sigma 0.5 --error-rate 0.05 --rate-limit-rate 0.05
+
+然后设置 EME0_LLM_BACKEND=mock 启动 Eme0。
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from .config import BaiduQianfanConfig
+from .llm_client import LLMClient
+
+_SINGLE_DIALOGUE_RE = re.compile(r"对话内容：(.*?)\n\n请返回", re.S)
+_BATCH_LINE_RE = re.compile(r"^(\d+)\. (.*)$", re.M)
+
+
+@dataclass
+class MockQianfanSettings:
+    """模拟接口行为配置"""
+    latency_ms: float = 500.0  # 响应延迟中位数（毫秒）
+    latency_sigma: float = 0.5  # 对数正态分布的sigma，0表示固定延迟
+    error_rate: float = 0.0  # 返回500错误的概率
+    rate_limit_rate: float = 0.0  # 返回429限流的概率
+    retry_after: float = 1.0  # 429响应的Retry-After（秒）
+    stream_chunk_chars: int = 8  # 流式响应每个分片的字符数
+    trailing_tokens: int = 20  # JSON之后额外输出的说明文字分片数（用于验证流式提前结束）
+
+
+class MockQianfanServer:
+    """模拟千帆接口的aiohttp应用"""
+    
+    def __init__(self, settings: Optional[MockQianfanSettings] = None, seed: Optional[int] = None):
+        self.settings = settings or MockQianfanSettings()
+        self.random = random.Random(seed)
+        self.rule_client = LLMClient(BaiduQianfanConfig(backend="rule"))
+        self.counters = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+    
+    def create_app(self) -> web.Application:
+        """创建aiohttp应用"""
+        app = web.Application()
+        app.router.add_post("/v2/chat/completions", self.handle_completion)
+        app.router.add_route("HEAD", "/v2/chat/completions", self.handle_head)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+    
+    def _sample_latency(self) -> float:
+        """按对数正态分布采样延迟（秒）"""
+        median = self.settings.latency_ms / 1000
+        if self.settings.latency_sigma <= 0:
+            return median
+        return self.random.lognormvariate(0.0, self.settings.latency_sigma) * median
+    
+    async def handle_head(self, request: web.Request) -> web.Response:
+        return web.Response(status=200)
+    
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.counters)
+    
+    async def handle_completion(self, request: web.Request) -> web.StreamResponse:
+        """处理chat/completions请求"""
+        self.counters["requests"] += 1
+        payload = await request.json()
+        await asyncio.sleep(self._sample_latency())
+        
+        roll = self.random.random()
+        if roll < self.settings.rate_limit_rate:
+            self.counters["rate_limited"] += 1
+            return web.json_response(
+                {"error": {"code": "rpm_rate_limit_exceeded", "message": "mock rate limited"}},
+                status=429,
+                headers={"Retry-After": str(self.settings.retry_after)}
+            )
+        if roll < self.settings.rate_limit_rate + self.settings.error_rate:
+            self.counters["errors"] += 1
+            return web.json_response({"error": {"code": "internal_error", "message": "mock error"}}, status=500)
+        
+        prompt = payload["messages"][-1]["content"]
+        content = await self._build_content(prompt)
+        self.counters["ok"] += 1
+        
+        if payload.get("stream"):
+            return await self._stream_content(request, content)
+        
+        return web.json_response({
+            "id": "mock-completion",
+            "object": "chat.completion",
+            "model": payload.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]
+        })
+    
+    async def _build_content(self, prompt: str) -> str:
+        """根据prompt中的对话生成与真实模型格式一致的JSON输出"""
+        batch_lines = _BATCH_LINE_RE.findall(prompt) if "JSON数组" in prompt else []
+        if batch_lines:
+            items = []
+            for index, dialogue in batch_lines:
+                item = self._analyze(dialogue)
+                item["index"] = int(index)
+                items.append(item)
+            return json.dumps(items, ensure_ascii=False)
+        
+        match = _SINGLE_DIALOGUE_RE.search(prompt)
+        dialogue = match.group(1) if match else prompt
+        return json.dumps(self._analyze(dialogue), ensure_ascii=False)
+    
+    def _analyze(self, dialogue: str) -> Dict[str, Any]:
+        result = self.rule_client.analyze_emotion_by_rules(dialogue)
+        return {
+            "primary_emotion": result.primary_emotion,
+            "emotion_intensity": round(result.emotion_intensity, 2),
+            "emotion_keywords": result.emotion_keywords,
+            "analysis": "mock analysis"
+        }
+    
+    async def _stream_content(self, request: web.Request, content: str) -> web.StreamResponse:
+        """以SSE分片输出，JSON之后追加说明文字模拟尾部token"""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        
+        size = max(1, self.settings.stream_chunk_chars)
+        chunks: List[str] = [content[i:i + size] for i in range(0, len(content), size)]
+        chunks.extend(["\n以上是情绪分析结果。"] * self.settings.trailing_tokens)
+        
+        try:
+            for chunk in chunks:
+                event = {"choices": [{"index": 0, "delta": {"content": chunk}}]}
+                await response.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                await asyncio.sleep(0.005)
+            await response.write(b"data: [DONE]\n\n")
+        except (ConnectionResetError, asyncio.CancelledError):
+            # 客户端提前断开（流式提前结束）
+            pass
+        return response
+
+
+async def start_mock_server(settings: Optional[MockQianfanSettings] = None, host: str = "127.0.0.1", port: int = 8765,
+                            seed: Optional[int] = None) -> web.AppRunner:
+    """在当前事件循环中启动模拟服务，返回runner（调用runner.cleanup()停止）"""
+    mock = MockQianfanServer(settings, seed=seed)
+    runner = web.AppRunner(mock.create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟千帆chat/completions接口")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="对数正态分布sigma，0为固定延迟")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500错误概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429限流概率")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429响应的Retry-After（秒）")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    
+    settings = MockQianfanSettings(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after
+    )
+    mock = MockQianfanServer(settings, seed=args.seed)
+    print(f"模拟千帆接口已启动: http://{args.host}:{args.port}/v2/chat/completions")
+    web.run_app(mock.create_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""千帆API调用的限流与自适应并发控制"""
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Dict, Optional
+
+
+class LimiterOverloadError(Exception):
+    """本地排队等待超过上限（调用方应降级而不是继续排队）"""
+
+
+async def _wait_bounded(waiter: Awaitable, max_wait: float, what: str):
+    """等待waiter，max_wait>0时超时抛出LimiterOverloadError"""
+    if max_wait <= 0:
+        return await waiter
+    try:
+        return await asyncio.wait_for(waiter, max_wait)
+    except asyncio.TimeoutError:
+        raise LimiterOverloadError(f"等待{what}超过{max_wait}秒") from None
+
+
+class TokenBucket:
+    """令牌桶限流器"""
+    
+    def __init__(self, rate: float, capacity: float, max_wait: float = 0.0):
+        self.rate = rate  # 每秒补充的令牌数，<=0 表示不限流
+        self.capacity = max(1.0, capacity)
+        self.max_wait = max_wait  # 最长排队时间（秒），<=0 表示不限制
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waiting = 0  # 等待令牌的请求数
+        self.rejected = 0  # 排队超时被拒绝的请求数
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+    
+    async def acquire(self):
+        """获取一个令牌，令牌不足时等待；等待超过max_wait时抛出LimiterOverloadError"""
+        if self.rate <= 0:
+            return
+        
+        self.waiting += 1
+        try:
+            await _wait_bounded(self._take(), self.max_wait, "限流令牌")
+        except LimiterOverloadError:
+            self.rejected += 1
+            raise
+        finally:
+            self.waiting -= 1
+    
+    async def _take(self):
+        # 排队获取，保证等待者按到达顺序拿到令牌；超时取消时不消耗令牌
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1.0:
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """当前限流状态"""
+        if self.rate > 0:
+            self._refill()
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.capacity,
+            "available_tokens": round(self._tokens, 2),
+            "max_wait": self.max_wait,
+            "waiting": self.waiting,
+            "rejected": self.rejected
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD自适应并发上限：成功时加性增加，过载时乘性减少"""
+    
+    def __init__(self, initial_limit: int = 8, min_limit: int = 1, max_limit: int = 64,
+                 decrease_factor: float = 0.5, max_wait: float = 0.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self.decrease_factor = decrease_factor
+        self.max_wait = max_wait  # 最长排队时间（秒），<=0 表示不限制
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0  # 排队超时被拒绝的请求数
+        self._condition = asyncio.Condition()
+    
+    async def acquire(self):
+        """获取并发槽位；等待超过max_wait时抛出LimiterOverloadError"""
+        async with self._condition:
+            self.waiting += 1
+            try:
+                await _wait_bounded(self._condition.wait_for(lambda: self.in_flight < int(self.limit)),
+                                    self.max_wait, "并发槽位")
+            except LimiterOverloadError:
+                self.rejected += 1
+                raise
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+    
+    async def release(self):
+        """释放并发槽位"""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+    
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+    
+    def on_success(self):
+        """请求成功：每个上限窗口大约增加1个并发"""
+        self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+    
+    def on_overload(self):
+        """后端过载（429/5xx/超时）：并发上限乘性减少"""
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+    
+    def stats(self) -> Dict[str, Any]:
+        """当前并发状态"""
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "max_wait": self.max_wait,
+            "waiting": self.waiting,
+            "rejected": self.rejected
+        }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After响应头（秒数或HTTP日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        retry_time = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_time.tzinfo is None:
+        retry_time = retry_time.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_time - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float, retry_after: Optional[float] = None) -> float:
+    """计算带全抖动的指数退避时间，服务端给出Retry-After时不早于该时间重试"""
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
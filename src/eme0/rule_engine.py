@@ -0,0 +1,388 @@
+"""基于Aho-Corasick自动机的规则情绪分析引擎"""
+from collections import deque
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .schemas import EmotionResult
+
+# 规则分析结果的原始输出前缀，用于区分规则结果和LLM结果
+RULE_ANALYSIS_PREFIX = "规则分析结果"
+
+# 默认情绪词典 {情绪: {关键词: 权重}}
+DEFAULT_EMOTION_LEXICON: Dict[str, Dict[str, float]] = {
+    "happiness": {w: 1.0 for w in ["开心", "高兴", "快乐", "愉快", "兴奋", "满足", "棒", "太好了", "哈哈", "嘻嘻"]},
+    "sadness": {w: 1.0 for w in ["难过", "伤心", "失落", "沮丧", "不开心", "郁闷", "痛苦", "悲伤", "哭", "失望"]},
+    "anger": {w: 1.0 for w in ["生气", "愤怒", "恼火", "讨厌", "烦", "气死", "该死", "混蛋", "可恶", "操"]},
+    "fear": {w: 1.0 for w in ["害怕", "恐惧", "担心", "紧张", "焦虑", "不安", "恐慌", "忧虑", "怕", "慌"]},
+    "surprise": {w: 1.0 for w in ["惊讶", "意外", "震惊", "奇怪", "没想到", "居然", "天啊", "哇", "竟然"]}
+}
+
+# 否定词：出现在情绪词前方窗口内时反转或抵消该情绪
+DEFAULT_NEGATORS = ["不", "没", "没有", "别", "不是", "并不", "毫不", "从不", "一点也不", "不再"]
+
+# 程度副词及其权重倍数
+DEFAULT_INTENSIFIERS: Dict[str, float] = {
+    "很": 1.3, "非常": 1.5, "特别": 1.5, "十分": 1.5, "太": 1.4, "超级": 1.6, "极其": 1.8,
+    "真的": 1.3, "好": 1.2, "有点": 0.7, "有些": 0.7, "稍微": 0.6, "略": 0.6
+}
+
+# 被否定后的情绪转换（未列出的情绪被否定后不计分）
+NEGATION_FLIP = {"happiness": "sadness"}
+
+# 情绪词与修饰词之间允许的最大间隔（字符数）
+MODIFIER_WINDOW = 2
+
+KIND_EMOTION = 0
+KIND_NEGATOR = 1
+KIND_INTENSIFIER = 2
+
+# 批量打分时拼接文本用的分隔符（不出现在任何模式中，命中不会跨越文本）
+BATCH_SEPARATOR = "\x00"
+
+
+class AhoCorasick:
+    """Aho-Corasick多模式匹配自动机，一次扫描找出所有命中"""
+    
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+        self._build()
+    
+    def _build(self):
+        # 构建trie
+        for pattern_id, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] = self._output[state] + (pattern_id,)
+        
+        # 广度优先计算失配指针，并合并输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail_target = self._goto[fail].get(ch, 0)
+                self._fail[next_state] = fail_target if fail_target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+    
+    @property
+    def size(self) -> int:
+        """自动机状态数"""
+        return len(self._goto)
+    
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """返回所有命中 [(结束位置(不含), 模式ID)]"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        hits = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                end = i + 1
+                for pattern_id in output[state]:
+                    hits.append((end, pattern_id))
+        return hits
+
+
+def _longest_non_overlapping(hits: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    """从可能重叠的命中中选出不重叠的命中，重叠时保留较长者"""
+    return _select_sorted(sorted(hits, key=lambda h: (h[0], -(h[1] - h[0]))))
+
+
+def _select_sorted(hits: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    """_longest_non_overlapping的选择部分，输入已按(起始, -长度)排序"""
+    selected = []
+    covered_until = -1
+    for hit in hits:
+        if hit[1] <= covered_until:
+            continue
+        if selected and hit[0] < selected[-1][1]:
+            if hit[1] - hit[0] <= selected[-1][1] - selected[-1][0]:
+                continue
+            selected.pop()
+        selected.append(hit)
+        covered_until = max(covered_until, hit[1])
+    return selected
+
+
+class RuleScore:
+    """规则打分结果"""
+    
+    __slots__ = ("scores", "keywords", "primary_emotion", "emotion_intensity")
+    
+    def __init__(self, scores: Dict[str, float], keywords: List[str], primary_emotion: str, emotion_intensity: float):
+        self.scores = scores
+        self.keywords = keywords
+        self.primary_emotion = primary_emotion
+        self.emotion_intensity = emotion_intensity
+    
+    @property
+    def confidence(self) -> float:
+        """主要情绪得分占全部情绪得分的比例；未命中任何关键词时为0（无法区分平静和未覆盖）"""
+        total = sum(self.scores.values())
+        if total <= 0:
+            return 0.0
+        return self.scores[self.primary_emotion] / total
+    
+    @property
+    def primary_score(self) -> float:
+        """主要情绪的加权得分（命中强度）"""
+        return self.scores.get(self.primary_emotion, 0.0)
+    
+    def coverage(self, text: str) -> float:
+        """情绪关键词覆盖的文本比例"""
+        return min(1.0, sum(len(word) for word in self.keywords) / len(text)) if text else 0.0
+
+
+class RuleEmotionEngine:
+    """编译后的规则情绪分析引擎（构建一次，同步调用）"""
+    
+    def __init__(self, lexicon: Optional[Dict[str, Dict[str, float]]] = None,
+                 negators: Optional[Iterable[str]] = None,
+                 intensifiers: Optional[Dict[str, float]] = None,
+                 base_intensity: float = 0.3, intensity_step: float = 0.15, max_intensity: float = 0.8):
+        self.lexicon = lexicon if lexicon is not None else DEFAULT_EMOTION_LEXICON
+        self.negators = list(negators if negators is not None else DEFAULT_NEGATORS)
+        self.intensifiers = intensifiers if intensifiers is not None else DEFAULT_INTENSIFIERS
+        self.base_intensity = base_intensity
+        self.intensity_step = intensity_step
+        self.max_intensity = max_intensity
+        self.emotions = list(self.lexicon.keys())
+        
+        # 模式表：(文本, 类型, 情绪, 权重)
+        self._entries: List[Tuple[str, int, Optional[str], float]] = []
+        for emotion, words in self.lexicon.items():
+            for word, weight in words.items():
+                self._entries.append((word, KIND_EMOTION, emotion, float(weight)))
+        for word in self.negators:
+            self._entries.append((word, KIND_NEGATOR, None, 0.0))
+        for word, factor in self.intensifiers.items():
+            self._entries.append((word, KIND_INTENSIFIER, None, float(factor)))
+        
+        # 只有词典包含大小写字母（如英文词典）时才需要对输入做lower()
+        self.case_insensitive = any(entry[0].lower() != entry[0].upper() for entry in self._entries)
+        if self.case_insensitive:
+            self._entries = [(entry[0].lower(),) + entry[1:] for entry in self._entries]
+        
+        self.automaton = AhoCorasick(entry[0] for entry in self._entries)
+        
+        # 打分列：词典外的否定翻转目标排在最前，同分时列序靠后的情绪优先
+        extra = [e for e in dict.fromkeys(NEGATION_FLIP.values()) if e not in self.lexicon]
+        self._columns: List[str] = extra + self.emotions
+        self._column_order = {emotion: i for i, emotion in enumerate(self._columns)}
+        
+        # 批量打分用的模式属性数组
+        column_of = self._column_order
+        self._pattern_len = np.array([len(entry[0]) for entry in self._entries], dtype=np.int64)
+        self._pattern_kind = np.array([entry[1] for entry in self._entries], dtype=np.int64)
+        self._pattern_value = np.array([entry[3] for entry in self._entries], dtype=np.float64)
+        self._pattern_column = np.array([column_of[entry[2]] if entry[1] == KIND_EMOTION else -1
+                                         for entry in self._entries], dtype=np.int64)
+        self._flip_column = np.array([column_of.get(NEGATION_FLIP.get(e), -1) for e in self._columns], dtype=np.int64)
+    
+    @property
+    def keyword_count(self) -> int:
+        """情绪关键词数量"""
+        return sum(len(words) for words in self.lexicon.values())
+    
+    def _weighted_hits(self, text: str) -> List[Tuple[str, str, float]]:
+        """匹配文本并应用否定词和程度副词，返回 [(关键词, 情绪, 权重)]"""
+        entries = self._entries
+        if self.case_insensitive:
+            text = text.lower()
+        emotion_hits = []  # (起始, 结束, 模式ID)
+        modifier_hits = []
+        for end, pattern_id in self.automaton.find_all(text):
+            word, kind = entries[pattern_id][0], entries[pattern_id][1]
+            hit = (end - len(word), end, pattern_id)
+            if kind == KIND_EMOTION:
+                emotion_hits.append(hit)
+            else:
+                modifier_hits.append(hit)
+        
+        weighted = []
+        if emotion_hits:
+            # 重叠时保留最长的词（如“不开心”优先于“开心”，“没有”优先于“没”）
+            selected = _longest_non_overlapping(emotion_hits)
+            modifier_hits = _longest_non_overlapping(modifier_hits)
+            
+            for start, end, pattern_id in selected:
+                word, _, emotion, weight = entries[pattern_id]
+                negated, factor = self._modifiers_before(start, modifier_hits, selected)
+                weight *= factor
+                if negated:
+                    emotion = NEGATION_FLIP.get(emotion)
+                    weight *= 0.5
+                    if emotion is None:
+                        continue
+                weighted.append((word, emotion, weight))
+        return weighted
+    
+    def score(self, text: str) -> RuleScore:
+        """对文本打分"""
+        scores: Dict[str, float] = {}
+        keywords: List[str] = []
+        for word, emotion, weight in self._weighted_hits(text):
+            scores[emotion] = scores.get(emotion, 0.0) + weight
+            if word not in keywords:
+                keywords.append(word)
+        
+        if scores:
+            # 按列序排列，保证求和顺序与批量打分一致
+            order = self._column_order
+            scores = {emotion: scores[emotion] for emotion in sorted(scores, key=order.__getitem__)}
+            # 同分时按词典中情绪的顺序取靠后的（与原规则一致：后检测到的情绪覆盖前者）
+            primary_emotion = max(scores, key=lambda e: (scores[e], order[e]))
+            total = sum(scores.values())
+            emotion_intensity = min(self.max_intensity, self.base_intensity + self.intensity_step * total)
+        else:
+            primary_emotion = "neutral"
+            emotion_intensity = self.base_intensity
+        
+        return RuleScore(scores, keywords, primary_emotion, emotion_intensity)
+    
+    def score_batch(self, texts: Sequence[str]) -> List[RuleScore]:
+        """批量打分：拼接全部文本做一次自动机扫描，再按情绪列用NumPy累加，结果与逐条score()一致"""
+        count = len(texts)
+        if self.case_insensitive:
+            texts = [text.lower() for text in texts]
+        offsets = np.zeros(count, dtype=np.int64)
+        if count > 1:
+            np.cumsum(np.fromiter((len(text) + 1 for text in texts[:-1]), dtype=np.int64, count=count - 1),
+                      out=offsets[1:])
+        hits = self.automaton.find_all(BATCH_SEPARATOR.join(texts))
+        hits = np.fromiter(chain.from_iterable(hits), dtype=np.int64, count=2 * len(hits)).reshape(-1, 2)
+        ends, pattern_ids = hits[:, 0], hits[:, 1]
+        starts = ends - self._pattern_len[pattern_ids]
+        is_emotion = self._pattern_kind[pattern_ids] == KIND_EMOTION
+        
+        # 文本之间互不重叠，对整个语料选最长不重叠命中等价于逐条选择；
+        # 同一起点只有最长的命中可能被选中，先用NumPy排序去重再做顺序选择
+        def select(mask):
+            start, end, pattern_id = starts[mask], ends[mask], pattern_ids[mask]
+            order = np.lexsort((start - end, start))
+            start, end, pattern_id = start[order], end[order], pattern_id[order]
+            first = np.ones(len(start), dtype=bool)
+            first[1:] = start[1:] != start[:-1]
+            chosen = _select_sorted(list(zip(start[first].tolist(), end[first].tolist(), pattern_id[first].tolist())))
+            return np.array(chosen, dtype=np.int64).reshape(-1, 3).T
+        
+        e_start, e_end, e_pattern = select(is_emotion)
+        if not len(e_start):
+            return [RuleScore({}, [], "neutral", self.base_intensity) for _ in range(count)]
+        m_start, m_end, m_pattern = select(~is_emotion)
+        
+        # 修饰词不能是其他情绪词的一部分：选中的情绪词互不重叠，只需检查起点不晚于它的最后一个
+        containing = np.searchsorted(e_start, m_start, side="right") - 1
+        free = (containing < 0) | (m_end > e_end[np.maximum(containing, 0)])
+        m_start, m_end, m_pattern = m_start[free], m_end[free], m_pattern[free]
+        m_row = np.searchsorted(offsets, m_start, side="right") - 1
+        m_negator = self._pattern_kind[m_pattern] == KIND_NEGATOR
+        m_value = self._pattern_value[m_pattern]
+        
+        # 情绪词前方窗口内的修饰词：不重叠的修饰词结束位置递增，窗口内最多MODIFIER_WINDOW+1个，按顺序应用
+        e_row = np.searchsorted(offsets, e_start, side="right") - 1
+        low = np.searchsorted(m_end, e_start - MODIFIER_WINDOW, side="left")
+        high = np.searchsorted(m_end, e_start, side="right")
+        negated = np.zeros(len(e_start), dtype=bool)
+        factor = np.ones(len(e_start), dtype=np.float64)
+        for step in range(int((high - low).max(initial=0))):
+            index = low + step
+            valid = index < high
+            index = np.minimum(index, len(m_end) - 1)
+            valid &= m_row[index] == e_row
+            negated ^= valid & m_negator[index]
+            factor = np.where(valid & ~m_negator[index], factor * m_value[index], factor)
+        
+        weight = self._pattern_value[e_pattern] * factor
+        column = self._pattern_column[e_pattern]
+        column = np.where(negated, self._flip_column[column], column)
+        weight = np.where(negated, weight * 0.5, weight)
+        kept = column >= 0
+        e_row, e_pattern, column, weight = e_row[kept], e_pattern[kept], column[kept], weight[kept]
+        
+        # 每条文本一行、每种情绪一列，按命中顺序累加
+        matrix = np.zeros((count, len(self._columns)), dtype=np.float64)
+        hit_counts = np.zeros((count, len(self._columns)), dtype=np.int64)
+        np.add.at(matrix, (e_row, column), weight)
+        np.add.at(hit_counts, (e_row, column), 1)
+        total = np.zeros(count, dtype=np.float64)
+        for j in range(len(self._columns)):
+            total += matrix[:, j]
+        ranked = np.where(hit_counts > 0, matrix, -np.inf)
+        primary = len(self._columns) - 1 - np.argmax(ranked[:, ::-1], axis=1)
+        intensity = np.minimum(self.max_intensity, self.base_intensity + self.intensity_step * total)
+        
+        columns, entries = self._columns, self._entries
+        scores: List[Dict[str, float]] = [{} for _ in range(count)]
+        rows, cols = np.nonzero(hit_counts)
+        for row, j, value in zip(rows.tolist(), cols.tolist(), matrix[rows, cols].tolist()):
+            scores[row][columns[j]] = value
+        keywords: List[Dict[str, None]] = [{} for _ in range(count)]
+        for row, pattern_id in zip(e_row.tolist(), e_pattern.tolist()):
+            keywords[row][entries[pattern_id][0]] = None
+        
+        return [
+            RuleScore(row_scores, list(row_keywords), columns[j], value) if row_scores
+            else RuleScore({}, [], "neutral", self.base_intensity)
+            for row_scores, row_keywords, j, value in zip(scores, keywords, primary.tolist(), intensity.tolist())
+        ]
+    
+    def _modifiers_before(self, start: int, modifier_hits: List[Tuple[int, int, int]],
+                          emotion_hits: List[Tuple[int, int, int]]) -> Tuple[bool, float]:
+        """查找情绪词前方窗口内的否定词和程度副词"""
+        negated = False
+        factor = 1.0
+        for m_start, m_end, pattern_id in modifier_hits:
+            if m_end > start or start - m_end > MODIFIER_WINDOW:
+                continue
+            # 修饰词不能是其他情绪词的一部分
+            if any(e_start <= m_start and m_end <= e_end for e_start, e_end, _ in emotion_hits):
+                continue
+            _, kind, _, value = self._entries[pattern_id]
+            if kind == KIND_NEGATOR:
+                negated = not negated
+            else:
+                factor *= value
+        return negated, factor
+    
+    def analyze(self, text: str) -> EmotionResult:
+        """规则分析情绪"""
+        return self.to_result(self.score(text))
+    
+    def analyze_batch(self, texts: Sequence[str]) -> List[EmotionResult]:
+        """批量规则分析（向量化打分，用于回填和批量降级）；同一批结果共用一个时间戳"""
+        timestamp = datetime.now().isoformat()
+        return [self.to_result(score, timestamp) for score in self.score_batch(texts)]
+    
+    def to_result(self, score: RuleScore, timestamp: Optional[str] = None) -> EmotionResult:
+        """把打分结果转换为EmotionResult"""
+        primary_emotion, emotion_intensity = score.primary_emotion, score.emotion_intensity
+        return EmotionResult(
+            primary_emotion=primary_emotion,
+            emotion_intensity=emotion_intensity,
+            emotion_keywords=score.keywords,
+            raw_llm_response=f"{RULE_ANALYSIS_PREFIX}: {primary_emotion}({emotion_intensity})",
+            confidence=score.confidence,
+            timestamp=timestamp or datetime.now().isoformat()
+        )
@@ -10,6 +10,8 @@ class EmotionResult(BaseModel):
     emotion_intensity: float = Field(..., ge=0.0, le=1.0, description="情绪强度 (0.0 - 1.0)")
     emotion_keywords: List[str] = Field(default_factory=list, description="提取出的情绪关键词")
     raw_llm_response: Optional[str] = Field(None, description="LLM分析的原始输出（用于调试）")
+    confidence: Optional[float] = Field(None, ge=0.0, le=1.0, description="分析结果置信度（本地分析层给出，LLM结果为空）")
+    analysis_tier: Optional[str] = Field(None, description="给出结果的分析层：cache, rules, classifier, llm, fallback")
     timestamp: str = Field(default_factory=lambda: datetime.now().isoformat(), description="分析时间戳")
     
     class Config:
@@ -52,6 +54,14 @@ class EmotionSummary(BaseModel):
     created_at: str = Field(..., description="创建时间")
     duration_minutes: float = Field(default=0.0, description="会话持续时间（分钟）")
     total_interactions: int = Field(default=0, description="会话交互次数")
+    average_intensity: float = Field(default=0.5, description="会话平均情绪强度")
+    emotion_distribution: Dict[str, float] = Field(default_factory=dict, description="会话内各情绪的占比")
+    summary_id: str = Field(default="", description="总结唯一ID（旧版本数据为空）")
+    
+    @property
+    def key(self) -> str:
+        """去重用的唯一标识：没有summary_id的旧数据退化为 会话ID@创建时间"""
+        return self.summary_id or f"{self.session_id}@{self.created_at}"
     
     class Config:
         json_schema_extra = {
@@ -63,11 +73,21 @@ class EmotionSummary(BaseModel):
                 "sensitive_topics": ["工作压力", "截止期限"],
                 "created_at": "2025-11-18 23:24:00",
                 "duration_minutes": 15.5,
-                "total_interactions": 24
+                "total_interactions": 24,
+                "average_intensity": 0.65,
+                "emotion_distribution": {"anxiety": 0.6, "sadness": 0.4},
+                "summary_id": "3f2a9c0d8e4b4f6a9d1c2b3a4e5f6071"
             }
         }
 
 
+# 画像中只用于持久化和增量更新的累加量字段，对外输出时排除
+PROFILE_ACCUMULATOR_FIELDS = {
+    "summary_count", "emotion_counts", "trend_sums", "trait_sums", "emotion_changes", "last_emotion",
+    "topic_counts", "topic_errors", "topic_landmark"
+}
+
+
 class EmotionProfile(BaseModel):
     """长期情绪画像"""
     user_id: str = Field(..., description="用户ID")
@@ -78,6 +98,17 @@ class EmotionProfile(BaseModel):
     personality_traits: Dict[str, float] = Field(default_factory=dict, description="个性特征")
     last_updated: str = Field(..., description="最后更新时间")
     total_interactions: int = Field(default=0, description="总交互次数")
+    # 原始累加量：每次更新只改这些字段，上面的分布、趋势、稳定性和个性特征在读取时由它们推导
+    summary_count: int = Field(default=0, description="累计的总结数")
+    emotion_counts: Dict[str, int] = Field(default_factory=dict, description="各主导情绪出现次数")
+    trend_sums: Dict[str, float] = Field(default_factory=dict, description="各情绪趋势方向之和")
+    trait_sums: Dict[str, float] = Field(default_factory=dict, description="个性特征得分之和")
+    emotion_changes: int = Field(default=0, description="相邻总结主导情绪的变化次数")
+    last_emotion: str = Field(default="", description="最近一次总结的主导情绪")
+    # 敏感话题的Space-Saving计数器（容量固定），计数按前向衰减加权，sensitive_topics为按计数排序的视图
+    topic_counts: Dict[str, float] = Field(default_factory=dict, description="敏感话题的衰减加权计数")
+    topic_errors: Dict[str, float] = Field(default_factory=dict, description="敏感话题计数的高估上界")
+    topic_landmark: float = Field(default=0.0, description="前向衰减的基准时间戳")
     
     class Config:
         json_schema_extra = {
@@ -89,7 +120,16 @@ class EmotionProfile(BaseModel):
                 "sensitive_topics": ["工作压力", "家庭问题"],
                 "personality_traits": {"开朗": 0.8, "敏感": 0.6, "谨慎": 0.4},
                 "last_updated": "2025-11-20T01:00:45",
-                "total_interactions": 156
+                "total_interactions": 156,
+                "summary_count": 20,
+                "emotion_counts": {"happiness": 12, "sadness": 4, "anxiety": 4},
+                "trend_sums": {"happiness": 0.5, "sadness": -0.25, "anxiety": 0.4},
+                "trait_sums": {"开朗": 1.2, "敏感": 0.9, "谨慎": 0.6},
+                "emotion_changes": 5,
+                "last_emotion": "happiness",
+                "topic_counts": {"工作压力": 6.3, "家庭问题": 2.1},
+                "topic_errors": {"工作压力": 0.0, "家庭问题": 0.0},
+                "topic_landmark": 1763571645.0
             }
         }
 
@@ -100,6 +140,9 @@ class DecayConfig(BaseModel):
     time_window_hours: int = Field(default=24, description="时间窗口（小时）")
     min_weight: float = Field(default=0.1, description="最小权重")
     trend_weight: float = Field(default=0.3, description="趋势权重")
+    retention_hours: float = Field(default=0.0, description="长期记忆保留时长（小时），<=0 表示永久保留")
+    delete_expired: bool = Field(default=False, description="超出保留时长的总结是否从持久化存储中删除（否则只移出内存）")
+    topic_capacity: int = Field(default=32, description="每个用户跟踪的敏感话题数上限")
     
     class Config:
         json_schema_extra = {
@@ -107,6 +150,9 @@ class DecayConfig(BaseModel):
                 "decay_rate": 0.95,
                 "time_window_hours": 24,
                 "min_weight": 0.1,
-                "trend_weight": 0.3
+                "trend_weight": 0.3,
+                "retention_hours": 0.0,
+                "delete_expired": False,
+                "topic_capacity": 32
             }
         }
\ No newline at end of file
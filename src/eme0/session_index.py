@@ -0,0 +1,204 @@
+"""会话总结的本地向量索引（vector_db存储模式）：哈希关键词 + 情绪分布向量，内存映射的NumPy矩阵上做暴力top-k检索
+
+索引目录包含两个文件:
+
+    vectors.f32   行优先的float32矩阵（按容量预分配，内存映射）
+    meta.jsonl    每行一个 {"user_id": ..., "summary": {...}}，行号即向量行号；按 (user_id, 总结唯一标识) 去重
+
+先写向量再追加元数据，重新打开时以元数据行数为准，中途崩溃最多丢失最后一条。
+"""
+import json
+import logging
+import os
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .schemas import EmotionSummary
+
+logger = logging.getLogger(__name__)
+
+# 向量各分段的维度
+EMOTION_DIMS = 16  # 情绪分布（情绪名哈希分桶）
+TREND_DIMS = 4  # 情绪趋势：上升、下降、稳定、波动
+KEYWORD_DIMS = 107  # 敏感话题（关键词带符号哈希）
+VECTOR_DIM = EMOTION_DIMS + TREND_DIMS + 1 + KEYWORD_DIMS  # 另有1维平均强度
+
+# 各分段归一化后的权重：情绪分布和话题为主，趋势和强度为辅
+EMOTION_WEIGHT = 0.6
+TREND_WEIGHT = 0.2
+INTENSITY_WEIGHT = 0.2
+KEYWORD_WEIGHT = 0.75
+
+_TREND_BUCKETS = {"逐渐上升": 0, "快速上升": 0, "逐渐下降": 1, "快速下降": 1, "相对稳定": 2, "波动较大": 3}
+
+
+def _bucket(token: str, buckets: int) -> Tuple[int, float]:
+    """稳定哈希到 (桶下标, 符号)"""
+    digest = zlib.crc32(token.encode("utf-8"))
+    return digest % buckets, 1.0 if (digest >> 31) & 1 else -1.0
+
+
+def embed_summary(summary: EmotionSummary) -> np.ndarray:
+    """会话总结的向量表示（L2归一化，点积即余弦相似度）"""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    
+    emotions = vector[:EMOTION_DIMS]
+    distribution = summary.emotion_distribution or {summary.dominant_emotion: 1.0}
+    for emotion, share in distribution.items():
+        emotions[_bucket(emotion, EMOTION_DIMS)[0]] += share
+    
+    trend = _TREND_BUCKETS.get(summary.emotion_trend)
+    if trend is not None:
+        vector[EMOTION_DIMS + trend] = 1.0
+    
+    vector[EMOTION_DIMS + TREND_DIMS] = summary.average_intensity
+    
+    keywords = vector[EMOTION_DIMS + TREND_DIMS + 1:]
+    for topic in summary.sensitive_topics:
+        index, sign = _bucket(topic, KEYWORD_DIMS)
+        keywords[index] += sign
+    
+    for block, weight in ((emotions, EMOTION_WEIGHT), (keywords, KEYWORD_WEIGHT)):
+        norm = np.linalg.norm(block)
+        if norm > 0:
+            block *= weight / norm
+    vector[EMOTION_DIMS:EMOTION_DIMS + TREND_DIMS] *= TREND_WEIGHT
+    vector[EMOTION_DIMS + TREND_DIMS] *= INTENSITY_WEIGHT
+    
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class SessionVectorIndex:
+    """文件持久化的会话向量索引，按用户过滤后暴力检索top-k"""
+    
+    def __init__(self, path: str, initial_capacity: int = 4096, search_chunk_rows: int = 65536):
+        self.path = path
+        self.search_chunk_rows = search_chunk_rows
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._meta_path = os.path.join(path, "meta.jsonl")
+        
+        self.size = 0
+        self._meta_offsets: List[int] = []  # 每行元数据在meta.jsonl中的字节偏移
+        self._user_rows: Dict[str, List[int]] = {}  # {user_id: [行号]}
+        self._keys = set()  # (user_id, 总结唯一标识)，重复写入（如重放日志）时跳过
+        self.searches = 0
+        self.last_search_ms = 0.0
+        
+        started = time.perf_counter()
+        self._load_meta()
+        capacity = max(initial_capacity, self.size)
+        if os.path.exists(self._vectors_path):
+            capacity = max(capacity, os.path.getsize(self._vectors_path) // (VECTOR_DIM * 4))
+        self._open_vectors(capacity)
+        self._meta_file = open(self._meta_path, "ab")
+        logger.info(f"会话向量索引已加载: {path}, 向量数={self.size}, 耗时={(time.perf_counter() - started) * 1000:.1f}ms")
+    
+    def _load_meta(self):
+        """读取元数据，重建用户行号表"""
+        if not os.path.exists(self._meta_path):
+            return
+        offset = 0
+        with open(self._meta_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                meta = json.loads(line)
+                summary = meta["summary"]
+                key = summary.get("summary_id") or f"{summary['session_id']}@{summary['created_at']}"
+                self._register(meta["user_id"], key, offset)
+                offset += len(line)
+        # 丢弃不完整的尾部
+        with open(self._meta_path, "r+b") as f:
+            f.truncate(offset)
+    
+    def _register(self, user_id: str, key: str, offset: int):
+        self._meta_offsets.append(offset)
+        self._user_rows.setdefault(user_id, []).append(self.size)
+        self._keys.add((user_id, key))
+        self.size += 1
+    
+    def _open_vectors(self, capacity: int):
+        """按容量打开（必要时扩展）向量文件的内存映射"""
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < capacity * VECTOR_DIM * 4:
+                f.truncate(capacity * VECTOR_DIM * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, VECTOR_DIM))
+    
+    def add(self, user_id: str, summary: EmotionSummary) -> bool:
+        """加入一条会话总结，已存在时返回False"""
+        if (user_id, summary.key) in self._keys:
+            return False
+        
+        if self.size == len(self._vectors):
+            self._vectors.flush()
+            self._open_vectors(len(self._vectors) * 2)
+        self._vectors[self.size] = embed_summary(summary)
+        
+        offset = self._meta_file.tell()
+        line = json.dumps({"user_id": user_id, "summary": summary.model_dump()}, ensure_ascii=False) + "\n"
+        self._meta_file.write(line.encode("utf-8"))
+        self._meta_file.flush()
+        self._register(user_id, summary.key, offset)
+        return True
+    
+    def search(self, query: np.ndarray, top_k: int = 5, user_id: Optional[str] = None) -> List[Tuple[int, float]]:
+        """检索与query最相似的行，返回 [(行号, 相似度)]；指定user_id时只在该用户的会话中检索"""
+        started = time.perf_counter()
+        top_k = max(1, top_k)
+        query = np.asarray(query, dtype=np.float32)
+        if user_id is not None:
+            rows = np.asarray(self._user_rows.get(user_id, []), dtype=np.int64)
+            scores = self._vectors[rows] @ query if len(rows) else np.zeros(0, dtype=np.float32)
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+                rows, scores = rows[best], scores[best]
+            candidates = list(zip(rows.tolist(), scores.tolist()))
+        else:
+            # 分块计算，避免一次把整个矩阵读入内存
+            candidates = []
+            for start in range(0, self.size, self.search_chunk_rows):
+                scores = self._vectors[start:min(self.size, start + self.search_chunk_rows)] @ query
+                best = np.argpartition(-scores, top_k - 1)[:top_k] if len(scores) > top_k else np.arange(len(scores))
+                candidates.extend((start + int(i), float(scores[i])) for i in best)
+        
+        candidates.sort(key=lambda item: -item[1])
+        self.searches += 1
+        self.last_search_ms = (time.perf_counter() - started) * 1000
+        return candidates[:top_k]
+    
+    def get(self, row: int) -> Tuple[str, EmotionSummary]:
+        """读取行对应的 (用户ID, 会话总结)"""
+        with open(self._meta_path, "rb") as f:
+            f.seek(self._meta_offsets[row])
+            meta = json.loads(f.readline())
+        return meta["user_id"], EmotionSummary(**meta["summary"])
+    
+    def latest_row(self, user_id: str) -> Optional[int]:
+        """用户最近加入索引的行号，没有时返回None"""
+        rows = self._user_rows.get(user_id)
+        return rows[-1] if rows else None
+    
+    def user_session_count(self, user_id: str) -> int:
+        return len(self._user_rows.get(user_id, ()))
+    
+    def close(self):
+        """刷新内存映射并关闭文件"""
+        self._vectors.flush()
+        self._meta_file.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """索引状态"""
+        return {
+            "path": self.path,
+            "vectors": self.size,
+            "capacity": len(self._vectors),
+            "dim": VECTOR_DIM,
+            "users": len(self._user_rows),
+            "searches": self.searches,
+            "last_search_ms": round(self.last_search_ms, 3)
+        }
@@ -0,0 +1,56 @@
+"""按用户划分的异步锁：同一用户的记忆更新串行执行，不同用户互不阻塞"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List
+
+
+class _UserLock:
+    __slots__ = ("lock", "holders")
+    
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.holders = 0  # 持有或等待该锁的协程数，为0时回收
+
+
+class UserLockManager:
+    """按需创建、用完即回收的用户锁，按用户ID分片存放"""
+    
+    def __init__(self, shards: int = 64):
+        self._shards: List[Dict[str, _UserLock]] = [{} for _ in range(max(1, shards))]
+        self.acquisitions = 0  # 累计加锁次数
+        self.contended = 0  # 需要等待其他协程释放的加锁次数
+    
+    def _shard(self, user_id: str) -> Dict[str, _UserLock]:
+        return self._shards[hash(user_id) % len(self._shards)]
+    
+    @asynccontextmanager
+    async def lock(self, user_id: str):
+        """获取用户锁"""
+        shard = self._shard(user_id)
+        entry = shard.get(user_id)
+        if entry is None:
+            entry = shard[user_id] = _UserLock()
+        entry.holders += 1
+        self.acquisitions += 1
+        if entry.lock.locked():
+            self.contended += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.holders -= 1
+            if entry.holders == 0:
+                shard.pop(user_id, None)
+    
+    def is_locked(self, user_id: str) -> bool:
+        """用户当前是否有进行中的更新"""
+        entry = self._shard(user_id).get(user_id)
+        return entry is not None and entry.lock.locked()
+    
+    def stats(self) -> Dict[str, Any]:
+        """锁状态"""
+        return {
+            "active_users": sum(len(shard) for shard in self._shards),
+            "acquisitions": self.acquisitions,
+            "contended": self.contended
+        }
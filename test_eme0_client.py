@@ -357,6 +357,8 @@ async def main():
         print(f"❌ 测试过程中出现错误: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        await client.server.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Eme0 情绪引擎并发压力测试
+多个用户并发调用情绪分析、情绪上下文和长期记忆归档，验证同一用户的操作按调用顺序串行生效，
+不同用户之间互不阻塞（使用本地模拟千帆接口，无需API密钥）
+
+用法:
+    python test_eme0_concurrency.py --users 50 --ops 40 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, 'src')
+
+from eme0.mcp_server import Eme0MCPServer
+from eme0.mock_qianfan import MockQianfanSettings, start_mock_server
+
+
+DIALOGUES = [
+    "今天工作压力好大啊，我真的很焦虑",
+    "太棒了！我刚刚通过了一个重要的面试！",
+    "我的宠物猫今天走丢了，我很难过",
+    "气死我了！同事把我的功劳说成是他的",
+    "好的",
+    "没想到居然会这样"
+]
+
+
+async def run_user(server: Eme0MCPServer, user_id: str, ops: int, rng: random.Random):
+    """按顺序发起一个用户的所有操作（不等待完成），返回预期的归档交互数和实际结果"""
+    tasks = []
+    expected_archives = []
+    pending_turns = 0
+    for i in range(ops):
+        roll = rng.random()
+        if roll < 0.7:
+            tasks.append(("analyze", asyncio.ensure_future(
+                server.analyze_emotion(rng.choice(DIALOGUES), user_id, "session"))))
+            pending_turns += 1
+        elif roll < 0.85:
+            tasks.append(("context", asyncio.ensure_future(server.get_emotion_context(user_id, "session"))))
+        else:
+            tasks.append(("archive", asyncio.ensure_future(server.update_long_term_memory(user_id, "session"))))
+            expected_archives.append(pending_turns)
+            pending_turns = 0
+    
+    results = await asyncio.gather(*(task for _, task in tasks))
+    actual_archives = [
+        result["summary_model"]["total_interactions"]
+        for (kind, _), result in zip(tasks, results) if kind == "archive"
+    ]
+    failures = sum(1 for result in results if not result.get("success"))
+    return expected_archives, actual_archives, pending_turns, failures
+
+
+async def run_stress(args):
+    port = args.port
+    os.environ["EME0_LLM_BACKEND"] = "mock"
+    os.environ["EME0_MOCK_ENDPOINT"] = f"http://127.0.0.1:{port}/v2/chat/completions"
+    os.environ["EMOTION_CACHE_ENABLED"] = "false"  # 每次分析都经过异步LLM调用
+    os.environ["QIANFAN_RATE_LIMIT_QPS"] = "0"
+    os.environ["QIANFAN_MAX_CONCURRENCY"] = "256"
+    os.environ["QIANFAN_INITIAL_CONCURRENCY"] = "256"
+    os.environ["STM_MAX_LENGTH"] = str(args.ops + 1)  # 短期记忆不淘汰，交互数可精确核对
+    os.environ["STM_IDLE_TTL_SECONDS"] = "0"
+    
+    settings = MockQianfanSettings(latency_ms=args.latency_ms, latency_sigma=0.5)
+    runner = await start_mock_server(settings, port=port, seed=7)
+    
+    server = Eme0MCPServer()
+    await server.initialize()
+    
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(
+        run_user(server, f"stress_user{i}", args.ops, random.Random(rng.random()))
+        for i in range(args.users)
+    ))
+    elapsed = time.perf_counter() - started
+    
+    mismatched_users = 0
+    failures = 0
+    for i, (expected, actual, remaining, user_failures) in enumerate(outcomes):
+        failures += user_failures
+        live = len(server.memory_manager.get_short_term_history(f"stress_user{i}", "session"))
+        if expected != actual or live != remaining:
+            mismatched_users += 1
+            print(f"❌ stress_user{i}: 预期归档={expected}, 实际归档={actual}, 预期剩余={remaining}, 实际剩余={live}")
+    
+    total_ops = args.users * args.ops
+    print("\n" + "=" * 60)
+    print(f"📊 用户数={args.users}, 每用户操作数={args.ops}, 总耗时={elapsed:.2f}s, 吞吐={total_ops / elapsed:.1f} ops/s")
+    print(f"🔒 用户锁: {server.user_locks.stats()}")
+    print(f"✅ 顺序一致的用户: {args.users - mismatched_users}/{args.users}, 失败调用: {failures}")
+    print("=" * 60)
+    
+    await server.shutdown()
+    await runner.cleanup()
+    return mismatched_users == 0 and failures == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eme0 并发压力测试")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--ops", type=int, default=40)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    ok = asyncio.run(run_stress(args))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Eme0 记忆层行为测试
+覆盖操作日志（追加、替换、清除、长期记忆存储 -> 快照 -> 重放后状态一致）、
+SQLite长期记忆存储（重启后加载、读取失败时报错且不标记为已加载）和敏感话题的Space-Saving计数器
+
+用法:
+    python test_eme0_memory.py --events 5000 --seed 42
+"""
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+
+# 添加src目录到Python路径
+sys.path.insert(0, 'src')
+
+from eme0.ltm_storage import SQLiteStorage
+from eme0.memory_journal import MemoryJournal
+from eme0.memory_manager import LongTermMemory, MemoryManager
+from eme0.schemas import DecayConfig, EmotionResult, EmotionSummary
+
+
+EMOTIONS = ["happiness", "sadness", "anger", "fear", "surprise"]
+TRENDS = ["逐渐上升", "逐渐下降", "相对稳定"]
+KEYWORDS = ["工作", "家庭", "考试", "面试", "宠物", "同事", "加班", "旅行"]
+
+failures = []
+
+
+def check(name: str, ok: bool, detail: str = ""):
+    """记录并打印一项检查结果"""
+    print(f"{'✅' if ok else '❌'} {name}{f': {detail}' if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def make_summary(user_id: str, session_id: str, rng: random.Random) -> EmotionSummary:
+    return EmotionSummary(
+        user_id=user_id,
+        session_id=session_id,
+        dominant_emotion=rng.choice(EMOTIONS),
+        emotion_trend=rng.choice(TRENDS),
+        sensitive_topics=rng.sample(KEYWORDS, 2),
+        created_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+        total_interactions=rng.randint(1, 10),
+        average_intensity=round(rng.random(), 2),
+        emotion_distribution={rng.choice(EMOTIONS): 1.0},
+        summary_id=f"{session_id}-{rng.random()}"
+    )
+
+
+def memory_state(manager: MemoryManager):
+    """可比较的记忆状态：短期记忆记录、长期记忆总结和画像（不含更新时间）"""
+    emotions = manager.stm.emotions
+    stm = {
+        key: (session.last_active, [
+            (emotions.lookup(r.emotion_code), r.intensity, r.timestamp, tuple(r.keywords)) for r in session.records
+        ])
+        for key, session in manager.stm.sessions.items()
+    }
+    ltm = {user_id: [s.model_dump() for s in summaries] for user_id, summaries in manager.ltm.memories.items()}
+    profiles = {user_id: p.model_dump(exclude={"last_updated"}) for user_id, p in manager.ltm.profiles.items()}
+    return stm, ltm, profiles
+
+
+def test_journal(events: int, rng: random.Random):
+    """随机的追加、替换、清除和长期记忆存储，中途写快照，重放后与内存状态比较"""
+    print("\n📝 操作日志")
+    directory = tempfile.mkdtemp(prefix="eme0_journal_")
+    try:
+        manager = MemoryManager(max_stm_length=5, journal=MemoryJournal(directory, commit_interval_ms=1))
+        manager.recover()
+        last_records = {}
+        counts = Counter()
+        for i in range(events):
+            user_id, session_id = f"user{rng.randrange(10)}", f"session{rng.randrange(3)}"
+            roll = rng.random()
+            if roll < 0.6:
+                result = EmotionResult(primary_emotion=rng.choice(EMOTIONS), emotion_intensity=round(rng.random(), 2),
+                                       emotion_keywords=rng.sample(KEYWORDS, 2))
+                last_records[(user_id, session_id)] = manager.analyze_and_store("", user_id, session_id, result)
+                counts["append"] += 1
+            elif roll < 0.75 and (user_id, session_id) in last_records:
+                result = EmotionResult(primary_emotion="fear", emotion_intensity=0.4, emotion_keywords=["替换"])
+                if manager.replace_short_term_result(user_id, session_id, last_records.pop((user_id, session_id)), result):
+                    counts["replace"] += 1
+            elif roll < 0.85:
+                manager.clear_session(user_id, session_id)
+                last_records.pop((user_id, session_id), None)
+                counts["clear"] += 1
+            else:
+                manager.update_long_term_memory(user_id, make_summary(user_id, session_id, rng))
+                counts["store"] += 1
+            if i == events // 2:
+                manager.snapshot()
+        manager.journal.flush()
+        expected = memory_state(manager)
+        check("快照已写入", manager.journal.stats()["snapshots"] == 1)
+        manager.close()
+        
+        recovered = MemoryManager(max_stm_length=5, journal=MemoryJournal(directory))
+        replayed = recovered.recover()
+        check("重放后状态一致", memory_state(recovered) == expected, f"操作={dict(counts)}, 重放事件={replayed}")
+        recovered.close()
+        
+        # 超出日志字符串长度上限的关键词被截断，不影响其他记录
+        manager = MemoryManager(journal=MemoryJournal(directory))
+        manager.recover()
+        record = manager.analyze_and_store("", "long_user", "session", EmotionResult(
+            primary_emotion="sadness", emotion_intensity=0.5, emotion_keywords=["长" * 30000]))
+        check("超长关键词被截断", len(record.keywords[0].encode("utf-8")) <= 0xFFFF)
+        manager.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_sqlite(rng: random.Random):
+    """重启后从SQLite加载长期记忆；读取失败时抛出异常且用户保持未加载"""
+    print("\n🗄️  SQLite长期记忆存储")
+    directory = tempfile.mkdtemp(prefix="eme0_ltm_")
+    path = os.path.join(directory, "ltm.db")
+    try:
+        ltm = LongTermMemory(storage=SQLiteStorage(path))
+        stored = [make_summary("sqlite_user", f"session{i}", rng) for i in range(5)]
+        for summary in stored:
+            ltm.store_summary("sqlite_user", summary)
+        profile = ltm.get_detailed_profile("sqlite_user").model_dump(exclude={"last_updated"})
+        ltm.close()
+        
+        ltm = LongTermMemory(storage=SQLiteStorage(path))
+        loaded = [summary for summary, _ in ltm.get_weighted_summaries("sqlite_user")]
+        check("重启后加载总结", [s.model_dump() for s in loaded] == [s.model_dump() for s in stored], f"{len(loaded)}条")
+        reloaded = ltm.get_detailed_profile("sqlite_user")
+        check("重启后加载画像", reloaded is not None and reloaded.model_dump(exclude={"last_updated"}) == profile)
+        ltm.close()
+        
+        # 存储打开后表被删除，模拟读取失败
+        ltm = LongTermMemory(storage=SQLiteStorage(path))
+        db = sqlite3.connect(path)
+        db.execute("DROP TABLE ltm_summaries")
+        db.commit()
+        db.close()
+        try:
+            ltm.get_weighted_summaries("sqlite_user")
+            raised = False
+        except sqlite3.Error:
+            raised = True
+        check("读取失败时抛出异常", raised)
+        check("读取失败的用户未标记为已加载", "sqlite_user" not in ltm._loaded_users)
+        ltm.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_topic_sketch(rng: random.Random):
+    """Space-Saving计数器：容量固定，高频话题保留并排在前面，计数误差有上界"""
+    print("\n🏷️  敏感话题计数器")
+    capacity = 8
+    ltm = LongTermMemory(decay_config=DecayConfig(decay_rate=1.0, topic_capacity=capacity, retention_hours=1e6))
+    frequent = {"工作": 0.3, "家庭": 0.2, "考试": 0.1}
+    truth = Counter()
+    for i in range(2000):
+        roll = rng.random()
+        topic = next((t for t, cumulative in _cumulative(frequent) if roll < cumulative), f"噪声{rng.randrange(500)}")
+        truth[topic] += 1
+        ltm.store_summary("sketch_user", EmotionSummary(
+            user_id="sketch_user", session_id=f"session{i}", dominant_emotion="neutral", emotion_trend="相对稳定",
+            sensitive_topics=[topic], created_at="2026-01-01 00:00:00"))
+    
+    profile = ltm.get_detailed_profile("sketch_user")
+    check("计数器不超过容量", len(profile.topic_counts) <= capacity, f"{len(profile.topic_counts)}/{capacity}")
+    check("高频话题排在前面", profile.sensitive_topics[:3] == list(frequent), f"{profile.sensitive_topics[:3]}")
+    bounded = all(
+        profile.topic_counts[t] - profile.topic_errors[t] <= truth[t] <= profile.topic_counts[t]
+        for t in profile.topic_counts
+    )
+    check("计数误差在上界内", bounded)
+
+
+def _cumulative(shares):
+    total = 0.0
+    for topic, share in shares.items():
+        total += share
+        yield topic, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eme0 记忆层行为测试")
+    parser.add_argument("--events", type=int, default=5000, help="操作日志测试的随机操作数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    rng = random.Random(args.seed)
+    test_journal(args.events, rng)
+    test_sqlite(rng)
+    test_topic_sketch(rng)
+    
+    print("\n" + "=" * 60)
+    print(f"{'✅ 全部通过' if not failures else f'❌ 失败: {failures}'}")
+    print("=" * 60)
+    sys.exit(0 if not failures else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Eme0 本地组件行为测试
+覆盖规则引擎（重叠词取最长、否定词和程度副词、批量打分与逐条打分一致）、千帆熔断器（关闭 -> 打开 -> 半开 -> 关闭）
+和情绪结果缓存（内存LRU淘汰、TTL过期、磁盘层重启后命中）
+
+用法:
+    python test_eme0_rules.py --open-seconds 0.2
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, 'src')
+
+from eme0.circuit_breaker import CircuitBreaker, STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN
+from eme0.emotion_cache import EmotionResultCache
+from eme0.rule_engine import RuleEmotionEngine
+from eme0.schemas import EmotionResult
+
+failures = []
+
+
+def check(name: str, ok: bool, detail: str = ""):
+    """记录并打印一项检查结果"""
+    print(f"{'✅' if ok else '❌'} {name}{f': {detail}' if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def test_rule_engine():
+    """“不开心”整体匹配为悲伤，不会同时命中“开心”；否定词翻转或抵消情绪"""
+    print("\n📏 规则引擎")
+    engine = RuleEmotionEngine()
+    cases = [
+        ("我今天很开心", "happiness", ["开心"]),
+        ("我今天不开心", "sadness", ["不开心"]),
+        ("我没有不开心", "neutral", []),  # 被否定的悲伤不计分，不把双重否定当作开心
+        ("我一点也不高兴", "sadness", ["高兴"]),  # 被否定的高兴翻转为悲伤
+        ("我不害怕", "neutral", []),  # 没有翻转规则的情绪被否定后不计分
+        ("今天天气不错", "neutral", []),
+    ]
+    for text, emotion, keywords in cases:
+        score = engine.score(text)
+        check(f"{text} -> {emotion}", score.primary_emotion == emotion and score.keywords == keywords,
+              f"{score.primary_emotion} {score.keywords}")
+    
+    plain, negated = engine.score("我开心"), engine.score("我不高兴")
+    check("被否定的情绪权重减半", negated.scores["sadness"] == plain.scores["happiness"] * 0.5,
+          f"{negated.scores} vs {plain.scores}")
+    check("程度副词提高权重", engine.score("我非常开心").scores["happiness"] > plain.scores["happiness"])
+    check("程度副词降低权重", engine.score("我有点开心").scores["happiness"] < plain.scores["happiness"])
+    check("强度不超过上限", engine.analyze("开心高兴快乐愉快兴奋满足哈哈").emotion_intensity <= engine.max_intensity)
+    
+    # 修饰词在上一条文本末尾时不能影响下一条文本
+    texts = [text for text, _, _ in cases] + ["我不", "开心", "很", "高兴", "", "好好开心难过", "非常 开心"]
+    single = [engine.score(text) for text in texts]
+    batch = engine.score_batch(texts)
+    same = all((a.primary_emotion, a.emotion_intensity, a.keywords, list(a.scores.items()), a.confidence)
+               == (b.primary_emotion, b.emotion_intensity, b.keywords, list(b.scores.items()), b.confidence)
+               for a, b in zip(single, batch))
+    check("批量打分与逐条打分一致", same and len(batch) == len(texts))
+
+
+def test_circuit_breaker(open_seconds: float):
+    """失败率达到阈值后打开，冷却期后半开只放行一个探测，探测成功后关闭、失败则重新打开"""
+    print("\n🔌 熔断器")
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, slow_call_seconds=1.0, window_size=4, min_calls=4,
+                             open_seconds=open_seconds)
+    for _ in range(2):
+        breaker.record_success(0.01)
+    breaker.record_failure()
+    check("失败率未达阈值时保持关闭", breaker.state == STATE_CLOSED, f"失败率={breaker.failure_rate:.2f}")
+    breaker.record_success(2.0)  # 慢调用按失败计
+    check("慢调用计入失败后打开", breaker.state == STATE_OPEN, f"失败率={breaker.failure_rate:.2f}")
+    check("打开时拒绝调用", not breaker.allow_request() and breaker.rejected_calls == 1)
+    
+    time.sleep(open_seconds * 1.2)
+    check("冷却期后进入半开", breaker.state == STATE_HALF_OPEN)
+    check("半开时放行一个探测请求", breaker.allow_request())
+    check("探测期间拒绝其他请求", not breaker.allow_request())
+    breaker.record_failure()
+    check("探测失败后重新打开", breaker.state == STATE_OPEN and breaker.open_count == 2)
+    
+    time.sleep(open_seconds * 1.2)
+    check("再次进入半开并放行探测", breaker.state == STATE_HALF_OPEN and breaker.allow_request())
+    breaker.record_success(0.01)
+    check("探测成功后关闭", breaker.state == STATE_CLOSED and breaker.failure_rate == 0.0)
+
+
+def test_cache(ttl_seconds: float):
+    """内存层按LRU淘汰，条目超过TTL后失效，磁盘层在重启后仍可命中"""
+    print("\n🗃️  情绪结果缓存")
+    result = EmotionResult(primary_emotion="happiness", emotion_intensity=0.6, emotion_keywords=["开心"])
+    
+    cache = EmotionResultCache(max_size=2, ttl_seconds=60)
+    keys = [EmotionResultCache.make_key(text, "model", "v1") for text in ("一", "二", "三")]
+    check("标准化后键相同", EmotionResultCache.make_key(" 一 ", "model", "v1") == keys[0])
+    cache.put(keys[0], result)
+    cache.put(keys[1], result)
+    cache.get(keys[0])  # 访问后变为最近使用
+    cache.put(keys[2], result)
+    check("淘汰最久未访问的条目", cache.get(keys[1]) is None and cache.get(keys[0]) is not None,
+          f"evictions={cache.evictions}")
+    
+    cache = EmotionResultCache(max_size=10, ttl_seconds=ttl_seconds)
+    cache.put(keys[0], result)
+    check("TTL内命中", cache.get(keys[0]) is not None)
+    time.sleep(ttl_seconds * 1.5)
+    check("超过TTL后失效", cache.get(keys[0]) is None and cache.stats()["size"] == 0)
+    
+    directory = tempfile.mkdtemp(prefix="eme0_cache_")
+    path = os.path.join(directory, "cache.db")
+    try:
+        cache = EmotionResultCache(max_size=10, ttl_seconds=60, disk_path=path, disk_max_size=2)
+        for key in keys:
+            cache.put(key, result)
+        cache.close()
+        cache = EmotionResultCache(max_size=10, ttl_seconds=60, disk_path=path, disk_max_size=2)
+        hit = cache.get(keys[2])
+        check("重启后磁盘层命中", hit is not None and hit.primary_emotion == "happiness" and cache.disk_hits == 1)
+        check("磁盘层超出容量时淘汰最旧的条目", cache.get(keys[0]) is None)
+        cache.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eme0 本地组件行为测试")
+    parser.add_argument("--open-seconds", type=float, default=0.2, help="熔断器冷却时间")
+    parser.add_argument("--ttl-seconds", type=float, default=0.2, help="缓存TTL")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    test_rule_engine()
+    test_circuit_breaker(args.open_seconds)
+    test_cache(args.ttl_seconds)
+    
+    print("\n" + "=" * 60)
+    print(f"{'✅ 全部通过' if not failures else f'❌ 失败: {failures}'}")
+    print("=" * 60)
+    sys.exit(0 if not failures else 1)
+
+
+if __name__ == "__main__":
+    main()
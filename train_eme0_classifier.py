@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Eme0 本地情绪分类器训练/导出
+从记录的千帆分析结果（EME0_RECORD_PATH 生成的JSONL）训练字符n-gram softmax分类器，
+在留出集上与规则分析对比准确率，并导出模型供 EME0_CLASSIFIER_PATH 加载
+
+用法:
+    python train_eme0_classifier.py --data llm_results.jsonl --output emotion_classifier.npz --epochs 10
+"""
+
+import argparse
+import random
+import sys
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, 'src')
+
+from eme0.local_classifier import HashedNgramFeaturizer, LocalEmotionClassifier, load_training_records
+from eme0.rule_engine import RuleEmotionEngine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练并导出 Eme0 本地情绪分类器")
+    parser.add_argument("--data", required=True, help="LLM分析结果记录（JSONL）")
+    parser.add_argument("--output", default="emotion_classifier.npz", help="导出的模型文件")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-6)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--n-features", type=int, default=1 << 15, help="特征哈希维度")
+    parser.add_argument("--max-n", type=int, default=3, help="字符n-gram最大长度")
+    parser.add_argument("--holdout", type=float, default=0.1, help="留出评估集比例")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    texts, labels, intensities = load_training_records(args.data)
+    if not texts:
+        print(f"❌ 没有可用的训练数据: {args.data}")
+        sys.exit(1)
+    
+    # 划分训练集和留出集
+    order = list(range(len(texts)))
+    random.Random(args.seed).shuffle(order)
+    n_holdout = int(len(order) * args.holdout)
+    holdout, train = order[:n_holdout], order[n_holdout:]
+    pick = lambda values, idx: [values[i] for i in idx]
+    
+    classifier = LocalEmotionClassifier(HashedNgramFeaturizer(args.n_features, 1, args.max_n))
+    started = time.perf_counter()
+    train_metrics = classifier.fit(
+        pick(texts, train), pick(labels, train), pick(intensities, train),
+        epochs=args.epochs, learning_rate=args.learning_rate, l2=args.l2,
+        batch_size=args.batch_size, seed=args.seed
+    )
+    train_seconds = time.perf_counter() - started
+    
+    print("\n" + "=" * 60)
+    print(f"📚 训练样本={len(train)}, 留出样本={len(holdout)}, 训练耗时={train_seconds:.2f}s")
+    print(f"🎯 训练集: 准确率={train_metrics['accuracy']:.3f}, 强度MAE={train_metrics['intensity_mae']:.3f}")
+    
+    if holdout:
+        holdout_metrics = classifier.evaluate(pick(texts, holdout), pick(labels, holdout), pick(intensities, holdout))
+        rule_engine = RuleEmotionEngine()
+        rule_results = rule_engine.analyze_batch(pick(texts, holdout))
+        rule_accuracy = sum(r.primary_emotion == labels[i] for r, i in zip(rule_results, holdout)) / len(holdout)
+        print(f"🧪 留出集: 分类器准确率={holdout_metrics['accuracy']:.3f}, 强度MAE={holdout_metrics['intensity_mae']:.3f}, "
+              f"规则分析准确率={rule_accuracy:.3f}")
+    
+    # 单条推理耗时
+    sample = texts[:min(1000, len(texts))]
+    started = time.perf_counter()
+    for text in sample:
+        classifier.predict(text)
+    print(f"⚡ 单条推理: {(time.perf_counter() - started) / len(sample) * 1e6:.1f}µs")
+    
+    classifier.save(args.output)
+    print(f"💾 模型已导出: {args.output}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()